@@ -1,18 +1,27 @@
 from flask import Flask
 from flask_cors import CORS
 from flask_restx import Api
-from flask_bcrypt import Bcrypt
-from app.extensions import db, bcrypt
+from app.extensions import db
+from app.hashing import HashingBusy, init_hashing
+from app.log import init_logging
+from app.metrics import init_metrics
+from app.persistence.query_stats import init_query_stats
+from app.persistence.cache import init_cache
+from app.services.response_cache import init_response_cache
+from app.persistence.engine import configure_engine_options, install_sqlite_pragmas
+from app.persistence import migrations
+from app.commands import register_commands
 from flask_jwt_extended import JWTManager
 from config import DevelopmentConfig
 
-from app.api.v1.auth import api as auth_ns
+from app.api.v1.auth import api as auth_ns, register_token_checks
 from app.api.v1.users import api as users_ns
 from app.api.v1.amenities import api as amenities_ns
 from app.api.v1.places import api as places_ns
 from app.api.v1.reviews import api as reviews_ns
+from app.api.v1.imports import api as import_ns
+from app.api.v1.exports import api as export_ns
 
-bcrypt = Bcrypt()
 jwt = JWTManager()
 
 def create_app(config_class=DevelopmentConfig):
@@ -21,23 +30,41 @@ def create_app(config_class=DevelopmentConfig):
     app = Flask(__name__)
     CORS(app, supports_credentials=True)
     app.config.from_object(config_class)
+    init_logging(app)
 
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///hbnb.db'  
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite:///hbnb.db')
+    app.config.setdefault('SQLALCHEMY_TRACK_MODIFICATIONS', False)
+    configure_engine_options(app)
 
     api = Api(app, version='1.0', title='HBnB API', description='HBnB Application API')
 
+    @api.errorhandler(HashingBusy)
+    def hashing_busy(error):
+        """Shed password operations the hashing pool cannot take"""
+        return {'error': str(error)}, 503, {'Retry-After': '1'}
+
     db.init_app(app)
-    bcrypt.init_app(app)
+    init_hashing(app)
     jwt.init_app(app)
+    register_token_checks(jwt)
+    init_cache(app)
+    init_response_cache(app)
 
     with app.app_context():
+        install_sqlite_pragmas(db.engine, app.config)
         db.create_all()
+        migrations.upgrade(db.engine)
+        init_query_stats(app, db.engine)
+        init_metrics(app)
 
     api.add_namespace(users_ns, path='/api/v1/users')
     api.add_namespace(auth_ns, path='/api/v1/auth')
     api.add_namespace(amenities_ns, path='/api/v1/amenities')
     api.add_namespace(places_ns, path='/api/v1/places')
     api.add_namespace(reviews_ns, path='/api/v1/reviews')
+    api.add_namespace(import_ns, path='/api/v1/admin/import')
+    api.add_namespace(export_ns, path='/api/v1/admin/export')
+
+    register_commands(app)
 
     return app
\ No newline at end of file
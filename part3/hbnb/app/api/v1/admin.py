@@ -2,6 +2,7 @@ from flask_restx import Namespace, Resource, fields
 from flask import request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.services import facade
+from app.api.v1.pagination import PAGE_PARAMS, get_page_args, page_headers
 """ API endpoints for admin operations """
 
 
@@ -76,16 +77,22 @@ class AdminUserCreate(Resource):
             return {"error": str(e)}, 400
         
 
+    @api.doc(params=PAGE_PARAMS)
     @api.response(200, 'List of users retrieved successfully')
+    @api.response(400, 'Invalid pagination parameters')
     @api.response(403, 'Admin privileges required')
     @jwt_required()
     def get(self):
-        """Get all users (only admins can perform this action)"""
+        """Get a page of users (only admins can perform this action)"""
         current_user = get_jwt_identity()
         if not current_user.get('is_admin'):
             return {'error': 'Admin privileges required'}, 403
 
-        users = facade.user_repo.get_all()
+        try:
+            limit, after, with_total = get_page_args()
+            page = facade.get_users_page(limit, after, with_total)
+        except ValueError as e:
+            return {'error': str(e)}, 400
         return [
             {
                 'id': user.id,
@@ -93,8 +100,8 @@ class AdminUserCreate(Resource):
                 'last_name': user.last_name,
                 'email': user.email
             }
-            for user in users
-        ], 200
+            for user in page.items
+        ], 200, page_headers(page)
 
 
 @api.route('/users/<user_id>')
@@ -191,16 +198,17 @@ class AdminPlaceModify(Resource):
             if amenity:
                 updated_amenities.append(amenity)
 
-        updated_details['amenities'] = updated_amenities
+        updated_details['amenities'] = [amenity.id for amenity in updated_amenities]
 
         if 'owner_id' in updated_details:
             updated_owner = facade.get_user(updated_details['owner_id'])
-            if updated_owner:
-                updated_details["owner_id"] = updated_owner
-            else:
+            if not updated_owner:
                 return {"error": "Owner not found"}, 404
-            
-        facade.update_place(place_id, updated_details)
+
+        try:
+            facade.update_place(place_id, updated_details, owner_editable=is_admin)
+        except ValueError as e:
+            return {"error": str(e)}, 400
         return {"message": "Place updated successfully"}, 200
     
 
@@ -1,5 +1,8 @@
 from flask_restx import Namespace, Resource, fields
 from app.services import facade
+from app.api.v1.pagination import PAGE_PARAMS, get_page_args, page_headers
+from app.api.v1.conditional import not_modified, validator_headers
+from app.api.v1.caching import cached_response, request_version
 """ API endpoints for amenities """
 
 api = Namespace('amenities', description='Amenity operations')
@@ -25,21 +28,30 @@ class AmenityList(Resource):
         except Exception as e:
             return {'error': str(e)}, 400
     
+    @api.doc(params=PAGE_PARAMS)
     @api.response(200, 'List of amenities retrieved successfully')
+    @api.response(400, 'Invalid pagination parameters')
+    @cached_response('amenities', lambda data: ["amenities"], facade.get_amenities_version)
     def get(self):
-        """Get all amenities"""
+        """Get a page of amenities"""
         try:
-            # FIXED: Use facade method instead of direct repo access
-            amenities = facade.get_all_amenities()
-            if not amenities:
-                return {"message": "No amenities found"}, 200  # Changed from 404 to 200
+            limit, after, with_total = get_page_args()
+            version = request_version(facade.get_amenities_version)
+            cached = not_modified(version)
+            if cached:
+                return cached
+            page = facade.get_amenities_page(limit, after, with_total)
+            if not page.items and not after:
+                return {"message": "No amenities found"}, 200, validator_headers(version)  # Changed from 404 to 200
             return [
                 {
                     'id': amenity.id,
                     'name': amenity.name
                 }
-                for amenity in amenities
-            ], 200
+                for amenity in page.items
+            ], 200, dict(page_headers(page), **validator_headers(version))
+        except ValueError as e:
+            return {'error': str(e)}, 400
         except Exception as e:
             return {'error': str(e)}, 500
 
@@ -48,16 +60,23 @@ class AmenityResource(Resource):
     """Resource for getting, updating and deleting amenity details"""
     @api.response(200, 'Amenity details retrieved successfully')
     @api.response(404, 'Amenity not found')
+    @cached_response('amenity', lambda data, amenity_id: [f"amenity:{amenity_id}"], facade.get_amenity_version)
     def get(self, amenity_id):
         """Get amenity details by ID"""
         try:
-            amenity = facade.get_amenity(amenity_id)
+            version = request_version(facade.get_amenity_version, amenity_id)
+            if version is None:
+                return {"error": "Amenity not found"}, 404
+            cached = not_modified(version)
+            if cached:
+                return cached
+            amenity = facade.get_amenity(amenity_id, as_of=version.last_modified)
             if not amenity:
                 return {"error": "Amenity not found"}, 404
             return {
                 'id': amenity.id,
                 'name': amenity.name
-            }, 200
+            }, 200, validator_headers(version)
         except Exception as e:
             return {'error': str(e)}, 500
 
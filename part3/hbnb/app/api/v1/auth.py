@@ -1,7 +1,10 @@
+import uuid
+from datetime import datetime, timezone
 from flask_restx import Namespace, Resource, fields
 from flask_cors import cross_origin
-from flask import jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask import current_app, jsonify
+from flask_jwt_extended import (create_access_token, create_refresh_token, get_jwt, get_jwt_identity,
+                                jwt_required)
 from app.services import facade
 
 api = Namespace('auth', description='Authentication operations')
@@ -11,20 +14,65 @@ login_model = api.model('Login', {
     'password': fields.String(required=True, description='User password')
 })
 
+
+def issue_tokens(identity, family=None):
+    """Return a fresh access token and a refresh token of `family`
+
+    A login starts a new family; every token obtained by refreshing
+    belongs to the family of the token it replaced.
+    """
+    return {
+        'access_token': create_access_token(identity=identity),
+        'refresh_token': create_refresh_token(identity=identity,
+                                              additional_claims={'fam': family or str(uuid.uuid4())}),
+    }
+
+
+def register_token_checks(jwt):
+    """Reject refresh tokens of revoked families; access tokens are checked by signature only
+
+    A single token that was already exchanged gets through here so that
+    the refresh endpoint sees the replay and revokes its family.
+    """
+    @jwt.token_in_blocklist_loader
+    def token_revoked(jwt_header, jwt_payload):
+        if jwt_payload.get('type') != 'refresh':
+            return False
+        return facade.is_token_family_revoked(jwt_payload.get('fam', jwt_payload['jti']))
+
+
 @api.route("/login")
 class Login(Resource):
     @cross_origin(supports_credentials=True)
     @api.expect(login_model)
     def post(self):
-        """Authenticate user and return a JWT token"""
+        """Authenticate user and return an access and a refresh token"""
         credentials = api.payload
-        user = facade.get_user_by_email(credentials["email"])
+        user = facade.authenticate(credentials["email"], credentials["password"])
 
-        if not user or not user.verify_password(credentials["password"]):
+        if not user:
             return {"error": "Invalid credentials"}, 401
         
-        access_token = create_access_token(identity={'id': str(user.id), 'is_admin': user.is_admin})
-        return jsonify({'access_token': access_token}), 200
+        return jsonify(issue_tokens({'id': str(user.id), 'is_admin': user.is_admin})), 200
+
+
+@api.route("/refresh")
+class Refresh(Resource):
+    @cross_origin(supports_credentials=True)
+    @jwt_required(refresh=True)
+    def post(self):
+        """Exchange a refresh token for a new access and refresh token
+
+        The refresh token is single use: presenting it again revokes every
+        token descending from the same login.
+        """
+        claims = get_jwt()
+        family = claims.get('fam', claims['jti'])
+        expires_at = datetime.fromtimestamp(claims['exp'], timezone.utc).replace(tzinfo=None)
+        family_expires_at = datetime.utcnow() + current_app.config['JWT_REFRESH_TOKEN_EXPIRES']
+        if not facade.rotate_refresh_token(claims['jti'], family, expires_at, family_expires_at):
+            return {"error": "Refresh token already used"}, 401
+        return issue_tokens(get_jwt_identity(), family=family), 200
     
 
 @api.route('/protected')
@@ -33,4 +81,4 @@ class ProtectedResource(Resource):
     def get(self):
         """A protected endpoint that requires a valid JWT token"""
         current_user = get_jwt_identity()
-        return {'message': f'Hello, user {current_user["id"]}'}, 200
\ No newline at end of file
+        return {'message': f'Hello, user {current_user["id"]}'}, 200
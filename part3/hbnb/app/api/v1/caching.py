@@ -0,0 +1,75 @@
+from functools import wraps
+from flask import Response, g, request
+from flask_restx.representations import output_json
+from flask_restx.utils import unpack
+from app.services import response_cache
+from app.api.v1.streaming import stream_format
+""" Serve public GET endpoints from the shared response cache """
+
+
+def request_version(version, *args, **kwargs):
+    """Return version(*args, **kwargs), computed once per request
+
+    cached_response reads it to build its key and the view again for its
+    validators, so both are served by the same statement.
+    """
+    if 'request_version' not in g:
+        g.request_version = version(*args, **kwargs)
+    return g.request_version
+
+
+def cache_key(version):
+    """Key a request on its host, path, Accept header, query string with parameters sorted and `version`"""
+    return (request.host, request.path, request.headers.get('Accept'),
+            tuple(sorted(request.args.items(multi=True))), version.tag)
+
+
+def cached_response(route, tags, version):
+    """Cache the 200 responses of a GET method under the TTL configured for `route`
+
+    `tags(data, **kwargs)` receives the payload and the view arguments and
+    returns the tags whose invalidation must drop the response.
+    `version(**kwargs)` returns the Version of the data the response shows
+    and is part of the key, so a write committed by any process, facade or
+    not, makes the entries rendered before it unreachable. When it returns
+    None or raises ValueError the method answers uncached. Streams and
+    requests that send credentials are never cached.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(resource, *args, **kwargs):
+            cache = response_cache.cache
+            ttl = response_cache.route_ttl(route)
+            if (not cache.enabled or ttl <= 0 or stream_format()
+                    or 'Authorization' in request.headers):
+                return method(resource, *args, **kwargs)
+
+            try:
+                current = request_version(version, **kwargs)
+            except ValueError:
+                current = None
+            if current is None:
+                return method(resource, *args, **kwargs)
+
+            key = cache_key(current)
+            entry = cache.get(key)
+            if entry is not None:
+                response = Response(entry.body, entry.status, list(entry.headers))
+                response.headers['X-Cache'] = 'HIT'
+                return response.make_conditional(request)
+
+            generation = cache.generation
+            rv = method(resource, *args, **kwargs)
+            if isinstance(rv, Response):
+                return rv
+            data, code, headers = unpack(rv)
+            response = output_json(data, code, headers)
+            response.mimetype = 'application/json'
+            if code == 200:
+                entry = response_cache.CachedResponse(
+                    response.get_data(), code, tuple(response.headers.items()), tuple(tags(data, **kwargs)))
+                cache.set(key, entry, generation, ttl)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
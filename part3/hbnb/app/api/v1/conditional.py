@@ -0,0 +1,41 @@
+import hashlib
+from datetime import timezone
+from flask import Response, request
+from werkzeug.http import http_date, quote_etag
+""" ETag and Last-Modified validators for conditional GET requests """
+
+
+def _etag(version):
+    return hashlib.sha1(version.tag.encode("utf-8")).hexdigest()
+
+
+def _last_modified(version):
+    if version.last_modified is None:
+        return None
+    return version.last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+
+
+def validator_headers(version):
+    """Build the ETag and Last-Modified headers of a representation"""
+    headers = {'ETag': quote_etag(_etag(version))}
+    last_modified = _last_modified(version)
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+    return headers
+
+
+def not_modified(version):
+    """Return a 304 response when the client already holds `version`, else None
+
+    If-None-Match takes precedence; If-Modified-Since is only consulted
+    without it and has the one second resolution of HTTP dates.
+    """
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(_etag(version))
+    elif request.if_modified_since and version.last_modified is not None:
+        fresh = _last_modified(version) <= request.if_modified_since
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    return Response(status=304, headers=validator_headers(version))
@@ -0,0 +1,42 @@
+from flask import Response, current_app, request, stream_with_context
+from flask_restx import Namespace, Resource
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.api.v1.streaming import NDJSON
+from app.services import facade
+""" API endpoint for consistent dataset exports, admins only """
+
+api = Namespace('export', description='Dataset export operations')
+
+EXPORT_PARAMS = {
+    'tables': 'Comma-separated tables to export, all of them when omitted: '
+              'users, amenities, places, place_amenities, reviews',
+    'gzip': 'Set to 1 to gzip-compress the export',
+}
+
+
+@api.route('/')
+class Export(Resource):
+    @api.doc(params=EXPORT_PARAMS)
+    @api.response(200, 'NDJSON stream of every row, read from one snapshot')
+    @api.response(400, 'Unknown table')
+    @api.response(403, 'Admin privileges required')
+    @jwt_required()
+    def get(self):
+        """Stream the dataset as NDJSON, one {"type", "data"} object per row
+
+        The first line describes the export and the last one counts the rows
+        of each table; a download without it was cut short.
+        """
+        current_user = get_jwt_identity()
+        if not current_user.get('is_admin'):
+            return {'error': 'Admin privileges required'}, 403
+
+        tables = [name.strip() for name in request.args.get('tables', '').split(',') if name.strip()]
+        compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+        try:
+            chunks = facade.export_dataset(tables, current_app.config.get('EXPORT_BATCH_SIZE', 1000), compress)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        filename = 'hbnb-export.ndjson.gz' if compress else 'hbnb-export.ndjson'
+        return Response(stream_with_context(chunks), mimetype='application/gzip' if compress else NDJSON,
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
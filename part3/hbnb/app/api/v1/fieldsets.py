@@ -0,0 +1,36 @@
+import re
+from flask import current_app, request
+""" Query string parsing for sparse fieldsets and embedded relations """
+
+FIELDSET_PARAMS = {
+    'fields': 'Comma separated fields to return, e.g. title,price; the id is always returned',
+    'include': 'Comma separated relations to embed: owner, amenities, reviews; reviews[:N] embeds the N newest'
+}
+
+_INCLUDE = re.compile(r"^(\w+)(?:\[:(\d+)\])?$")
+
+
+def get_fieldset_args():
+    """Return (fields, include) read from the query string, each None when absent
+
+    `include` maps each relation to the maximum number of items to embed,
+    None for all of them; caps are clamped to PAGE_SIZE_MAX.
+    """
+    fields = None
+    if 'fields' in request.args:
+        fields = [name.strip() for name in request.args['fields'].split(',') if name.strip()]
+
+    include = None
+    if 'include' in request.args:
+        maximum = current_app.config.get('PAGE_SIZE_MAX', 500)
+        include = {}
+        for item in request.args['include'].split(','):
+            item = item.strip()
+            if not item:
+                continue
+            match = _INCLUDE.match(item)
+            if not match:
+                raise ValueError(f"Invalid include: {item}")
+            name, limit = match.groups()
+            include[name] = min(int(limit), maximum) if limit is not None else None
+    return fields, include
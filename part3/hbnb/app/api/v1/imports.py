@@ -0,0 +1,41 @@
+from flask import current_app, request
+from flask_restx import Namespace, Resource
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.services import facade, importing
+""" API endpoint for bulk imports, admins only """
+
+api = Namespace('import', description='Bulk import operations')
+
+IMPORT_PARAMS = {
+    'format': 'csv or ndjson, taken from the Content-Type when omitted',
+    'dry_run': 'Validate every record without writing any (1/true/yes)',
+}
+
+
+@api.route('/<kind>')
+@api.param('kind', 'amenities, places or reviews')
+class Import(Resource):
+    @api.doc(params=IMPORT_PARAMS)
+    @api.response(200, 'Import finished, rejected records are listed by line')
+    @api.response(400, 'Unknown kind or format')
+    @api.response(403, 'Admin privileges required')
+    @jwt_required()
+    def post(self, kind):
+        """Import amenities, places or reviews from a CSV or NDJSON request body
+
+        CSV files have a header row; a place's amenities are IDs or names
+        separated by "|". Owners and users are given by ID or by email.
+        """
+        current_user = get_jwt_identity()
+        if not current_user.get('is_admin'):
+            return {'error': 'Admin privileges required'}, 403
+
+        fmt = request.args.get('format') or importing.format_of(request.content_type)
+        dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        try:
+            records = importing.read_records(request.stream, fmt)
+            report = facade.import_records(kind, records, current_app.config.get('IMPORT_BATCH_SIZE', 1000),
+                                           dry_run, current_app.config.get('IMPORT_ERROR_LIMIT', 1000))
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return report.to_dict(), 200
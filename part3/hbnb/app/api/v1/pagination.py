@@ -0,0 +1,40 @@
+from urllib.parse import urlencode
+from flask import current_app, request
+""" Query string parsing and response headers for paginated list endpoints """
+
+PAGE_PARAMS = {
+    'limit': 'Maximum number of items to return',
+    'after': 'Cursor returned in X-Next-Cursor by the previous page',
+    'count': 'Set to 1 to receive the total number of items in X-Total-Count'
+}
+
+
+def get_page_args():
+    """Return (limit, after, with_total) read from the query string"""
+    default = current_app.config.get('PAGE_SIZE_DEFAULT', 50)
+    maximum = current_app.config.get('PAGE_SIZE_MAX', 500)
+
+    limit = request.args.get('limit', default)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+
+    after = request.args.get('after') or None
+    with_total = request.args.get('count', '').lower() in ('1', 'true', 'yes')
+    return min(limit, maximum), after, with_total
+
+
+def page_headers(page):
+    """Build the X-Next-Cursor, Link and X-Total-Count headers of a page"""
+    headers = {}
+    if page.next_cursor:
+        args = request.args.to_dict(flat=False)
+        args['after'] = [page.next_cursor]
+        headers['X-Next-Cursor'] = page.next_cursor
+        headers['Link'] = f'<{request.base_url}?{urlencode(args, doseq=True)}>; rel="next"'
+    if page.total is not None:
+        headers['X-Total-Count'] = str(page.total)
+    return headers
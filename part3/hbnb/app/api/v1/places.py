@@ -2,6 +2,11 @@ from flask_restx import Namespace, Resource, fields
 from flask import request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.services.facade import HBnBFacade
+from app.api.v1.pagination import PAGE_PARAMS, get_page_args, page_headers
+from app.api.v1.streaming import STREAM_PARAMS, stream_format, stream_response
+from app.api.v1.fieldsets import FIELDSET_PARAMS, get_fieldset_args
+from app.api.v1.conditional import not_modified, validator_headers
+from app.api.v1.caching import cached_response, request_version
 
 """ API module for places """
 
@@ -39,14 +44,101 @@ place_model = api.model('Place', {
     "reviews": fields.List(fields.Nested(review_model), description="List of reviews")
 })
 
+def parse_floats(value, count, name):
+    """Parse a comma separated query parameter holding `count` numbers"""
+    try:
+        numbers = [float(part) for part in value.split(",")]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count:
+        raise ValueError(f"{name} must be {count} comma separated numbers")
+    return numbers
+
+def listing_tags(data, **kwargs):
+    """Tag place listings with the tables their fieldset reads"""
+    return ["places", *facade.place_embed_tables(*get_fieldset_args())]
+
+
+def search_tags(data, **kwargs):
+    """Tag search results, which also match on review text"""
+    return sorted({"reviews", *listing_tags(data)})
+
+def listing_version():
+    """Return the Version of the place listing requested by the fieldset arguments"""
+    return facade.get_places_version(*get_fieldset_args())
+
+def search_version():
+    """Return the Version of the search results requested by the fieldset arguments"""
+    return facade.get_search_version(*get_fieldset_args())
+
+def place_version(place_id):
+    """Return the Version of the place representation requested by the fieldset arguments"""
+    return facade.get_place_version(place_id, *get_fieldset_args())
+
+def place_tags(data, place_id):
+    """Tag a place with itself and the owner and amenities it embeds"""
+    tags = [f"place:{place_id}"]
+    if data.get("owner"):
+        tags.append(f"user:{data['owner']['id']}")
+    tags.extend(f"amenity:{amenity['id']}" for amenity in data.get("amenities", ()))
+    return tags
+
+
 @api.route('/')
 class PlaceList(Resource):
     """Shows a list of all places and lets you POST to add new places"""
     
+    @api.doc(params=dict(PAGE_PARAMS, **STREAM_PARAMS, **FIELDSET_PARAMS, **{
+        'bbox': 'Bounding box min_lon,min_lat,max_lon,max_lat',
+        'near': 'Point lat,lon; returns places within radius_km sorted by distance, in a single page without after, sort or count',
+        'radius_km': 'Search radius in kilometres, required with near',
+        'min_price': 'Only places costing at least this much',
+        'max_price': 'Only places costing at most this much',
+        'sort': 'One of created_at, price, rating, review_count; prefix with - for descending; not with a stream'
+    }))
+    @api.response(400, 'Invalid query parameters')
+    @cached_response('places', listing_tags, listing_version)
     def get(self):
-        """Retrieve a list of all places (Public Access)"""
-        places = facade.get_all_places()
-        return places, 200
+        """Retrieve a page of places, optionally by location (Public Access)"""
+        try:
+            limit, after, with_total = get_page_args()
+            fields, include = get_fieldset_args()
+            fmt = stream_format()
+            version = None if fmt else request_version(listing_version)
+            cached = version and not_modified(version)
+            if cached:
+                return cached
+            prices = {}
+            for name in ('min_price', 'max_price'):
+                if request.args.get(name):
+                    prices[name], = parse_floats(request.args[name], 1, name)
+            if request.args.get('near'):
+                if request.args.get('bbox'):
+                    raise ValueError("near and bbox cannot be combined")
+                if after:
+                    raise ValueError("near returns the nearest places in a single page and cannot be combined with after")
+                if request.args.get('sort'):
+                    raise ValueError("near returns places by distance and cannot be combined with sort")
+                if with_total:
+                    raise ValueError("near returns the nearest places in a single page and cannot be combined with count")
+                latitude, longitude = parse_floats(request.args['near'], 2, 'near')
+                radius_km, = parse_floats(request.args.get('radius_km', ''), 1, 'radius_km')
+                return facade.get_places_near(latitude, longitude, radius_km, limit, fields=fields, include=include,
+                                              **prices), 200, validator_headers(version)
+
+            bbox = None
+            if request.args.get('bbox'):
+                bbox = parse_floats(request.args['bbox'], 4, 'bbox')
+            if fmt:
+                if request.args.get('sort'):
+                    raise ValueError("A stream is in creation order and cannot be combined with sort")
+                return stream_response(facade.iter_places(bbox=bbox, fields=fields, include=include, **prices), fmt)
+            sort = request.args.get('sort', 'created_at')
+            page = facade.get_places_page(limit, after, with_total, bbox=bbox, sort=sort,
+                                          fields=fields, include=include, **prices)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        return page.items, 200, dict(page_headers(page), **validator_headers(version))
 
     @api.expect(place_model)
     @api.response(201, 'Place successfully created')
@@ -55,32 +147,60 @@ class PlaceList(Resource):
     def post(self):
         """Register a new place (Authenticated Users Only)"""
         current_user = get_jwt_identity()
-        print(f"JWT Identity Retrieved: {current_user}")
 
         place_data = request.get_json()
 
         place_data["owner_id"] = current_user if isinstance(current_user, str) else current_user["id"]
 
-        print(f"Place Data: {place_data}")
-
         try:
             new_place = facade.create_place(place_data)
             return new_place, 201
         except ValueError as e:
             return {"error": str(e)}, 400
 
+@api.route('/search')
+class PlaceSearch(Resource):
+    """Full-text search over place titles, descriptions and reviews"""
+
+    @api.doc(params=dict(PAGE_PARAMS, **FIELDSET_PARAMS, q='Words that must all appear in the place or one of its reviews'))
+    @api.response(400, 'Invalid query parameters')
+    @cached_response('place_search', search_tags, search_version)
+    def get(self):
+        """Search places, best match first (Public Access)"""
+        try:
+            limit, after, with_total = get_page_args()
+            fields, include = get_fieldset_args()
+            page = facade.search_places(request.args.get('q', ''), limit, after, with_total,
+                                        fields=fields, include=include)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        return page.items, 200, page_headers(page)
+
 @api.route('/<place_id>')
 class PlaceResource(Resource):
     """Show a single place item and lets you update it"""
 
+    @api.doc(params=FIELDSET_PARAMS)
     @api.response(200, 'Place details retrieved successfully')
+    @api.response(400, 'Invalid fields or include')
     @api.response(404, 'Place not found')
+    @cached_response('place', place_tags, place_version)
     def get(self, place_id):
         """Get place details by ID (Public Access)"""
-        place = facade.get_place(place_id)
+        try:
+            fields, include = get_fieldset_args()
+            version = request_version(place_version, place_id)
+            if version is None:
+                return {"error": "Place not found"}, 404
+            cached = not_modified(version)
+            if cached:
+                return cached
+            place = facade.get_place(place_id, fields=fields, include=include)
+        except ValueError as e:
+            return {"error": str(e)}, 400
         if not place:
             return {"error": "Place not found"}, 404
-        return place, 200
+        return place, 200, validator_headers(version)
 
     @api.expect(place_model)
     @api.response(200, 'Place updated successfully')
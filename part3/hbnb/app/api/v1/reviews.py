@@ -2,7 +2,10 @@ from flask_restx import Namespace, Resource, fields
 from flask import request , jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.services.facade import HBnBFacade
-from app.services.review_service import ReviewService
+from app.api.v1.pagination import PAGE_PARAMS, get_page_args, page_headers
+from app.api.v1.streaming import STREAM_PARAMS, stream_format, stream_response
+from app.api.v1.conditional import not_modified, validator_headers
+from app.api.v1.caching import cached_response, request_version
 
 """ API module for reviews """
 
@@ -16,7 +19,6 @@ review_model = api.model('Review', {
 })
 
 facade = HBnBFacade()
-review_service = ReviewService(facade.storage)
 
 @api.route('/')
 class ReviewList(Resource):
@@ -44,20 +46,36 @@ class ReviewList(Resource):
         if place["owner_id"] == current_user["id"]:  # Changed from current_user to current_user["id"]
             return {'error': 'You cannot review your own place'}, 403
 
+        if facade.get_user_review_for_place(current_user["id"], review_data["place_id"]):
+            return {'error': 'You have already reviewed this place'}, 409
+
         try:
             new_review = facade.create_review(review_data)
             return new_review, 201
         except ValueError as e:
             return {'error': str(e)}, 400
 
+    @api.doc(params=dict(PAGE_PARAMS, **STREAM_PARAMS))
     @api.response(200, 'List of reviews retrieved successfully')
+    @api.response(400, 'Invalid pagination parameters')
+    @cached_response('reviews', lambda data: ["reviews"], facade.get_reviews_version)
     def get(self):
-        """Retrieve a list of all reviews (Public Access)"""
+        """Retrieve a page of reviews, or stream them all (Public Access)"""
         try:
-            reviews = facade.get_all_reviews()
-            if not reviews:
-                return {"message": "No reviews found"}, 200
-            return reviews, 200
+            fmt = stream_format()
+            if fmt:
+                return stream_response(facade.iter_reviews(), fmt)
+            limit, after, with_total = get_page_args()
+            version = request_version(facade.get_reviews_version)
+            cached = not_modified(version)
+            if cached:
+                return cached
+            page = facade.get_reviews_page(limit, after, with_total)
+            if not page.items and not after:
+                return {"message": "No reviews found"}, 200, validator_headers(version)
+            return page.items, 200, dict(page_headers(page), **validator_headers(version))
+        except ValueError as e:
+            return {'error': str(e)}, 400
         except Exception as e:
             return {'error': 'An error occurred while retrieving reviews'}, 500
 
@@ -67,13 +85,20 @@ class ReviewResource(Resource):
 
     @api.response(200, 'Review details retrieved successfully')
     @api.response(404, 'Review not found')
+    @cached_response('review', lambda data, review_id: [f"review:{review_id}"], facade.get_review_version)
     def get(self, review_id):
         """Get review details by ID (Public Access)"""
         try:
-            review = facade.get_review(review_id)
+            version = request_version(facade.get_review_version, review_id)
+            if version is None:
+                return {'error': 'Review not found'}, 404
+            cached = not_modified(version)
+            if cached:
+                return cached
+            review = facade.get_review(review_id, as_of=version.last_modified)
             if not review:
                 return {'error': 'Review not found'}, 404
-            return review.to_dict(), 200
+            return review.to_dict(), 200, validator_headers(version)
         except ValueError:
             return {'error': 'Review not found'}, 404
 
@@ -113,8 +138,7 @@ class ReviewResource(Resource):
         current_user_id = current_user["id"]  # Changed from current_user to current_user["id"]
 
         try:
-            # Fetch the review using the ReviewService
-            review = review_service.get_review(review_id)
+            review = facade.review_repo.get(review_id)
 
             # Check if the review exists
             if not review:
@@ -124,8 +148,7 @@ class ReviewResource(Resource):
             if review.user_id != current_user_id:
                 return jsonify({"message": "You are not authorized to delete this review"}), 403
 
-            # Proceed with deleting the review using ReviewService
-            review_service.delete_review(review_id, current_user_id)
+            facade.delete_review(review_id)
 
             # ✅ Return an empty response with 204 No Content (no jsonify)
             return '', 204
@@ -137,16 +160,31 @@ class ReviewResource(Resource):
 class PlaceReviewList(Resource):
     """ Show a list of all reviews for a specific place """
 
+    @api.doc(params=dict(PAGE_PARAMS, min_rating='Only reviews rated at least this much (1-5)'))
     @api.response(200, 'List of reviews for the place retrieved successfully')
+    @api.response(400, 'Invalid query parameters')
     @api.response(404, 'Place not found')
+    @cached_response('place_reviews', lambda data, place_id: [f"place:{place_id}"], facade.get_place_reviews_version)
     def get(self, place_id):
-        """Get all reviews for a specific place (Public Access)"""
+        """Get a page of reviews for a specific place, newest first (Public Access)"""
+        version = request_version(facade.get_place_reviews_version, place_id)
+        if version is None:
+            return {'error': 'Place not found'}, 404
+        cached = not_modified(version)
+        if cached:
+            return cached
         try:
-            reviews = facade.get_reviews_by_place(place_id)
-            if not reviews:
-                return {"message": "No reviews found for this place"}, 200
-            return reviews, 200
+            limit, after, with_total = get_page_args()
+            min_rating = request.args.get('min_rating')
+            if min_rating is not None:
+                if not min_rating.isdigit():
+                    raise ValueError("min_rating must be an integer between 1 and 5")
+                min_rating = int(min_rating)
+            page = facade.get_reviews_by_place(place_id, limit, after, min_rating, with_total)
+            if not page.items and not after:
+                return {"message": "No reviews found for this place"}, 200, validator_headers(version)
+            return page.items, 200, dict(page_headers(page), **validator_headers(version))
         except ValueError as e:
-            return {'error': str(e)}, 404
+            return {'error': str(e)}, 400
         except Exception as e:
-            return {'error': 'An error occurred while retrieving reviews'}, 500
\ No newline at end of file
+            return {'error': 'An error occurred while retrieving reviews'}, 500
@@ -0,0 +1,61 @@
+import json
+from flask import Response, request, stream_with_context
+""" Streamed JSON responses for endpoints that can return a whole collection """
+
+NDJSON = 'application/x-ndjson'
+
+STREAM_PARAMS = {
+    'stream': 'Set to 1 to stream the whole collection as one JSON array instead of a page; '
+              'send Accept: application/x-ndjson for one JSON object per line'
+}
+
+# Serialized rows are written in blocks of this many, so the server neither
+# holds the collection in memory nor makes one write per row.
+ROWS_PER_CHUNK = 200
+
+
+def stream_format():
+    """Return 'ndjson' or 'json' when the client asked for a stream, else None"""
+    if request.accept_mimetypes.best_match(['application/json', NDJSON]) == NDJSON:
+        return 'ndjson'
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return 'json'
+    return None
+
+
+def _chunks(lines):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def _ndjson(items):
+    for item in items:
+        yield json.dumps(item) + '\n'
+
+
+def _json_array(items):
+    yield '['
+    separator = ''
+    for item in items:
+        yield separator + json.dumps(item)
+        separator = ','
+    yield ']'
+
+
+def stream_response(items, fmt):
+    """Stream an iterable of JSON-serializable items as NDJSON or a JSON array
+
+    `items` is consumed while the response is written, inside the request
+    context, so it may lazily read from the database.
+    """
+    if fmt == 'ndjson':
+        body, mimetype = _ndjson(items), NDJSON
+    else:
+        body, mimetype = _json_array(items), 'application/json'
+    return Response(stream_with_context(_chunks(body)), mimetype=mimetype)
@@ -1,6 +1,7 @@
 from flask_restx import Namespace, Resource, fields
 from app.services import facade
 from flask import request, jsonify
+from app.api.v1.pagination import PAGE_PARAMS, get_page_args, page_headers
 """ API endpoints for user management """
 
 api = Namespace('users', description='User operations')
@@ -23,10 +24,16 @@ user_update_model = api.model('UserUpdate', {
 @api.route('/')
 class UserList(Resource):
     """Resource for user list"""
+    @api.doc(params=PAGE_PARAMS)
     @api.response(200, 'List of users retrieved successfully')
+    @api.response(400, 'Invalid pagination parameters')
     def get(self):
-        """Retrieve all users"""
-        users = facade.get_all_users()
+        """Retrieve a page of users"""
+        try:
+            limit, after, with_total = get_page_args()
+            page = facade.get_users_page(limit, after, with_total)
+        except ValueError as e:
+            return {'error': str(e)}, 400
         user_list = [
             {
                 'id': user.id, 
@@ -35,9 +42,9 @@ class UserList(Resource):
                 'email': user.email
                 # Note: Never return password in responses
             } 
-            for user in users
+            for user in page.items
         ]
-        return user_list, 200
+        return user_list, 200, page_headers(page)
 
     @api.expect(user_model, validate=True)
     @api.response(201, 'User successfully created')
@@ -0,0 +1,496 @@
+import http.client
+import itertools
+import json
+import math
+import platform
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+import click
+from werkzeug.serving import WSGIRequestHandler, make_server
+from app import create_app
+from app.api.v1.auth import issue_tokens
+from app.extensions import db
+from app.persistence.synthetic import ADJECTIVES, AMENITIES, CITIES, KINDS, WORDS, zipf_counts
+from app.services import facade
+from config import BenchmarkConfig
+""" Benchmark harness for the HBnB API, run with `python -m app.benchmark`
+
+Each run builds a fresh app on a temporary SQLite database, seeds it with a
+deterministic dataset and drives the API twice: first the read routes over
+HTTP with a multi-threaded load generator, while the data is still as
+seeded, then every route sequentially through the Flask test client, whose
+write scenarios change it. The report is JSON with stable keys so two runs
+can be compared.
+"""
+
+DEFAULT_SIZES = {"users": 200, "places": 1000, "amenities": 30, "reviews": 8000}
+PASSWORD = "benchmark-password"
+CHUNK_SIZE = 500
+
+Call = namedtuple("Call", "path json token body")
+Call.__new__.__defaults__ = (None, None, None)
+
+Scenario = namedtuple("Scenario", "name method rule prepare read")
+
+
+class Dataset:
+    """IDs of the seeded rows that scenarios build their requests from"""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.users = []
+        self.emails = {}
+        self.places = []
+        self.owner_of = {}
+        self.amenities = []
+        self.reviews = []
+        self.author_of = {}
+        self._serial = itertools.count()
+
+    def pick(self, items, i):
+        return items[i % len(items)]
+
+    def counts(self):
+        return {"users": len(self.users), "places": len(self.places),
+                "amenities": len(self.amenities), "reviews": len(self.reviews)}
+
+    def token(self, user_id, kind="access_token", admin=False):
+        """Return a token for `user_id`, needs an app context"""
+        return issue_tokens({"id": user_id, "is_admin": admin})[kind]
+
+    def new_user(self):
+        """Create a user outside of the measured request and return its ID"""
+        n = next(self._serial)
+        user_id, = facade.bulk_create_users([_user_row(f"bench-{n}@example.com")])
+        return user_id
+
+    def new_review(self, place_id):
+        """Create a review by a new user and return the IDs of both"""
+        user_id = self.new_user()
+        review_id, = facade.bulk_create_reviews([_review_row(self.rng, user_id, place_id)])
+        return review_id, user_id
+
+
+def _user_row(email):
+    return {"first_name": "Bench", "last_name": "User", "email": email, "password": PASSWORD}
+
+
+def _place_row(rng, owner_id, amenity_ids):
+    city, latitude, longitude = rng.choice(CITIES)
+    return {
+        "title": f"{rng.choice(ADJECTIVES)} {rng.choice(KINDS)} in {city}",
+        "description": " ".join(rng.choices(WORDS, k=12)),
+        "price": round(rng.lognormvariate(4.5, 0.5), 2),
+        "latitude": max(-90.0, min(90.0, rng.gauss(latitude, 0.05))),
+        "longitude": max(-180.0, min(180.0, rng.gauss(longitude, 0.05))),
+        "owner_id": owner_id,
+        "amenities": amenity_ids,
+    }
+
+
+def _review_row(rng, user_id, place_id):
+    return {"text": " ".join(rng.choices(WORDS, k=rng.randint(4, 30))).capitalize(),
+            "rating": rng.choices((1, 2, 3, 4, 5), (1, 1, 3, 8, 12))[0],
+            "user_id": user_id, "place_id": place_id}
+
+
+def seed(sizes, seed=0):
+    """Fill the database of the current app context and return the Dataset
+
+    Places cluster around a few cities and review counts per place follow a
+    Zipf distribution; no user reviews a place twice or reviews their own.
+    """
+    data = Dataset(seed)
+    rng = data.rng
+
+    emails = [f"user{n}@example.com" for n in range(sizes["users"])]
+    for chunk in _chunks(emails):
+        ids = facade.bulk_create_users([_user_row(email) for email in chunk])
+        data.users.extend(ids)
+        data.emails.update(zip(ids, chunk))
+
+    names = [AMENITIES[n] if n < len(AMENITIES) else f"{AMENITIES[n % len(AMENITIES)]} {n}"
+             for n in range(sizes["amenities"])]
+    for chunk in _chunks(names):
+        data.amenities.extend(facade.bulk_create_amenities([{"name": name} for name in chunk]))
+
+    if data.users:
+        for chunk in _chunks(range(sizes["places"])):
+            rows = [_place_row(rng, rng.choice(data.users),
+                               rng.sample(data.amenities, rng.randint(0, min(8, len(data.amenities)))))
+                    for _ in chunk]
+            ids = facade.bulk_create_places(rows)
+            data.places.extend(ids)
+            data.owner_of.update((place_id, row["owner_id"]) for place_id, row in zip(ids, rows))
+
+    rows = []
+    counts = zipf_counts(sizes["reviews"], len(data.places), cap=max(0, len(data.users) - 1))
+    rng.shuffle(counts)
+    for place_id, count in zip(data.places, counts):
+        reviewers = [user_id for user_id in rng.sample(data.users, min(count + 1, len(data.users)))
+                     if user_id != data.owner_of[place_id]]
+        rows.extend(_review_row(rng, user_id, place_id) for user_id in reviewers[:count])
+    for chunk in _chunks(rows):
+        ids = facade.bulk_create_reviews(chunk)
+        data.reviews.extend(ids)
+        data.author_of.update((review_id, row["user_id"]) for review_id, row in zip(ids, chunk))
+    return data
+
+
+def _chunks(items):
+    items = list(items)
+    for start in range(0, len(items), CHUNK_SIZE):
+        yield items[start:start + CHUNK_SIZE]
+
+
+def _near(data, i):
+    city, latitude, longitude = data.pick(CITIES, i)
+    return Call(f"/api/v1/places/?near={latitude},{longitude}&radius_km=10")
+
+
+def _bbox(data, i):
+    city, latitude, longitude = data.pick(CITIES, i)
+    return Call(f"/api/v1/places/?bbox={longitude - 0.1},{latitude - 0.1},{longitude + 0.1},{latitude + 0.1}")
+
+
+def _place_create(data, i):
+    row = _place_row(data.rng, None, data.rng.sample(data.amenities, min(3, len(data.amenities))))
+    del row["owner_id"]
+    return Call("/api/v1/places/", row, data.token(data.pick(data.users, i)))
+
+
+def _review_create(data, i):
+    user_id = data.new_user()
+    return Call("/api/v1/reviews/", _review_row(data.rng, user_id, data.pick(data.places, i)),
+                data.token(user_id))
+
+
+def _review_update(data, i):
+    review_id = data.pick(data.reviews, i)
+    return Call(f"/api/v1/reviews/{review_id}", {"text": f"Updated review {i}", "rating": 4},
+                data.token(data.author_of[review_id]))
+
+
+def _review_delete(data, i):
+    review_id, user_id = data.new_review(data.pick(data.places, i))
+    return Call(f"/api/v1/reviews/{review_id}", token=data.token(user_id))
+
+
+def _import(data, i):
+    """Import a batch of ten places as NDJSON"""
+    rows = []
+    for _ in range(10):
+        row = _place_row(data.rng, None, data.rng.sample(data.amenities, min(3, len(data.amenities))))
+        del row["owner_id"]
+        row["owner_email"] = data.emails[data.pick(data.users, i)]
+        rows.append(json.dumps(row))
+    admin_id = data.pick(data.users, i)
+    return Call("/api/v1/admin/import/places", token=data.token(admin_id, admin=True),
+                body="\n".join(rows).encode())
+
+
+def _export(data, i):
+    """Export the places table"""
+    return Call("/api/v1/admin/export/?tables=places", token=data.token(data.pick(data.users, i), admin=True))
+
+
+def _user_update(data, i):
+    user_id = data.pick(data.users, i)
+    return Call(f"/api/v1/users/{user_id}",
+                {"first_name": f"Renamed {i}", "last_name": "User", "email": data.emails[user_id]})
+
+
+SCENARIOS = (
+    Scenario("places", "GET", "/api/v1/places/", lambda data, i: Call("/api/v1/places/"), True),
+    Scenario("places_embedded", "GET", "/api/v1/places/",
+             lambda data, i: Call("/api/v1/places/?sort=-rating&include=owner,reviews[:3]"), True),
+    Scenario("places_near", "GET", "/api/v1/places/", _near, True),
+    Scenario("places_bbox", "GET", "/api/v1/places/", _bbox, True),
+    Scenario("place_search", "GET", "/api/v1/places/search",
+             lambda data, i: Call(f"/api/v1/places/search?q={data.pick(KINDS, i)}"), True),
+    Scenario("place", "GET", "/api/v1/places/<place_id>",
+             lambda data, i: Call(f"/api/v1/places/{data.pick(data.places, i)}"), True),
+    Scenario("reviews", "GET", "/api/v1/reviews/", lambda data, i: Call("/api/v1/reviews/"), True),
+    Scenario("review", "GET", "/api/v1/reviews/<review_id>",
+             lambda data, i: Call(f"/api/v1/reviews/{data.pick(data.reviews, i)}"), True),
+    Scenario("place_reviews", "GET", "/api/v1/reviews/places/<place_id>/reviews",
+             lambda data, i: Call(f"/api/v1/reviews/places/{data.pick(data.places, i)}/reviews"), True),
+    Scenario("amenities", "GET", "/api/v1/amenities/", lambda data, i: Call("/api/v1/amenities/"), True),
+    Scenario("amenity", "GET", "/api/v1/amenities/<amenity_id>",
+             lambda data, i: Call(f"/api/v1/amenities/{data.pick(data.amenities, i)}"), True),
+    Scenario("users", "GET", "/api/v1/users/", lambda data, i: Call("/api/v1/users/"), True),
+    Scenario("user", "GET", "/api/v1/users/<user_id>",
+             lambda data, i: Call(f"/api/v1/users/{data.pick(data.users, i)}"), True),
+    Scenario("protected", "GET", "/api/v1/auth/protected",
+             lambda data, i: Call("/api/v1/auth/protected", token=data.token(data.pick(data.users, i))), True),
+    Scenario("login", "POST", "/api/v1/auth/login",
+             lambda data, i: Call("/api/v1/auth/login", {"email": data.emails[data.pick(data.users, i)],
+                                                         "password": PASSWORD}), False),
+    Scenario("refresh", "POST", "/api/v1/auth/refresh",
+             lambda data, i: Call("/api/v1/auth/refresh",
+                                  token=data.token(data.pick(data.users, i), "refresh_token")), False),
+    Scenario("user_create", "POST", "/api/v1/users/",
+             lambda data, i: Call("/api/v1/users/", _user_row(f"created{i}@example.com")), False),
+    Scenario("user_update", "PUT", "/api/v1/users/<user_id>", _user_update, False),
+    Scenario("user_delete", "DELETE", "/api/v1/users/<user_id>",
+             lambda data, i: Call(f"/api/v1/users/{data.new_user()}"), False),
+    Scenario("amenity_create", "POST", "/api/v1/amenities/",
+             lambda data, i: Call("/api/v1/amenities/", {"name": f"Created amenity {i}"}), False),
+    Scenario("amenity_update", "PUT", "/api/v1/amenities/<amenity_id>",
+             lambda data, i: Call(f"/api/v1/amenities/{data.pick(data.amenities, i)}",
+                                  {"name": f"Renamed amenity {i}"}), False),
+    Scenario("place_create", "POST", "/api/v1/places/", _place_create, False),
+    Scenario("review_create", "POST", "/api/v1/reviews/", _review_create, False),
+    Scenario("review_update", "PUT", "/api/v1/reviews/<review_id>", _review_update, False),
+    Scenario("review_delete", "DELETE", "/api/v1/reviews/<review_id>", _review_delete, False),
+    Scenario("import_places", "POST", "/api/v1/admin/import/<kind>", _import, False),
+    Scenario("export_places", "GET", "/api/v1/admin/export/", _export, False),
+)
+
+
+def uncovered_routes(app, scenarios=SCENARIOS):
+    """Return the (rule, method) pairs of the API that no scenario exercises"""
+    covered = {(scenario.rule, scenario.method) for scenario in scenarios}
+    routes = {(rule.rule, method) for rule in app.url_map.iter_rules()
+              if rule.rule.startswith("/api/v1/")
+              for method in rule.methods - {"HEAD", "OPTIONS"}}
+    return sorted(routes - covered)
+
+
+def _headers(call):
+    headers = {}
+    if call.token:
+        headers["Authorization"] = f"Bearer {call.token}"
+    if call.json is not None:
+        headers["Content-Type"] = "application/json"
+    elif call.body is not None:
+        headers["Content-Type"] = "application/x-ndjson"
+    return headers
+
+
+def _queries(headers):
+    count = headers.get("X-Query-Count")
+    return int(count) if count is not None else None
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of sorted `values`"""
+    if not values:
+        return None
+    return values[max(0, min(len(values) - 1, math.ceil(pct / 100 * len(values)) - 1))]
+
+
+def summarize(samples, elapsed):
+    """Reduce (seconds, status, queries) samples to counts, latencies and throughput"""
+    latencies = sorted(seconds * 1000 for seconds, _, _ in samples)
+    queries = [count for _, _, count in samples if count is not None]
+    statuses = {}
+    for _, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, status, _ in samples if status is None or status >= 500),
+        "failed": sum(1 for _, status, _ in samples if status is None or not 200 <= status < 300),
+        "statuses": dict(sorted(statuses.items())),
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            **{f"p{pct}": _round(percentile(latencies, pct)) for pct in (50, 95, 99)},
+            "max": _round(latencies[-1] if latencies else None),
+        },
+        "queries": {
+            "mean": round(sum(queries) / len(queries), 2) if queries else None,
+            "max": max(queries) if queries else None,
+        },
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+
+def run_test_client(app, data, scenarios, requests):
+    """Issue each scenario `requests` times in turn through the test client"""
+    client = app.test_client()
+    report = {}
+    for scenario in scenarios:
+        samples = []
+        for i in range(requests):
+            with app.app_context():
+                call = scenario.prepare(data, i)
+            start = time.perf_counter()
+            response = client.open(call.path, method=scenario.method, json=call.json, data=call.body,
+                                   headers=_headers(call))
+            response.get_data()
+            samples.append((time.perf_counter() - start, response.status_code, _queries(response.headers)))
+        report[scenario.name] = summarize(samples, sum(seconds for seconds, _, _ in samples))
+    return report
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def _load_worker(port, calls, offset, deadline, budget, results):
+    """Send requests round-robin over `calls` until the deadline or the shared budget runs out"""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    for i in itertools.count(offset):
+        if time.perf_counter() >= deadline or next(budget) <= 0:
+            break
+        scenario, call = calls[i % len(calls)]
+        body = json.dumps(call.json) if call.json is not None else call.body
+        start = time.perf_counter()
+        try:
+            connection.request(scenario.method, call.path, body=body, headers=_headers(call))
+            response = connection.getresponse()
+            response.read()
+            sample = (time.perf_counter() - start, response.status, _queries(response.headers))
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            sample = (time.perf_counter() - start, None, None)
+        results.setdefault(scenario.name, []).append(sample)
+    connection.close()
+
+
+def run_http(app, data, scenarios, threads, duration, requests=None, variants=64):
+    """Drive the read scenarios over HTTP from `threads` client threads
+
+    Requests are prepared up front, `variants` per scenario, so the client
+    threads only send them. The run stops after `duration` seconds or once
+    `requests` have been sent, whichever comes first.
+    """
+    with app.app_context():
+        calls = [(scenario, scenario.prepare(data, i)) for i in range(variants)
+                 for scenario in scenarios if scenario.read]
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=_QuietHandler)
+    server_thread = threading.Thread(target=server.serve_forever, name="benchmark-server", daemon=True)
+    server_thread.start()
+
+    remaining = itertools.count(requests, -1) if requests else itertools.repeat(1)
+    results = [{} for _ in range(threads)]
+    start = time.perf_counter()
+    workers = [threading.Thread(target=_load_worker,
+                                args=(server.server_port, calls, n * len(calls) // threads,
+                                      start + duration, remaining, results[n]))
+               for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server_thread.join()
+
+    merged = {}
+    for shard in results:
+        for name, samples in shard.items():
+            merged.setdefault(name, []).extend(samples)
+    report = summarize([sample for samples in merged.values() for sample in samples], elapsed)
+    report.update(threads=threads, elapsed_s=round(elapsed, 3),
+                  routes={name: summarize(merged[name], elapsed) for name in sorted(merged)})
+    return report
+
+
+def compare(baseline, report):
+    """Return the ratio of each route's p95 latency and throughput to those of `baseline`"""
+    changes = {}
+    for phase in ("test_client", "http"):
+        before = baseline.get(phase, {})
+        after = report.get(phase, {})
+        if phase == "http":
+            before, after = before.get("routes", {}), after.get("routes", {})
+        for name in sorted(set(before) & set(after)):
+            old, new = before[name], after[name]
+            changes.setdefault(phase, {})[name] = {
+                "p95_ms": _ratio(new["latency_ms"]["p95"], old["latency_ms"]["p95"]),
+                "throughput_rps": _ratio(new["throughput_rps"], old["throughput_rps"]),
+                "queries": _ratio(new["queries"]["mean"], old["queries"]["mean"]),
+            }
+    return changes
+
+
+def _ratio(new, old):
+    return round(new / old, 3) if new is not None and old else None
+
+
+def failed_routes(report):
+    """Return the scenarios that got a non-2xx response in either phase
+
+    Their timings measure an error path rather than the route itself.
+    """
+    phases = (report["http"]["routes"], report["test_client"])
+    return sorted({name for phase in phases for name, summary in phase.items() if summary["failed"]})
+
+
+def run_benchmark(sizes=None, seed_value=0, requests=50, threads=8, duration=10.0, http_requests=None,
+                  response_cache=False, scenarios=SCENARIOS):
+    """Build a seeded app on a temporary database, benchmark it and return the report"""
+    sizes = dict(DEFAULT_SIZES, **(sizes or {}))
+    with tempfile.TemporaryDirectory(prefix="hbnb-bench-") as directory:
+        config = type("RunConfig", (BenchmarkConfig,), {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{directory}/bench.db",
+            "RESPONSE_CACHE_ENABLED": response_cache,
+        })
+        app = create_app(config)
+        started = time.perf_counter()
+        with app.app_context():
+            data = seed(sizes, seed_value)
+        seeded = time.perf_counter() - started
+
+        report = {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "seed": seed_value,
+            "sizes": sizes,
+            "dataset": data.counts(),
+            "seed_s": round(seeded, 3),
+            "options": {"requests": requests, "threads": threads, "duration_s": duration,
+                        "http_requests": http_requests, "response_cache": response_cache},
+            "environment": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                            "platform": platform.platform()},
+            "uncovered_routes": [" ".join(pair) for pair in uncovered_routes(app, scenarios)],
+        }
+        report["http"] = run_http(app, data, scenarios, threads, duration, http_requests)
+        report["test_client"] = run_test_client(app, data, scenarios, requests)
+        report["failed_routes"] = failed_routes(report)
+        with app.app_context():
+            db.engine.dispose()
+    return report
+
+
+@click.command()
+@click.option("--users", default=DEFAULT_SIZES["users"], type=click.IntRange(min=2), show_default=True)
+@click.option("--places", default=DEFAULT_SIZES["places"], type=click.IntRange(min=1), show_default=True)
+@click.option("--amenities", default=DEFAULT_SIZES["amenities"], type=click.IntRange(min=1), show_default=True)
+@click.option("--reviews", default=DEFAULT_SIZES["reviews"], type=click.IntRange(min=1), show_default=True, help="Total, spread over places")
+@click.option("--seed", "seed_value", default=0, show_default=True, help="Seed of the dataset")
+@click.option("--requests", default=50, show_default=True, help="Test client requests per route")
+@click.option("--threads", default=8, show_default=True, help="HTTP load generator threads")
+@click.option("--duration", default=10.0, show_default=True, help="Seconds of HTTP load")
+@click.option("--http-requests", type=int, help="Stop the HTTP load after this many requests")
+@click.option("--response-cache/--no-response-cache", default=False, show_default=True)
+@click.option("--baseline", type=click.File(), help="Earlier report to compare this run against")
+@click.option("--output", "-o", type=click.File("w"), default="-", help="Report file, stdout by default")
+def main(users, places, amenities, reviews, seed_value, requests, threads, duration, http_requests,
+         response_cache, baseline, output):
+    """Benchmark every API route and write a JSON report"""
+    report = run_benchmark({"users": users, "places": places, "amenities": amenities, "reviews": reviews},
+                           seed_value, requests, threads, duration, http_requests, response_cache)
+    if baseline is not None:
+        report["compared_to_baseline"] = compare(json.load(baseline), report)
+    for route in report["uncovered_routes"]:
+        click.echo(f"warning: no scenario for {route}", err=True)
+    for name in report["failed_routes"]:
+        click.echo(f"warning: scenario {name} got non-2xx responses", err=True)
+    json.dump(report, output, indent=2)
+    output.write("\n")
+
+
+if __name__ == "__main__":
+    main()
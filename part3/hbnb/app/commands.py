@@ -0,0 +1,124 @@
+import json
+import time
+import click
+from flask import current_app
+from app.extensions import db
+from app.hashing import hasher
+from app.persistence import export, migrations, synthetic
+from app.persistence.cache import clear_caches
+from app.services import facade, importing
+""" Flask CLI commands, run with `flask --app run <command>` """
+
+
+@click.command('db-upgrade')
+@click.option('--drop-duplicate-reviews', is_flag=True,
+              help='Delete all but the oldest review of each user for a place so the unique index can be built')
+def db_upgrade(drop_duplicate_reviews):
+    """Apply pending schema migrations to the configured database"""
+    version = migrations.upgrade(db.engine)
+    click.echo(f"Database schema at version {version}")
+    if drop_duplicate_reviews:
+        deleted = migrations.drop_duplicate_reviews(db.engine)
+        clear_caches()
+        click.echo(f"Deleted {deleted} duplicate review(s)")
+        return
+    with db.engine.connect() as connection:
+        duplicates = migrations.count_duplicate_reviews(connection)
+    if duplicates:
+        click.echo(f"{duplicates} duplicate review(s) block the unique (user_id, place_id) index, "
+                   "rerun with --drop-duplicate-reviews to delete them", err=True)
+
+
+@click.command('ratings-repair')
+def ratings_repair():
+    """Recompute place review aggregates and report the places that drifted"""
+    drifted = facade.repair_place_ratings()
+    clear_caches()
+    for place_id in drifted:
+        click.echo(f"Repaired {place_id}")
+    click.echo(f"{len(drifted)} place(s) had drifted review aggregates")
+
+
+@click.command('tokens-purge')
+def tokens_purge():
+    """Drop deny list entries of refresh tokens that have expired"""
+    click.echo(f"{facade.purge_revoked_tokens()} expired token(s) purged")
+
+
+@click.command('data-generate')
+@click.option('--users', default=10000, show_default=True, type=click.IntRange(min=1))
+@click.option('--places', default=10000, show_default=True, type=click.IntRange(min=0))
+@click.option('--amenities', default=30, show_default=True, type=click.IntRange(min=0))
+@click.option('--reviews', default=100000, show_default=True, type=click.IntRange(min=0),
+              help='Total, spread over places')
+@click.option('--seed', default=0, show_default=True, help='Same seed and sizes, same data')
+@click.option('--zipf', 'exponent', default=1.0, show_default=True, type=click.FloatRange(min=0),
+              help='Exponent of the distribution of reviews per place, 0 is uniform')
+@click.option('--password', default='password', show_default=True, help='Password of every generated user')
+@click.option('--chunk-size', default=synthetic.CHUNK_SIZE, show_default=True, type=click.IntRange(min=1),
+              help='Rows per INSERT transaction')
+def data_generate(users, places, amenities, reviews, seed, exponent, password, chunk_size):
+    """Fill the configured database with deterministic synthetic data"""
+    started = time.perf_counter()
+
+    def progress(table, rows):
+        click.echo(f"{table}: {rows} row(s) after {time.perf_counter() - started:.1f}s")
+
+    try:
+        written = synthetic.generate(db.engine, users, places, amenities, reviews, seed, exponent,
+                                     hasher.hash(password, block=True), chunk_size, progress)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    clear_caches()
+    summary = ", ".join(f"{rows} {table}" for table, rows in written.items())
+    click.echo(f"Generated {summary} in {time.perf_counter() - started:.1f}s")
+
+
+@click.command('data-import')
+@click.argument('kind', type=click.Choice(sorted(importing.FIELDS)))
+@click.argument('source', type=click.File('rb'))
+@click.option('--format', 'fmt', type=click.Choice(sorted(importing.FORMATS)),
+              help='Taken from the file extension when omitted')
+@click.option('--batch-size', type=click.IntRange(min=1), help='Defaults to IMPORT_BATCH_SIZE')
+@click.option('--dry-run', is_flag=True, help='Validate every record without writing any')
+@click.option('--report', type=click.File('w'), help='Write the full JSON report to this file')
+def data_import(kind, source, fmt, batch_size, dry_run, report):
+    """Import amenities, places or reviews from a CSV or NDJSON file, - for stdin"""
+    if fmt is None:
+        fmt = 'csv' if source.name.lower().endswith('.csv') else 'ndjson'
+    config = current_app.config
+    result = facade.import_records(kind, importing.read_records(source, fmt),
+                                   batch_size or config.get('IMPORT_BATCH_SIZE', 1000), dry_run,
+                                   config.get('IMPORT_ERROR_LIMIT', 1000))
+    for error in result.errors:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+    if report is not None:
+        json.dump(result.to_dict(), report, indent=2)
+    verb = 'would be imported' if dry_run else 'imported'
+    click.echo(f"{result.rows} record(s), {result.imported} {verb}, {result.failed} rejected")
+
+
+@click.command('data-export')
+@click.argument('output', type=click.File('wb'), default='-')
+@click.option('--table', 'tables', multiple=True, type=click.Choice(list(export.TABLES)),
+              help='Export only this table, repeatable')
+@click.option('--gzip/--no-gzip', 'compress', default=None,
+              help='Compress the output, by default when OUTPUT ends with .gz')
+@click.option('--batch-size', type=click.IntRange(min=1), help='Defaults to EXPORT_BATCH_SIZE')
+def data_export(output, tables, compress, batch_size):
+    """Write every table as NDJSON from one read snapshot to OUTPUT, - for stdout"""
+    if compress is None:
+        compress = output.name.lower().endswith('.gz')
+    for chunk in facade.export_dataset(tables, batch_size or current_app.config.get('EXPORT_BATCH_SIZE', 1000),
+                                       compress):
+        output.write(chunk)
+
+
+def register_commands(app):
+    """Register the HBnB CLI commands on the application"""
+    app.cli.add_command(db_upgrade)
+    app.cli.add_command(ratings_repair)
+    app.cli.add_command(tokens_purge)
+    app.cli.add_command(data_generate)
+    app.cli.add_command(data_import)
+    app.cli.add_command(data_export)
@@ -1,5 +1,6 @@
 from flask_bcrypt import Bcrypt
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+# Committed objects keep their loaded state so a write is never re-read
+db = SQLAlchemy(session_options={"expire_on_commit": False})
 bcrypt = Bcrypt()
\ No newline at end of file
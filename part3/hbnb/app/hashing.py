@@ -0,0 +1,79 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.extensions import bcrypt
+""" Password hashing on a dedicated, bounded pool of threads
+
+bcrypt is deliberately slow and releases the GIL while it runs, so a few
+threads are enough to keep every core busy. Bounding the number of hashes
+running or waiting keeps a burst of logins from tying up every request
+worker: past the bound, callers get HashingBusy at once instead of queueing.
+"""
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+
+class PasswordHasher:
+    """Runs bcrypt on `workers` threads with at most `queue_size` hashes waiting"""
+
+    def __init__(self, workers=2, queue_size=16, rounds=12):
+        self.rounds = rounds
+        self._executor = None
+        self.resize(workers, queue_size)
+
+    def resize(self, workers, queue_size):
+        """Replace the pool; hashes already submitted finish on the old one"""
+        old = self._executor
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        if old is not None:
+            old.shutdown(wait=False)
+
+    def _run(self, fn, *args, block=False):
+        """Run `fn` on the pool and wait for its result
+
+        Without `block`, raises HashingBusy when every worker is busy and the
+        queue is full; batch callers pass block=True to wait for a slot.
+        """
+        slots = self._slots
+        if not slots.acquire(blocking=block):
+            raise HashingBusy("Too many password operations in progress, retry shortly")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        return future.result()
+
+    def hash(self, password, block=False):
+        """Return the bcrypt hash of `password` at the configured cost"""
+        return self._run(bcrypt.generate_password_hash, password, self.rounds, block=block).decode('utf-8')
+
+    def check(self, password_hash, password):
+        """Return True when `password` matches `password_hash`"""
+        return self._run(bcrypt.check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Return True when `password_hash` was made with another cost than the configured one"""
+        try:
+            return int(password_hash.split('$')[2]) != self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return True
+
+
+hasher = PasswordHasher()
+
+
+def init_hashing(app):
+    """Apply the BCRYPT_LOG_ROUNDS and HASHING_* settings of `app`"""
+    bcrypt.init_app(app)
+    hasher.rounds = app.config.get("BCRYPT_LOG_ROUNDS", hasher.rounds)
+    workers = app.config.get("HASHING_WORKERS") or os.cpu_count() or 2
+    queue_size = app.config.get("HASHING_QUEUE_SIZE", hasher.queue_size)
+    if (workers, queue_size) != (hasher.workers, hasher.queue_size):
+        hasher.resize(workers, queue_size)
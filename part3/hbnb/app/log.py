@@ -0,0 +1,136 @@
+import atexit
+import itertools
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from flask import has_request_context, request
+""" Structured, leveled logging written by a background thread
+
+Modules log through logging.getLogger(__name__) with extra= fields. Records
+of the "app" logger are put on a bounded queue by the request thread and
+written as one JSON object per line by a listener thread, so a request never
+waits on log I/O; when the queue is full records are dropped and counted.
+"""
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format a record as a JSON object with its extra fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRS)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one record in `1 / rate` per logger for loggers with a sampling rate
+
+    Only records below WARNING are sampled; the count is kept on the record
+    so a reader can scale what they see back up.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = {}
+        for name, rate in rates.items():
+            self.rates[name] = (max(1, round(1 / rate)), itertools.count())
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        name = record.name
+        while name and name not in self.rates:
+            name = name.rpartition(".")[0]
+        if not name:
+            return True
+        every, counter = self.rates[name]
+        if next(counter) % every:
+            return False
+        record.sampled = every
+        return True
+
+
+class RequestContextFilter(logging.Filter):
+    """Add the method and path of the current request to records made while serving one"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.method = request.method
+            record.path = request.path
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener = None
+_handler = None
+_leveled = set()
+
+
+def init_logging(app):
+    """Route the "app" loggers through a background writer as configured by LOG_* settings"""
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+    for name in _leveled:
+        logging.getLogger(name).setLevel(logging.NOTSET)
+    _leveled.clear()
+
+    target = logging.StreamHandler(app.config.get("LOG_STREAM") or sys.stderr)
+    target.setFormatter(JsonFormatter())
+    handler = DroppingQueueHandler(queue.Queue(app.config.get("LOG_QUEUE_SIZE", 10000)))
+    handler.addFilter(SamplingFilter(app.config.get("LOG_SAMPLE_RATES", {})))
+    handler.addFilter(RequestContextFilter())
+
+    logger = logging.getLogger("app")
+    if _handler is not None:
+        logger.removeHandler(_handler)
+    logger.addHandler(handler)
+    logger.setLevel(app.config.get("LOG_LEVEL", "INFO"))
+    logger.propagate = False
+    for name, level in app.config.get("LOG_LEVELS", {}).items():
+        logging.getLogger(name).setLevel(level)
+        _leveled.add(name)
+
+    _handler = handler
+    _listener = QueueListener(handler.queue, target, respect_handler_level=True)
+    _listener.start()
+    return handler
+
+
+def flush_logs():
+    """Wait until every queued record has been written"""
+    if _handler is not None:
+        _handler.queue.join()
+
+
+@atexit.register
+def _flush():
+    if _listener is not None:
+        _listener.stop()
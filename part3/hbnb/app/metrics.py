@@ -0,0 +1,221 @@
+import bisect
+import threading
+import time
+from flask import Response, g, request
+from app.persistence import query_stats
+""" Request metrics exposed at /metrics in the Prometheus text format
+
+Every metric keeps one shard of values per thread. A thread only ever
+writes its own shard, so recording takes no lock; the lock is held only to
+register a new thread's shard and while a scrape sums them. Shards of
+threads that have exited are folded into one at scrape time, so servers
+that start a thread per request do not accumulate them.
+"""
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class _Metric:
+    """Base of the sharded metrics, keyed by a tuple of label values"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _collect(self):
+        """Return {labels: [values]} summed over every shard"""
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    _add(self._retired, shard)
+            self._shards = live
+            totals = {}
+            _add(totals, self._retired)
+        for thread, shard in live:
+            _add(totals, shard)
+        return totals
+
+    def _labels(self, labels, **extra):
+        pairs = list(zip(self.labelnames, labels)) + list(extra.items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, values in sorted(self._collect().items()):
+            lines.extend(self._samples(labels, values))
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic count per label set"""
+
+    kind = "counter"
+
+    def inc(self, labels, amount=1):
+        shard = self._shard()
+        values = shard.get(labels)
+        if values is None:
+            shard[labels] = [amount]
+        else:
+            values[0] += amount
+
+    def _samples(self, labels, values):
+        return [f"{self.name}{self._labels(labels)} {_number(values[0])}"]
+
+
+class Gauge(Counter):
+    """Value per label set that goes up and down, e.g. requests in flight"""
+
+    kind = "gauge"
+
+    def dec(self, labels, amount=1):
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    """Cumulative buckets, sum and count of observations per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        shard = self._shard()
+        values = shard.get(labels)
+        if values is None:
+            # One slot per bucket, one for +Inf, then the sum
+            values = shard[labels] = [0] * (len(self.buckets) + 2)
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def _samples(self, labels, values):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), values):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _number(bound)
+            lines.append(f"{self.name}_bucket{self._labels(labels, le=le)} {cumulative}")
+        lines.append(f"{self.name}_sum{self._labels(labels)} {_number(values[-1])}")
+        lines.append(f"{self.name}_count{self._labels(labels)} {cumulative}")
+        return lines
+
+
+def _add(totals, shard):
+    """Add the values of `shard` into `totals`, per label set"""
+    for labels, values in list(shard.items()):
+        total = totals.setdefault(labels, [0] * len(values))
+        for index, value in enumerate(values):
+            total[index] += value
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+ENDPOINT = ("endpoint", "method")
+
+request_duration = Histogram("hbnb_http_request_duration_seconds", "Time spent serving requests.",
+                             ENDPOINT, LATENCY_BUCKETS)
+requests_total = Counter("hbnb_http_requests_total", "Requests served, by status code.",
+                         ENDPOINT + ("status",))
+requests_in_flight = Gauge("hbnb_http_requests_in_flight", "Requests being served.", ENDPOINT)
+request_size = Histogram("hbnb_http_request_size_bytes", "Size of request bodies.", ENDPOINT, SIZE_BUCKETS)
+response_size = Histogram("hbnb_http_response_size_bytes", "Size of response bodies, streams excluded.",
+                          ENDPOINT, SIZE_BUCKETS)
+db_queries = Histogram("hbnb_db_queries_per_request", "SQL statements run per request.",
+                       ENDPOINT, QUERY_BUCKETS)
+db_duration = Histogram("hbnb_db_query_seconds_per_request", "Time spent in SQL statements per request.",
+                        ENDPOINT, LATENCY_BUCKETS)
+
+METRICS = (request_duration, requests_total, requests_in_flight, request_size, response_size,
+           db_queries, db_duration)
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _endpoint_labels():
+    return (request.endpoint or "none", request.method)
+
+
+def _before_request():
+    labels = _endpoint_labels()
+    g.metrics_labels = labels
+    g.metrics_start = time.perf_counter()
+    requests_in_flight.inc(labels)
+    if request.content_length:
+        request_size.observe(labels, request.content_length)
+
+
+def _after_request(response):
+    g.metrics_status = response.status_code
+    labels = g.get("metrics_labels")
+    if labels is not None and not response.is_streamed and response.content_length is not None:
+        response_size.observe(labels, response.content_length)
+    return response
+
+
+def _teardown_request(error=None):
+    labels = g.pop("metrics_labels", None)
+    if labels is None:
+        return
+    request_duration.observe(labels, time.perf_counter() - g.metrics_start)
+    requests_total.inc(labels + (str(g.get("metrics_status", 500)),))
+    requests_in_flight.dec(labels)
+    stats = query_stats.current()
+    if stats is not None:
+        db_queries.observe(labels, stats.count)
+        db_duration.observe(labels, stats.seconds)
+
+
+def metrics_view():
+    """Serve the metrics of this process"""
+    return Response(render(), mimetype=None, content_type=CONTENT_TYPE)
+
+
+def init_metrics(app):
+    """Record request and database metrics for `app` and serve them at /metrics
+
+    Database metrics need init_query_stats to have been called first.
+    """
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -1,7 +1,10 @@
+import logging
 import uuid
 from app.models.user import User
 """ Models module """
 
+log = logging.getLogger(__name__)
+
 class MemoryStorage:
     """Temporary in-memory storage"""
     
@@ -10,7 +13,7 @@ class MemoryStorage:
 
     def get(self, model, obj_id):
         """Gets an object by ID"""
-        print(f"Retrieving {model.__name__} with ID: {obj_id}")
+        log.debug("Retrieving object", extra={"model": model.__name__, "obj_id": obj_id})
         obj = self.data.get(obj_id)
         if obj and isinstance(obj, model):
             return obj
@@ -21,13 +24,13 @@ class MemoryStorage:
         if not hasattr(obj, 'id') or obj.id is None:
             obj.id = str(uuid.uuid4())
 
-        print(f"Saving {obj.__class__.__name__} with ID: {obj.id}")
+        log.debug("Saving object", extra={"model": obj.__class__.__name__, "obj_id": obj.id})
         self.data[obj.id] = obj
 
     def delete(self, obj):
         """Deletes an object by its ID"""
         if obj.id in self.data:
-            print(f"Deleting {obj.__class__.__name__} with ID: {obj.id}")
+            log.debug("Deleting object", extra={"model": obj.__class__.__name__, "obj_id": obj.id})
             del self.data[obj.id]
 
     def all(self, model=None):
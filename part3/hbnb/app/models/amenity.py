@@ -10,5 +10,12 @@ class Amenity(BaseModel, db.Model):
     name = db.Column(db.String(128), nullable=False, unique=True)
     places = relationship("Place", secondary="place_amenities", back_populates="amenities", lazy="select")
 
+    def to_dict(self):
+        """Convert Amenity object to a dictionary"""
+        return {
+            "id": str(self.id),
+            "name": self.name
+        }
+
     def __repr__(self):
         return f"<Amenity {self.name}>"
\ No newline at end of file
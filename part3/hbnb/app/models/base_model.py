@@ -8,7 +8,7 @@ class BaseModel(db.Model):
     __abstract__ = True 
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __init__(self, **kwargs):
@@ -17,6 +17,25 @@ class BaseModel(db.Model):
         for key, value in kwargs.items():
             setattr(self, key, value)
 
+    @classmethod
+    def validate_columns(cls, values):
+        """Run the @validates functions of the model over a dict of column values
+
+        Returns the values as the validators leave them, without building an
+        instance; a key that is not an attribute of the model raises TypeError.
+        """
+        mapper = cls.__mapper__
+        validated = {}
+        for key, value in values.items():
+            if key not in mapper.attrs:
+                raise TypeError(f"{key!r} is an invalid keyword argument for {cls.__name__}")
+            if key in mapper.validators:
+                # The validators only look at the value, never at the instance
+                validator, _ = mapper.validators[key]
+                value = validator(None, key, value)
+            validated[key] = value
+        return validated
+
     def save(self):
         """Update the updated_at timestamp and commit the session"""
         self.updated_at = datetime.utcnow()
@@ -11,46 +11,121 @@ place_amenities = db.Table(
     Column('amenity_id', Integer, ForeignKey('amenities.id'), primary_key=True)
 )
 
+RATINGS = range(1, 6)
+
 class Place(BaseModel, db.Model):
     """ A place to stay """
     __tablename__ = 'places'
+    __table_args__ = (
+        db.Index('ix_places_latitude_longitude', 'latitude', 'longitude'),
+    )
 
     title = db.Column(db.String(128), nullable=False)
     description = db.Column(db.String(1024), nullable=True)
-    price = db.Column(db.Float, nullable=False)
+    price = db.Column(db.Float, nullable=False, index=True)
     latitude = db.Column(db.Float, nullable=True)
     longitude = db.Column(db.Float, nullable=True)
 
+    # Review aggregates, kept up to date by the review writes of the facade
+    # and the repositories; `flask --app run ratings-repair` recomputes them.
+    review_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_1 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_2 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_3 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_4 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_5 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
     owner = db.relationship("User", back_populates="places")
-    owner_id = Column(String(60), ForeignKey('users.id'), nullable=False)
+    owner_id = Column(String(60), ForeignKey('users.id'), nullable=False, index=True)
 
     reviews = relationship("Review", back_populates="place", cascade="all, delete", lazy="select")
     amenities = relationship("Amenity", secondary="place_amenities", back_populates="places", lazy="select")
 
-    def to_dict(self):
-        """Convert Place object to a dictionary"""
-        return {
-            "id": str(self.id),
-            "title": self.title,
-            "description": self.description,
-            "price": float(self.price),
-            "latitude": float(self.latitude),
-            "longitude": float(self.longitude),
-            "owner_id": str(self.owner.id) if self.owner else None, 
-            "owner": {
+    # Scalar fields that ?fields= can select, with the columns each one reads
+    FIELDS = {
+        "title": ("title",),
+        "description": ("description",),
+        "price": ("price",),
+        "latitude": ("latitude",),
+        "longitude": ("longitude",),
+        "owner_id": ("owner_id",),
+        "review_count": ("review_count",),
+        "average_rating": ("review_count", "rating_sum"),
+        "rating_histogram": tuple(f"rating_{rating}" for rating in RATINGS),
+    }
+    EMBEDDABLE = ("owner", "amenities", "reviews")
+
+    def to_dict(self, fields=None, include=None, reviews=None):
+        """Convert Place object to a dictionary
+
+        Without arguments every field is set and the owner, reviews and
+        amenities are embedded. `fields` restricts the scalar fields (the id
+        is always set) and `include` maps the relations to embed to the
+        maximum number of items, None for all of them. `reviews` stands in
+        for the reviews collection when the caller loaded a capped list.
+        """
+        if fields is None and include is None:
+            include = {name: None for name in self.EMBEDDABLE}
+        data = {"id": str(self.id)}
+        for name in self.FIELDS if fields is None else fields:
+            data[name] = self._field(name)
+
+        include = include or {}
+        if "owner" in include:
+            data["owner"] = {
                 "id": str(self.owner.id),
                 "first_name": self.owner.first_name,
                 "last_name": self.owner.last_name,
                 "email": self.owner.email
-            } if self.owner else None,
-            "reviews": [
-                review.to_dict() for review in self.reviews or []
-            ] if isinstance(self.reviews, list) else [],
-            "amenities": [
-                amenity.to_dict() for amenity in self.amenities or []
-            ] if isinstance(self.amenities, list) else [],
-        }
+            } if self.owner else None
+        if "reviews" in include:
+            loaded = self.reviews if reviews is None else reviews
+            data["reviews"] = [review.to_dict() for review in list(loaded or [])[:include["reviews"]]]
+            data["reviews_total"] = self.review_count or 0
+        if "amenities" in include:
+            data["amenities"] = [amenity.to_dict() for amenity in list(self.amenities or [])[:include["amenities"]]]
+        return data
+
+    def _field(self, name):
+        """Return the serialized value of one of FIELDS"""
+        if name == "average_rating":
+            return self.average_rating()
+        if name == "rating_histogram":
+            return {str(rating): getattr(self, f"rating_{rating}") or 0 for rating in RATINGS}
+        value = getattr(self, name)
+        if name in ("price", "latitude", "longitude"):
+            return float(value)
+        if name == "review_count":
+            return value or 0
+        return value
+
+    def average_rating(self):
+        """Return the mean review rating rounded to 2 decimals, None without reviews"""
+        if not self.review_count:
+            return None
+        return round(self.rating_sum / self.review_count, 2)
+
+    def adjust_ratings(self, added=(), removed=()):
+        """Count reviews with the `added` ratings in and the `removed` ones out
 
+        The changes are written as in-place increments, so concurrent review
+        writes on the same place do not overwrite each other.
+        """
+        deltas = {rating: 0 for rating in RATINGS}
+        for rating in added:
+            deltas[rating] += 1
+        for rating in removed:
+            deltas[rating] -= 1
+        count = sum(deltas.values())
+        if count:
+            self.review_count = Place.review_count + count
+        total = sum(rating * delta for rating, delta in deltas.items())
+        if total:
+            self.rating_sum = Place.rating_sum + total
+        for rating, delta in deltas.items():
+            if delta:
+                setattr(self, f"rating_{rating}", getattr(Place, f"rating_{rating}") + delta)
 
     @validates('title')
     def validate_title(self, key, value):
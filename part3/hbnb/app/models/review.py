@@ -8,6 +8,10 @@ from sqlalchemy import Integer
 class Review(BaseModel, db.Model):
     """ Review class to store review information """
     __tablename__ = 'reviews'
+    __table_args__ = (
+        db.Index('uq_reviews_user_place', 'user_id', 'place_id', unique=True),
+        db.Index('ix_reviews_place_id_created_at', 'place_id', 'created_at', 'id'),
+    )
 
     text = db.Column(String(1024), nullable=False)
     rating = db.Column(Integer, nullable=False)
@@ -19,34 +23,17 @@ class Review(BaseModel, db.Model):
         """Convert Review object to a dictionary without nested objects"""
 
         if not hasattr(self, "id") or not self.id:
-            print("Error: Review ID is missing!")
             raise ValueError("Review object is missing an ID")
 
-        try:
-            print(f"Checking attributes:")
-            print(f"   - Text: {self.text}")
-            print(f"   - Rating: {self.rating}")
-            print(f"   - Place ID: {self.place_id}")
-            print(f"   - User ID: {self.user_id}")
-            print(f"   - Created At: {self.created_at}")
-            print(f"   - Updated At: {self.updated_at}")
-
-            review_dict = {
-                "id": str(self.id),
-                "text": self.text,
-                "rating": self.rating,
-                "place_id": self.place_id,
-                "user_id": self.user_id,
-                "created_at": self.created_at.isoformat(),
-                "updated_at": self.updated_at.isoformat(),
-            }
-
-            print(f"Successfully converted to dict: {review_dict}")
-            return review_dict
-
-        except Exception as e:
-            print(f"Exception inside to_dict(): {str(e)}")
-            raise
+        return {
+            "id": str(self.id),
+            "text": self.text,
+            "rating": self.rating,
+            "place_id": self.place_id,
+            "user_id": self.user_id,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+        }
 
     @validates('text')
     def validate_text(self, key, value):
@@ -1,12 +1,10 @@
 import re
-from app.extensions import db, bcrypt
-from flask_bcrypt import Bcrypt
+from app.extensions import db
+from app.hashing import hasher
 from sqlalchemy.orm import relationship, validates
 from app.models.base_model import BaseModel
 """ User module """
 
-bcrypt = Bcrypt()
-
 class User(BaseModel, db.Model):
     """ User class """
     __tablename__ = 'users'
@@ -17,7 +15,7 @@ class User(BaseModel, db.Model):
     password = db.Column(db.String(128), nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
 
-    places = relationship('Place', backref='user', cascade='all, delete-orphan')
+    places = relationship('Place', back_populates='owner', cascade='all, delete-orphan')
     reviews = relationship('Review', backref='user', cascade='all, delete-orphan')
 
     @staticmethod
@@ -33,10 +31,14 @@ class User(BaseModel, db.Model):
             raise ValueError(f"{key} cannot be empty")
         return value
     
-    def hash_password(self, password):
+    def hash_password(self, password, block=False):
         """Hashes the password before storing it."""
-        self.password = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password = hasher.hash(password, block=block)
 
     def verify_password(self, password):
         """Verifies if the provided password matches the hashed password."""
-        return bcrypt.check_password_hash(self.password, password)
\ No newline at end of file
+        return hasher.check(self.password, password)
+
+    def password_needs_rehash(self):
+        """Return True when the stored hash was made with another cost than the configured one"""
+        return hasher.needs_rehash(self.password)
\ No newline at end of file
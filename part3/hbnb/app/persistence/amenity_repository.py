@@ -1,6 +1,16 @@
+from datetime import datetime
+from sqlalchemy import delete, select, update
+from app.extensions import db
 from app.persistence.repository import SQLAlchemyRepository
 from app.models.amenity import Amenity
+from app.models.place import Place, place_amenities
 
 class AmenityRepository(SQLAlchemyRepository):
     def __init__(self):
-        super().__init__(Amenity)
\ No newline at end of file
+        super().__init__(Amenity)
+
+    def _delete_dependents(self, obj_ids):
+        # The places losing an amenity show a different list, so they change too
+        linked = select(place_amenities.c.place_id).where(place_amenities.c.amenity_id.in_(obj_ids))
+        db.session.execute(update(Place).where(Place.id.in_(linked)).values(updated_at=datetime.utcnow()))
+        db.session.execute(delete(place_amenities).where(place_amenities.c.amenity_id.in_(obj_ids)))
\ No newline at end of file
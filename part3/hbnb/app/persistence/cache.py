@@ -0,0 +1,272 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from app.extensions import db
+""" Read-through entity cache placed in front of the SQLAlchemy repositories """
+
+_STALE_KEY = "entity_cache_stale"
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by entry count and approximate size in bytes
+
+    Entries older than `ttl` seconds are treated as misses. Every
+    invalidation bumps `generation`, which lets a reader that started before
+    the invalidation refuse to store what it read.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=16 * 1024 * 1024, ttl=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value for `key` or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, generation=None, ttl=None):
+        """Store `value`, unless the cache was invalidated since `generation`
+
+        `ttl` overrides the cache-wide lifetime of this entry.
+        """
+        size = _sizeof(key) + _sizeof(value)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if size > self.max_bytes or self.max_entries <= 0:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._bytes += size
+            self._added(key, value)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Drop `key` from the cache"""
+        with self._lock:
+            self.generation += 1
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return the counters and current occupancy of the cache"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _added(self, key, value):
+        """Called with the lock held after `key` is stored"""
+
+    def _remove(self, key):
+        value, size, expires_at = self._entries.pop(key)
+        self._bytes -= size
+        return value
+
+
+def _sizeof(value):
+    """Approximate the memory used by a cached key or column snapshot"""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    if isinstance(value, tuple):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+# One cache pair per model, shared by every facade instance in the process
+_caches = {}
+_settings = {"max_entries": 10000, "max_bytes": 16 * 1024 * 1024, "ttl": 300}
+
+
+def get_caches(model):
+    """Return the (entity, lookup) caches of a model, creating them on first use"""
+    if model not in _caches:
+        _caches[model] = (LRUCache(**_settings), LRUCache(**_settings))
+    return _caches[model]
+
+
+def cache_stats():
+    """Return the statistics of every entity cache, keyed by table name"""
+    return {model.__tablename__: entities.stats() for model, (entities, lookups) in _caches.items()}
+
+
+def clear_caches():
+    """Empty every entity and lookup cache"""
+    for entities, lookups in _caches.values():
+        entities.clear()
+        lookups.clear()
+
+
+def init_cache(app):
+    """Apply the ENTITY_CACHE_* settings of `app` and start from empty caches"""
+    CachedRepository.enabled = app.config.get("ENTITY_CACHE_ENABLED", True)
+    _settings["max_entries"] = app.config.get("ENTITY_CACHE_MAX_ENTRIES", _settings["max_entries"])
+    _settings["max_bytes"] = app.config.get("ENTITY_CACHE_MAX_BYTES", _settings["max_bytes"])
+    _settings["ttl"] = app.config.get("ENTITY_CACHE_TTL", _settings["ttl"])
+    for entities, lookups in _caches.values():
+        for cache in (entities, lookups):
+            cache.max_entries = _settings["max_entries"]
+            cache.max_bytes = _settings["max_bytes"]
+            cache.ttl = _settings["ttl"]
+    clear_caches()
+
+
+class CachedRepository:
+    """Repository wrapper serving get and get_by_attribute from an LRU cache
+
+    Cached values are column snapshots, rebuilt into instances attached to
+    the current session without SQL. A get with loader options or a strategy
+    always queries, so its eager loads happen, and caches the row it read.
+    A get `as_of` the updated_at a validator was read from only takes a
+    snapshot of that same row version, so a body always matches its ETag.
+    Writes invalidate the cache through the session events below, so
+    committed changes are never served stale.
+    """
+
+    enabled = True
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.model = repository.model
+        self.entities, self.lookups = get_caches(self.model)
+
+    def __getattr__(self, name):
+        return getattr(self.repository, name)
+
+    def get(self, obj_id, *args, as_of=None, **kwargs):
+        if not self.enabled:
+            return self.repository.get(obj_id, *args, **kwargs)
+        # Loader options or a strategy only apply to a query: a snapshot
+        # would come back without the eager loads the caller asked for
+        if not any(value is not None for value in args + tuple(kwargs.values())):
+            snapshot = self.entities.get(obj_id)
+            # Rows written outside the session, e.g. by another worker,
+            # leave snapshots behind that only their updated_at gives away
+            if snapshot is not None and as_of is not None and snapshot["updated_at"] != as_of:
+                self.entities.invalidate(obj_id)
+            elif snapshot is not None:
+                return self._attach(snapshot)
+        generation = self.entities.generation
+        obj = self.repository.get(obj_id, *args, **kwargs)
+        self._store(obj, generation)
+        return obj
+
+    def get_by_attribute(self, attr_name, attr_value):
+        if not self.enabled:
+            return self.repository.get_by_attribute(attr_name, attr_value)
+        key = (attr_name, attr_value)
+        obj_id = self.lookups.get(key)
+        if obj_id is not None:
+            return self.get(obj_id)
+        generation = self.lookups.generation
+        obj = self.repository.get_by_attribute(attr_name, attr_value)
+        if obj is not None and self._store(obj, self.entities.generation):
+            self.lookups.set(key, obj.id, generation)
+        return obj
+
+    def invalidate(self, obj_ids):
+        """Drop the snapshots of `obj_ids` now and again once the session commits
+
+        For rows the repository rewrote with statements the session does not
+        track, such as the ratings repair.
+        """
+        for obj_id in obj_ids:
+            _mark_stale(db.session, self.model, obj_id)
+
+    def add_many(self, *args, **kwargs):
+        _mark_stale(db.session, None)
+        return self.repository.add_many(*args, **kwargs)
+
+    def update_many(self, *args, **kwargs):
+        _mark_stale(db.session, None)
+        return self.repository.update_many(*args, **kwargs)
+
+    def delete_many(self, *args, **kwargs):
+        _mark_stale(db.session, None)
+        return self.repository.delete_many(*args, **kwargs)
+
+    def _store(self, obj, generation):
+        """Cache a snapshot of `obj` if it matches what is committed"""
+        if obj is None or obj in db.session.new or db.session.is_modified(obj):
+            return False
+        snapshot = {attr.key: getattr(obj, attr.key) for attr in self.model.__mapper__.column_attrs}
+        self.entities.set(obj.id, snapshot, generation)
+        return True
+
+    def _attach(self, snapshot):
+        """Rebuild an instance from a snapshot and merge it into the session"""
+        obj = self.model.__mapper__.class_manager.new_instance()
+        for key, value in snapshot.items():
+            set_committed_value(obj, key, value)
+        make_transient_to_detached(obj)
+        return db.session.merge(obj, load=False)
+
+
+def _mark_stale(session, model, obj_id=None):
+    """Invalidate the cache entry of a row now and again once the session commits
+
+    `model` None stands for a bulk statement whose rows are unknown, which
+    clears every cache.
+    """
+    _invalidate(model, obj_id)
+    session.info.setdefault(_STALE_KEY, []).append((model, obj_id))
+
+
+def _invalidate(model, obj_id):
+    if model is None:
+        clear_caches()
+    elif model in _caches:
+        entities, lookups = _caches[model]
+        entities.invalidate(obj_id)
+        lookups.clear()
+
+
+@event.listens_for(db.session, "after_flush")
+def _after_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if type(obj) in _caches:
+            _mark_stale(session, type(obj), obj.id)
+
+
+@event.listens_for(db.session, "after_commit")
+@event.listens_for(db.session, "after_rollback")
+def _after_transaction(session):
+    for model, obj_id in session.info.pop(_STALE_KEY, []):
+        _invalidate(model, obj_id)
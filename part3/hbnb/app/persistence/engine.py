@@ -0,0 +1,61 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+""" Engine options and per-connection SQLite pragmas driven by the config """
+
+
+def is_sqlite(uri):
+    """Return True when the database URI points to SQLite"""
+    return make_url(uri).get_backend_name() == "sqlite"
+
+
+def is_memory_database(uri):
+    """Return True for in-memory SQLite databases, which use a static pool"""
+    url = make_url(uri)
+    return is_sqlite(uri) and url.database in (None, "", ":memory:")
+
+
+def configure_engine_options(app):
+    """Build SQLALCHEMY_ENGINE_OPTIONS from the DB_POOL_* settings
+
+    Options already present in SQLALCHEMY_ENGINE_OPTIONS win. Pool sizing is
+    skipped for in-memory SQLite, which shares one connection.
+    """
+    uri = app.config["SQLALCHEMY_DATABASE_URI"]
+    options = {"pool_pre_ping": app.config.get("DB_POOL_PRE_PING", False)}
+    if not is_memory_database(uri):
+        options.update({
+            "pool_size": app.config.get("DB_POOL_SIZE", 5),
+            "max_overflow": app.config.get("DB_MAX_OVERFLOW", 10),
+            "pool_timeout": app.config.get("DB_POOL_TIMEOUT", 30),
+            "pool_recycle": app.config.get("DB_POOL_RECYCLE", -1),
+        })
+    options.update(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+
+def sqlite_pragmas(config):
+    """Return the ordered PRAGMA statements configured by the SQLITE_* settings"""
+    pragmas = [
+        ("busy_timeout", config.get("SQLITE_BUSY_TIMEOUT")),
+        ("journal_mode", config.get("SQLITE_JOURNAL_MODE")),
+        ("synchronous", config.get("SQLITE_SYNCHRONOUS")),
+        ("cache_size", config.get("SQLITE_CACHE_SIZE")),
+        ("mmap_size", config.get("SQLITE_MMAP_SIZE")),
+    ]
+    return [f"PRAGMA {name}={value}" for name, value in pragmas if value is not None]
+
+
+def install_sqlite_pragmas(engine, config):
+    """Run the configured pragmas on every new connection of a SQLite engine"""
+    if engine.dialect.name != "sqlite":
+        return
+    statements = sqlite_pragmas(config)
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
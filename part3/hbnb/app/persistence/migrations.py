@@ -0,0 +1,273 @@
+import logging
+import re
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, String, func, inspect, select, text
+from sqlalchemy.exc import OperationalError
+from app.extensions import db
+from app.persistence import search, spatial
+from app.persistence.place_repository import RATING_COLUMNS, refresh_ratings
+from app.persistence.versions import bump_versions, seed_versions
+""" Versioned schema migrations for databases created by older releases
+
+db.create_all() only creates missing tables, so indexes and constraints
+added to existing tables are applied here. Each migration runs once, in its
+own transaction, and is recorded in the schema_version table.
+"""
+
+log = logging.getLogger(__name__)
+
+schema_version = db.Table(
+    'schema_version',
+    Column('version', Integer, primary_key=True),
+    Column('description', String(255), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+
+_TRIGGER_NAME = re.compile(r"CREATE TRIGGER IF NOT EXISTS (\w+)")
+
+
+def trigger_names(ddl):
+    """Return the names of the triggers created by a list of DDL statements"""
+    return _TRIGGER_NAME.findall(" ".join(ddl))
+
+
+def _create_indexes(connection, names):
+    """Create the named indexes declared on the models if they are missing"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in names:
+                index.create(connection, checkfirst=True)
+
+
+# Reviews that are not the oldest one their user left on the place
+_LATER_DUPLICATE_REVIEWS = (
+    " FROM reviews WHERE EXISTS ("
+    " SELECT 1 FROM reviews AS older"
+    " WHERE older.user_id = reviews.user_id"
+    " AND older.place_id = reviews.place_id"
+    " AND (older.created_at < reviews.created_at"
+    " OR (older.created_at = reviews.created_at AND older.id < reviews.id)))"
+)
+
+
+def count_duplicate_reviews(connection):
+    """Return how many reviews repeat an older review of the same user for the same place"""
+    return connection.execute(text("SELECT count(*)" + _LATER_DUPLICATE_REVIEWS)).scalar()
+
+
+def _index_unique_reviews(connection):
+    """Create uq_reviews_user_place, unless duplicate reviews would make it fail"""
+    duplicates = count_duplicate_reviews(connection)
+    if duplicates:
+        log.warning("Duplicate reviews block the unique (user_id, place_id) index; "
+                    "run `flask db-upgrade --drop-duplicate-reviews` to delete them",
+                    extra={"duplicates": duplicates})
+        return False
+    _create_indexes(connection, {'uq_reviews_user_place'})
+    return True
+
+
+def drop_duplicate_reviews(engine):
+    """Delete all but the oldest review of each user for a place and add the unique index
+
+    Place rating aggregates are recomputed. Returns the number of reviews
+    deleted. Destructive, so only ever run on request, never at startup.
+    """
+    with engine.begin() as connection:
+        place_ids = connection.execute(text("SELECT DISTINCT place_id" + _LATER_DUPLICATE_REVIEWS)).scalars().all()
+        deleted = connection.execute(text("DELETE" + _LATER_DUPLICATE_REVIEWS)).rowcount
+        if deleted:
+            refresh_ratings(place_ids, connection=connection)
+            bump_versions(connection, ['reviews', 'places'])
+        _index_unique_reviews(connection)
+    if deleted:
+        log.warning("Deleted duplicate reviews", extra={"deleted": deleted})
+    return deleted
+
+
+def _index_hot_lookup_columns(connection):
+    _create_indexes(connection, {
+        'ix_users_created_at',
+        'ix_amenities_created_at',
+        'ix_places_created_at',
+        'ix_places_owner_id',
+        'ix_places_price',
+        'ix_places_latitude_longitude',
+        'ix_reviews_created_at',
+    })
+    # Duplicates are reported, never deleted here: migrations run at startup
+    _index_unique_reviews(connection)
+
+
+def _spatial_index_places(connection):
+    spatial.create_rtree(connection)
+
+
+# The full-text schema as version 3 created it: one places_fts document per
+# place holding its reviews too. Kept verbatim so databases that start from
+# scratch go through the same states as those upgraded at the time;
+# version 7 replaces it with the current search.FTS_DDL.
+_V3_REVIEWS_OF = "(SELECT group_concat(text, ' ') FROM reviews WHERE place_id = {place_id})"
+_V3_PLACE_ROWID = "(SELECT rowid FROM places WHERE id = {place_id})"
+
+
+def _v3_reindex_reviews(place_id):
+    return (
+        f"UPDATE places_fts SET reviews = {_V3_REVIEWS_OF.format(place_id=place_id)}"
+        f" WHERE rowid = {_V3_PLACE_ROWID.format(place_id=place_id)};"
+    )
+
+
+_V3_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS places_fts USING fts5("
+    "title, description, reviews, tokenize = 'porter unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS places_fts_insert AFTER INSERT ON places BEGIN"
+    " INSERT INTO places_fts (rowid, title, description, reviews)"
+    f" VALUES (new.rowid, new.title, new.description, {_V3_REVIEWS_OF.format(place_id='new.id')});"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS places_fts_update AFTER UPDATE OF title, description ON places BEGIN"
+    " UPDATE places_fts SET title = new.title, description = new.description WHERE rowid = new.rowid;"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS places_fts_delete AFTER DELETE ON places BEGIN"
+    " DELETE FROM places_fts WHERE rowid = old.rowid;"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS reviews_fts_insert AFTER INSERT ON reviews BEGIN"
+    f" {_v3_reindex_reviews('new.place_id')}"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS reviews_fts_update AFTER UPDATE OF text, place_id ON reviews BEGIN"
+    f" {_v3_reindex_reviews('old.place_id')}"
+    f" {_v3_reindex_reviews('new.place_id')}"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS reviews_fts_delete AFTER DELETE ON reviews BEGIN"
+    f" {_v3_reindex_reviews('old.place_id')}"
+    " END",
+]
+
+_FTS_TRIGGERS = ('places_fts_insert', 'places_fts_update', 'places_fts_delete',
+                 'reviews_fts_insert', 'reviews_fts_update', 'reviews_fts_delete')
+
+
+def _full_text_index_places(connection):
+    if connection.dialect.name != "sqlite":
+        return
+    try:
+        connection.execute(text(_V3_FTS_DDL[0]))
+    except OperationalError:
+        return
+    for statement in _V3_FTS_DDL[1:]:
+        connection.execute(text(statement))
+    connection.execute(text("DELETE FROM places_fts"))
+    connection.execute(text(
+        "INSERT INTO places_fts (rowid, title, description, reviews)"
+        f" SELECT rowid, title, description, {_V3_REVIEWS_OF.format(place_id='places.id')} FROM places"
+    ))
+
+
+def _place_rating_aggregates(connection):
+    existing = {column['name'] for column in inspect(connection).get_columns('places')}
+    for name in RATING_COLUMNS:
+        if name not in existing:
+            connection.execute(text(f"ALTER TABLE places ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"))
+    refresh_ratings(connection=connection)
+
+
+def _index_reviews_by_place_and_date(connection):
+    # The composite index serves every place_id lookup the old one did
+    _create_indexes(connection, {'ix_reviews_place_id_created_at'})
+    connection.execute(text("DROP INDEX IF EXISTS ix_reviews_place_id"))
+
+
+VERSIONED_TABLES = ['users', 'places', 'reviews', 'amenities', 'place_amenities']
+
+
+def _seed_collection_versions(connection):
+    seed_versions(connection, VERSIONED_TABLES, shards=1)
+
+
+def _shard_collection_versions(connection):
+    seed_versions(connection, VERSIONED_TABLES)
+
+
+def _full_text_index_reviews(connection):
+    # Without FTS5, version 3 created nothing and there is nothing to replace
+    if connection.dialect.name != "sqlite" or not connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE name = 'places_fts'")).first():
+        return
+    for name in _FTS_TRIGGERS:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    connection.execute(text("DROP TABLE IF EXISTS places_fts"))
+    connection.execute(text("DROP TABLE IF EXISTS reviews_fts"))
+    search.create_fts(connection)
+
+
+MIGRATIONS = [
+    (1, "Index hot lookup columns and enforce one review per user and place", _index_hot_lookup_columns),
+    (2, "Add the places_rtree spatial index on SQLite", _spatial_index_places),
+    (3, "Add the places_fts full-text index on SQLite", _full_text_index_places),
+    (4, "Add review count, rating sum and histogram columns to places", _place_rating_aggregates),
+    (5, "Index reviews by (place_id, created_at, id) for per-place listings", _index_reviews_by_place_and_date),
+    (6, "Start the version counters used for HTTP validators", _seed_collection_versions),
+    (7, "Index each review in its own reviews_fts document on SQLite", _full_text_index_reviews),
+    (8, "Split each version counter over shards bumped at random", _shard_collection_versions),
+]
+
+
+def current_version(connection):
+    """Return the latest applied migration version, 0 for a new database"""
+    return connection.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def restore_indexes(connection):
+    """Recreate the declared indexes and the index triggers that are missing, returns their names
+
+    A bulk load drops them while it runs (see synthetic.generate); if it
+    dies before putting them back, the next upgrade does. The full-text and
+    R*Tree indexes are rebuilt when any of their triggers was missing.
+    """
+    restored = []
+    inspector = inspect(connection)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if index.name == 'uq_reviews_user_place':
+                if not _index_unique_reviews(connection):
+                    continue
+            else:
+                index.create(connection)
+            restored.append(index.name)
+    if connection.dialect.name == "sqlite":
+        present = set(connection.execute(text("SELECT name FROM sqlite_master")).scalars())
+        for table, ddl, create in (("places_fts", search.FTS_DDL, search.create_fts),
+                                   ("places_rtree", spatial.RTREE_DDL, spatial.create_rtree)):
+            missing = [name for name in trigger_names(ddl) if name not in present]
+            if table in present and missing:
+                create(connection)
+                restored.extend(missing)
+    if restored:
+        log.warning("Restored missing indexes and triggers", extra={"restored": restored})
+    return restored
+
+
+def upgrade(engine):
+    """Apply every pending migration, restore missing indexes and return the resulting version"""
+    schema_version.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        version = current_version(connection)
+
+    for number, description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as connection:
+            migrate(connection)
+            connection.execute(schema_version.insert().values(
+                version=number, description=description, applied_at=datetime.utcnow()
+            ))
+        version = number
+    with engine.begin() as connection:
+        restore_indexes(connection)
+    return version
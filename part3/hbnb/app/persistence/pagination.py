@@ -0,0 +1,27 @@
+import base64
+import binascii
+import json
+from collections import namedtuple
+from datetime import datetime
+""" Keyset pagination helpers shared by the repositories """
+
+Page = namedtuple("Page", ["items", "next_cursor", "total"])
+
+
+def encode_cursor(values):
+    """Encode the sort key values of the last row of a page as an opaque cursor"""
+    encoded = [{"dt": value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(encoded, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, size):
+    """Decode a cursor produced by encode_cursor into `size` sort key values"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError
+        return [datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value for value in values]
+    except (ValueError, KeyError, TypeError, UnicodeError, binascii.Error):
+        raise ValueError("Invalid pagination cursor")
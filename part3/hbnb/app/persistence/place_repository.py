@@ -1,6 +1,279 @@
-from app.persistence.repository import SQLAlchemyRepository
-from app.models.place import Place
+import heapq
+from datetime import datetime
+from sqlalchemy import bindparam, case, delete, func, literal_column, or_, select, update
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from app.extensions import db
+from app.persistence.pagination import Page, encode_cursor, decode_cursor
+from app.persistence.repository import SQLAlchemyRepository, chunked, keyset_after
+from app.persistence.versions import Version
+from app.persistence.unit_of_work import unit_of_work
+from app.persistence import search, spatial
+from app.models.amenity import Amenity
+from app.models.place import RATINGS, Place, place_amenities
+from app.models.review import Review
+from app.models.user import User
+
+RATING_COLUMNS = ["review_count", "rating_sum"] + [f"rating_{rating}" for rating in RATINGS]
+
+
+def refresh_ratings(place_ids=None, connection=None):
+    """Recompute the review aggregates of places in one GROUP BY pass
+
+    Only places whose stored aggregates differ from their reviews are
+    written; their ids are returned. `place_ids` None covers every place.
+    """
+    executor = connection if connection is not None else db.session
+    chunks = [None] if place_ids is None else chunked(place_ids, SQLAlchemyRepository.BULK_CHUNK_SIZE)
+    drifted = []
+    for chunk in chunks:
+        stats = select(
+            Review.place_id,
+            func.count().label("review_count"),
+            func.sum(Review.rating).label("rating_sum"),
+            *[func.sum(case((Review.rating == rating, 1), else_=0)).label(f"rating_{rating}") for rating in RATINGS]
+        ).group_by(Review.place_id)
+        places = select(
+            Place.id,
+            *[getattr(Place, name) for name in RATING_COLUMNS],
+        )
+        if chunk is not None:
+            stats = stats.where(Review.place_id.in_(chunk))
+            places = places.where(Place.id.in_(chunk))
+        stats = stats.subquery()
+        places = places.add_columns(
+            *[func.coalesce(stats.c[name], 0).label(f"actual_{name}") for name in RATING_COLUMNS]
+        ).outerjoin(stats, stats.c.place_id == Place.id)
+
+        for row in executor.execute(places):
+            actual = {name: row._mapping[f"actual_{name}"] for name in RATING_COLUMNS}
+            if any(row._mapping[name] != value for name, value in actual.items()):
+                drifted.append(dict(actual, place_id=row.id))
+
+    table = Place.__table__
+    for chunk in chunked(drifted, SQLAlchemyRepository.BULK_CHUNK_SIZE):
+        executor.execute(
+            update(table).where(table.c.id == bindparam("place_id"))
+            .values({**{name: bindparam(name) for name in RATING_COLUMNS}, "updated_at": datetime.utcnow()}),
+            chunk
+        )
+    ids = {row["place_id"] for row in drifted}
+    if connection is None:
+        for obj in list(db.session.identity_map.values()):
+            if isinstance(obj, Place) and obj.id in ids:
+                db.session.expire(obj)
+    return sorted(ids)
+
 
 class PlaceRepository(SQLAlchemyRepository):
+    """Repository for places with per-call relationship loading strategies"""
+
+    # "select" keeps the lazy defaults of the model, "joined" fetches
+    # everything in one statement and "selectin" joins the owner and loads
+    # each collection with one extra IN query, whatever the number of rows.
+    LOAD_STRATEGIES = ("select", "joined", "selectin")
+
     def __init__(self):
-        super().__init__(Place)
\ No newline at end of file
+        super().__init__(Place)
+
+    def sort_keys(self, sort):
+        """Return the get_page order_by for a listing sort such as "-price"
+
+        A leading "-" sorts descending; places without reviews rate 0.
+        """
+        descending = sort.startswith("-")
+        field = sort.lstrip("-")
+        if field == "created_at":
+            expression = Place.created_at
+        elif field == "price":
+            expression = Place.price
+        elif field == "rating":
+            expression = case(
+                (Place.review_count > 0, Place.rating_sum * 1.0 / Place.review_count),
+                else_=0.0
+            )
+        elif field == "review_count":
+            expression = Place.review_count
+        else:
+            raise ValueError(f"Unknown sort: {sort}")
+        return [(expression, descending)]
+
+    def loader_options(self, strategy="selectin"):
+        """Return the loader options for the owner, reviews and amenities"""
+        if strategy == "select":
+            return []
+        if strategy == "joined":
+            return [
+                joinedload(Place.owner),
+                joinedload(Place.reviews),
+                joinedload(Place.amenities),
+            ]
+        if strategy == "selectin":
+            return [
+                joinedload(Place.owner),
+                selectinload(Place.reviews),
+                selectinload(Place.amenities),
+            ]
+        raise ValueError(f"Unknown loading strategy: {strategy}")
+
+    def sparse_options(self, fields=None, include=None):
+        """Return loader options fetching only what a sparse to_dict() reads
+
+        With `fields`, only the id and the columns behind those fields are
+        loaded. Relations are loaded when included; capped reviews are left
+        to ReviewRepository.latest_for_places.
+        """
+        options = []
+        include = include or {}
+        if fields is not None:
+            columns = {"id", "owner_id"}.union(*[Place.FIELDS[name] for name in fields])
+            if "reviews" in include:
+                columns.add("review_count")
+            options.append(load_only(*[getattr(Place, column) for column in sorted(columns)]))
+        if "owner" in include:
+            options.append(joinedload(Place.owner))
+        if "amenities" in include:
+            options.append(selectinload(Place.amenities))
+        if "reviews" in include and include["reviews"] is None:
+            options.append(selectinload(Place.reviews))
+        return options
+
+    def get_version(self, obj_id, embeds=()):
+        """Return the Version of a place and of the relations its representation embeds
+
+        Only what the representation shows is read, in one statement: the
+        place row with its review aggregates and, per embedded relation, the
+        owner's row, the latest change to its reviews or the count and latest
+        change of its amenities. None when the place does not exist.
+        """
+        columns = [Place.updated_at, Place.review_count, Place.rating_sum]
+        if "owner" in embeds:
+            columns.append(select(User.updated_at).where(User.id == Place.owner_id).scalar_subquery())
+        if "reviews" in embeds:
+            columns.append(select(func.max(Review.updated_at)).where(Review.place_id == Place.id).scalar_subquery())
+        if "amenities" in embeds:
+            linked = place_amenities.c.place_id == Place.id
+            columns.append(select(func.count()).select_from(place_amenities).where(linked).scalar_subquery())
+            columns.append(select(func.max(Amenity.updated_at))
+                           .join(place_amenities, place_amenities.c.amenity_id == Amenity.id).where(linked)
+                           .scalar_subquery())
+        row = db.session.execute(select(*columns).where(Place.id == obj_id)).first()
+        if row is None:
+            return None
+        changes = [value for value in row if isinstance(value, datetime)]
+        return Version(":".join([obj_id, *map(str, row)]), max(changes) if changes else None)
+
+    def get(self, obj_id, options=None, strategy=None):
+        if strategy is not None:
+            options = self.loader_options(strategy)
+        return super().get(obj_id, options)
+
+    def get_all(self, options=None, strategy=None):
+        if strategy is not None:
+            options = self.loader_options(strategy)
+        return super().get_all(options)
+
+    def iter_all(self, options=None, filters=(), batch_size=1000, strategy=None):
+        if strategy == "joined":
+            raise ValueError("The joined strategy cannot load rows in batches")
+        if strategy is not None:
+            options = self.loader_options(strategy)
+        return super().iter_all(options, filters, batch_size)
+
+    def get_page(self, limit, after=None, options=None, with_total=False, filters=(), strategy=None, sort=None):
+        if strategy is not None:
+            options = self.loader_options(strategy)
+        order_by = self.sort_keys(sort) if sort else None
+        return super().get_page(limit, after, options, with_total, filters, order_by)
+
+    def price_filters(self, min_price=None, max_price=None):
+        """Return the filters restricting places to a price range"""
+        filters = []
+        if min_price is not None:
+            filters.append(Place.price >= min_price)
+        if max_price is not None:
+            filters.append(Place.price <= max_price)
+        return filters
+
+    def bbox_filter(self, bbox):
+        """Return a filter for places inside (min_lon, min_lat, max_lon, max_lat)"""
+        return spatial.bbox_filter(Place, bbox, spatial.has_rtree(db.engine))
+
+    def get_nearby(self, lat, lon, radius_km, limit, options=None, strategy=None, filters=()):
+        """Return up to `limit` (place, distance_km) pairs within `radius_km`, nearest first
+
+        Candidates come from the bounding box of the circle narrowed by
+        `filters`, read as bare coordinates; only the nearest `limit` are
+        loaded as objects.
+        """
+        if strategy is not None:
+            options = self.loader_options(strategy)
+        candidates = db.session.execute(
+            select(Place.id, Place.latitude, Place.longitude)
+            .where(self.bbox_filter(spatial.bounding_box(lat, lon, radius_km)), *filters)
+        )
+        distances = (
+            (spatial.haversine_km(lat, lon, row.latitude, row.longitude), row.id)
+            for row in candidates
+        )
+        nearest = heapq.nsmallest(limit, (item for item in distances if item[0] <= radius_km))
+        places = {place.id: place for place in self.get_many([obj_id for _, obj_id in nearest], options)}
+        return [(places[obj_id], distance) for distance, obj_id in nearest if obj_id in places]
+
+    def search_page(self, query, limit, after=None, options=None, with_total=False, strategy=None):
+        """Return a Page of (place, snippet) pairs matching every word of `query`
+
+        Matches are ranked by BM25 over the places_fts and reviews_fts
+        indexes and snippets are HTML-escaped with hits in <b>. Without FTS5,
+        titles and descriptions are matched with LIKE in creation order and
+        snippets are None.
+        """
+        if strategy is not None:
+            options = self.loader_options(strategy)
+        terms = search.search_terms(query)
+        if not search.has_fts(db.engine):
+            patterns = [search.like_pattern(term) for term in terms]
+            filters = [or_(Place.title.ilike(pattern, escape="\\"), Place.description.ilike(pattern, escape="\\"))
+                       for pattern in patterns]
+            page = self.get_page(limit, after, options, with_total, filters)
+            return page._replace(items=[(place, None) for place in page.items])
+
+        ranked = search.ranked_matches(terms)
+        keys = [(ranked.c.rank, False), (Place.id, False)]
+        query = self._query(options).join(ranked, ranked.c.place_rowid == literal_column("places.rowid"))
+        total = None
+        if with_total:
+            total = db.session.execute(select(func.count()).select_from(ranked)).scalar()
+        if after:
+            query = query.filter(keyset_after(keys, decode_cursor(after, len(keys))))
+
+        rows = (
+            query.add_columns(ranked.c.snippet, *[expression for expression, _ in keys])
+            .order_by(*[expression for expression, _ in keys])
+            .limit(limit + 1)
+            .all()
+        )
+        next_cursor = encode_cursor(rows[limit - 1][2:]) if len(rows) > limit else None
+        return Page([(row[0], search.highlight(row[1])) for row in rows[:limit]], next_cursor, total)
+
+    def refresh_ratings(self, place_ids=None):
+        """Recompute review aggregates, see refresh_ratings()"""
+        return refresh_ratings(place_ids)
+
+    def add_many(self, rows, chunk_size=None, amenity_links=()):
+        """Insert places and their (place_id, amenity_id) links in one commit"""
+        with unit_of_work():
+            ids = self._insert_many(rows, chunk_size)
+            self.add_amenity_links(amenity_links, chunk_size)
+        return ids
+
+    def add_amenity_links(self, links, chunk_size=None):
+        """Insert (place_id, amenity_id) pairs into place_amenities in chunks"""
+        for chunk in chunked(links, chunk_size or self.BULK_CHUNK_SIZE):
+            db.session.execute(
+                place_amenities.insert(),
+                [{"place_id": place_id, "amenity_id": amenity_id} for place_id, amenity_id in chunk]
+            )
+
+    def _delete_dependents(self, obj_ids):
+        db.session.execute(delete(Review).where(Review.place_id.in_(obj_ids)))
+        db.session.execute(delete(place_amenities).where(place_amenities.c.place_id.in_(obj_ids)))
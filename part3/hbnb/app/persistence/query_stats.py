@@ -0,0 +1,97 @@
+import logging
+import re
+import time
+from collections import Counter
+from flask import current_app, g, has_request_context
+from sqlalchemy import event
+""" Count and time the SQL statements run while serving each request
+
+Statements are also grouped by shape, their text with IN lists collapsed,
+and a shape repeated more than QUERY_REPEAT_THRESHOLD times in one request
+is logged as a likely N+1 pattern.
+"""
+
+log = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+
+
+class QueryStats:
+    """Statements run by one request, the seconds they took and their shapes"""
+
+    __slots__ = ("count", "seconds", "shapes", "repeat_threshold")
+
+    def __init__(self, repeat_threshold=None):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+        self.repeat_threshold = repeat_threshold
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        shape = statement_shape(statement)
+        self.shapes[shape] += 1
+        if self.shapes[shape] - 1 == self.repeat_threshold:
+            log.warning("Statement repeated within one request, likely an N+1 pattern",
+                        extra={"shape": shape, "threshold": self.repeat_threshold})
+
+
+def statement_shape(statement):
+    """Return `statement` with whitespace normalized and IN lists collapsed"""
+    return _IN_LIST.sub("(?...)", " ".join(statement.split()))
+
+
+def start_request():
+    """Begin counting the statements of the current request"""
+    g.query_stats = QueryStats(current_app.config.get("QUERY_REPEAT_THRESHOLD"))
+    return g.query_stats
+
+
+def current():
+    """Return the QueryStats of the current request, None outside of one"""
+    if not has_request_context():
+        return None
+    return g.get("query_stats")
+
+
+def install_query_stats(engine):
+    """Attach the counting listeners to `engine`, once"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = current()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+
+def _before_request():
+    start_request()
+
+
+def _add_headers(response):
+    stats = current()
+    if stats is not None:
+        response.headers["X-Query-Count"] = str(stats.count)
+        response.headers["X-Query-Time-Ms"] = f"{stats.seconds * 1000:.2f}"
+    return response
+
+
+def init_query_stats(app, engine):
+    """Count the statements of every request of `app`
+
+    With QUERY_STATS_HEADERS the count and time are sent as X-Query-Count
+    and X-Query-Time-Ms response headers.
+    """
+    install_query_stats(engine)
+    app.before_request(_before_request)
+    if app.config.get("QUERY_STATS_HEADERS"):
+        app.after_request(_add_headers)
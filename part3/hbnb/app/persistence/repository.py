@@ -1,5 +1,26 @@
+import uuid
 from abc import ABC, abstractmethod
+from datetime import datetime
+from sqlalchemy import and_, or_, insert, select, update, delete
 from app.extensions import db
+from app.persistence.pagination import Page, encode_cursor, decode_cursor
+from app.persistence.unit_of_work import unit_of_work
+from app.persistence.versions import Version
+
+def keyset_after(keys, values):
+    """Return a filter for the rows sorting strictly after `values` on `keys`
+
+    `keys` are (expression, descending) pairs; the leading range on the first
+    key lets the database seek its index before the exact comparison.
+    """
+    first, descending = keys[0]
+    clauses = []
+    for position, (expression, descending_key) in enumerate(keys):
+        prefix = [key == value for (key, _), value in zip(keys[:position], values)]
+        step = expression < values[position] if descending_key else expression > values[position]
+        clauses.append(and_(*prefix, step))
+    seek = first <= values[0] if descending else first >= values[0]
+    return and_(seek, or_(*clauses))
 
 class Repository(ABC):
     @abstractmethod
@@ -26,32 +47,169 @@ class Repository(ABC):
     def get_by_attribute(self, attr_name, attr_value):
         pass
 
+def chunked(items, size):
+    """Yield successive lists of at most `size` items from an iterable"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
 class SQLAlchemyRepository(Repository):
+    # Rows per executemany / IN clause, kept under SQLite's variable limit
+    BULK_CHUNK_SIZE = 500
+
     def __init__(self, model):
         self.model = model
 
     def add(self, obj):
-        db.session.add(obj)
-        db.session.commit()
+        with unit_of_work():
+            db.session.add(obj)
 
-    def get(self, obj_id):
-        return self.model.query.get(obj_id)
+    def _query(self, options=None):
+        query = self.model.query
+        if options:
+            query = query.options(*options)
+        return query
 
-    def get_all(self):
-        return self.model.query.all()
+    def get(self, obj_id, options=None):
+        return self._query(options).get(obj_id)
+
+    def get_all(self, options=None):
+        return self._query(options).all()
+
+    def iter_all(self, options=None, filters=(), batch_size=1000):
+        """Yield every object in (created_at, id) order, loading `batch_size` rows at a time
+
+        Objects are not kept once the caller drops them, so memory stays
+        bounded by the batch whatever the size of the table.
+        """
+        query = self._query(options).filter(*filters).order_by(self.model.created_at, self.model.id)
+        return query.yield_per(batch_size)
+
+    def get_version(self, obj_id):
+        """Return the Version of an object from its updated_at, None when it does not exist"""
+        updated_at = db.session.execute(select(self.model.updated_at).where(self.model.id == obj_id)).scalar()
+        if updated_at is None:
+            return None
+        return Version(f"{obj_id}:{updated_at}", updated_at)
+
+    def get_page(self, limit, after=None, options=None, with_total=False, filters=(), order_by=None):
+        """Return a Page of at most `limit` objects following the `after` cursor
+
+        Rows are ordered by `order_by`, a list of (expression, descending)
+        pairs defaulting to created_at, with id as the final tie-breaker, and
+        the next page starts strictly after the last row returned, so the cost
+        of a page does not depend on how deep into the table it is. `filters`
+        restrict the rows paged over.
+        """
+        keys = list(order_by or [(self.model.created_at, False)])
+        keys.append((self.model.id, keys[-1][1]))
+
+        query = self._query(options).filter(*filters)
+        total = self.model.query.filter(*filters).count() if with_total else None
+        if after:
+            query = query.filter(keyset_after(keys, decode_cursor(after, len(keys))))
+
+        rows = (
+            query.add_columns(*[expression for expression, _ in keys])
+            .order_by(*[expression.desc() if descending else expression for expression, descending in keys])
+            .limit(limit + 1)
+            .all()
+        )
+        next_cursor = encode_cursor(rows[limit - 1][1:]) if len(rows) > limit else None
+        return Page([row[0] for row in rows[:limit]], next_cursor, total)
 
     def update(self, obj_id, data):
-        obj = self.get(obj_id)
-        if obj:
-            for key, value in data.items():
-                setattr(obj, key, value)
-            db.session.commit()
+        with unit_of_work():
+            obj = self.get(obj_id)
+            if obj:
+                for key, value in data.items():
+                    setattr(obj, key, value)
+        return obj
 
     def delete(self, obj_id):
-        obj = self.get(obj_id)
-        if obj:
-            db.session.delete(obj)
-            db.session.commit()
+        with unit_of_work():
+            obj = self.get(obj_id)
+            if obj:
+                db.session.delete(obj)
 
     def get_by_attribute(self, attr_name, attr_value):
-        return self.model.query.filter_by(**{attr_name: attr_value}).first()
\ No newline at end of file
+        return self.model.query.filter_by(**{attr_name: attr_value}).first()
+
+    def get_many(self, obj_ids, options=None):
+        """Return the objects matching `obj_ids`, looked up in batches"""
+        found = []
+        for chunk in chunked(set(obj_ids), self.BULK_CHUNK_SIZE):
+            found.extend(self._query(options).filter(self.model.id.in_(chunk)).all())
+        return found
+
+    def get_many_by_attribute(self, attr_name, values):
+        """Return the objects whose `attr_name` is one of `values`, looked up in batches"""
+        column = getattr(self.model, attr_name)
+        found = []
+        for chunk in chunked(set(values), self.BULK_CHUNK_SIZE):
+            found.extend(self.model.query.filter(column.in_(chunk)).all())
+        return found
+
+    def add_many(self, rows, chunk_size=None):
+        """Insert column dictionaries in chunks and commit once
+
+        Rows go through the bulk INSERT path, so model validators do not run
+        here; callers are expected to have validated them. Returns the ids.
+        """
+        with unit_of_work():
+            return self._insert_many(rows, chunk_size)
+
+    def _insert_many(self, rows, chunk_size=None):
+        """Execute the chunked bulk INSERT of add_many without committing"""
+        ids = []
+        now = datetime.utcnow()
+        for chunk in chunked(rows, chunk_size or self.BULK_CHUNK_SIZE):
+            for row in chunk:
+                row.setdefault("id", str(uuid.uuid4()))
+                row.setdefault("created_at", now)
+                row.setdefault("updated_at", now)
+                ids.append(row["id"])
+            db.session.execute(insert(self.model), chunk)
+        return ids
+
+    def update_many(self, rows, chunk_size=None):
+        """Update rows by primary key in chunks and commit once
+
+        Each dictionary must contain the `id` of the row to update. Returns
+        the number of rows submitted.
+        """
+        count = 0
+        now = datetime.utcnow()
+        with unit_of_work():
+            for chunk in chunked(rows, chunk_size or self.BULK_CHUNK_SIZE):
+                for row in chunk:
+                    row.setdefault("updated_at", now)
+                db.session.execute(update(self.model), chunk)
+                self._expire_loaded({row["id"] for row in chunk})
+                count += len(chunk)
+        return count
+
+    def delete_many(self, obj_ids, chunk_size=None):
+        """Delete rows by id in chunks and commit once, returns rows deleted"""
+        count = 0
+        with unit_of_work():
+            for chunk in chunked(obj_ids, chunk_size or self.BULK_CHUNK_SIZE):
+                self._delete_dependents(chunk)
+                result = db.session.execute(delete(self.model).where(self.model.id.in_(chunk)))
+                count += result.rowcount
+        return count
+
+    def _expire_loaded(self, obj_ids):
+        """Expire loaded instances whose rows were changed by a bulk statement"""
+        for obj in list(db.session.identity_map.values()):
+            if isinstance(obj, self.model) and obj.id in obj_ids:
+                db.session.expire(obj)
+
+    def _delete_dependents(self, obj_ids):
+        """Delete rows that the ORM cascades would remove, bulk deletes skip them"""
+        pass
\ No newline at end of file
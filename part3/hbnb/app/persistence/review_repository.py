@@ -1,6 +1,100 @@
-from app.persistence.repository import SQLAlchemyRepository
+from sqlalchemy import select, union_all
+from app.extensions import db
+from app.persistence.repository import SQLAlchemyRepository, chunked
+from app.persistence.place_repository import refresh_ratings
+from app.persistence.unit_of_work import unit_of_work
 from app.models.review import Review
 
 class ReviewRepository(SQLAlchemyRepository):
     def __init__(self):
-        super().__init__(Review)
\ No newline at end of file
+        super().__init__(Review)
+
+    def get_by_user_and_place(self, user_id, place_id):
+        """Return the review a user left on a place, served by uq_reviews_user_place"""
+        return self.model.query.filter_by(user_id=user_id, place_id=place_id).first()
+
+    def get_place_page(self, place_id, limit, after=None, min_rating=None):
+        """Return a Page of a place's reviews, newest first
+
+        The (place_id, created_at, id) index serves both the filter and the
+        order, so a page costs the same however many reviews the place has.
+        """
+        filters = [Review.place_id == place_id]
+        if min_rating is not None:
+            filters.append(Review.rating >= min_rating)
+        return self.get_page(limit, after, filters=filters, order_by=[(Review.created_at, True)])
+
+    # SQLite accepts at most 500 terms in a compound SELECT
+    PLACES_PER_UNION = 100
+
+    def latest_for_places(self, place_ids, limit):
+        """Return {place_id: [review, ...]} with the `limit` newest reviews of each place
+
+        Each place is a LIMIT branch of one UNION ALL served by the
+        (place_id, created_at, id) index, so the cost follows `limit`, not
+        the number of reviews of the place.
+        """
+        latest = {place_id: [] for place_id in place_ids}
+        if not latest or limit < 1:
+            return latest
+        for chunk in chunked(latest, self.PLACES_PER_UNION):
+            branches = [
+                select(
+                    select(Review.id)
+                    .where(Review.place_id == place_id)
+                    .order_by(Review.created_at.desc(), Review.id.desc())
+                    .limit(limit)
+                    .subquery()
+                )
+                for place_id in chunk
+            ]
+            reviews = (
+                self.model.query
+                .filter(Review.id.in_(union_all(*branches)))
+                .order_by(Review.created_at.desc(), Review.id.desc())
+            )
+            for review in reviews:
+                latest[review.place_id].append(review)
+        return latest
+
+    def place_ids_of(self, review_ids):
+        """Return the ids of the places the given reviews belong to"""
+        place_ids = set()
+        for chunk in chunked(review_ids, self.BULK_CHUNK_SIZE):
+            place_ids.update(db.session.scalars(select(Review.place_id).where(Review.id.in_(chunk)).distinct()))
+        return place_ids
+
+    def existing_pairs(self, pairs):
+        """Return which of the (user_id, place_id) pairs already have a review"""
+        found = set()
+        for chunk in chunked(pairs, self.BULK_CHUNK_SIZE):
+            user_ids = {user_id for user_id, _ in chunk}
+            place_ids = {place_id for _, place_id in chunk}
+            found.update((user_id, place_id) for user_id, place_id in db.session.execute(
+                select(Review.user_id, Review.place_id)
+                .where(Review.user_id.in_(user_ids), Review.place_id.in_(place_ids))
+            ))
+        return found & set(pairs)
+
+    # Bulk statements bypass Place.adjust_ratings, so the aggregates of the
+    # places they touch are recomputed in the same transaction.
+
+    def add_many(self, rows, chunk_size=None):
+        with unit_of_work():
+            ids = self._insert_many(rows, chunk_size)
+            refresh_ratings({row["place_id"] for row in rows})
+        return ids
+
+    def update_many(self, rows, chunk_size=None):
+        with unit_of_work():
+            place_ids = self.place_ids_of([row["id"] for row in rows])
+            count = super().update_many(rows, chunk_size)
+            refresh_ratings(place_ids | {row["place_id"] for row in rows if "place_id" in row})
+        return count
+
+    def delete_many(self, obj_ids, chunk_size=None):
+        with unit_of_work():
+            place_ids = self.place_ids_of(obj_ids)
+            count = super().delete_many(obj_ids, chunk_size)
+            refresh_ratings(place_ids)
+        return count
@@ -0,0 +1,159 @@
+import html
+import re
+from weakref import WeakKeyDictionary
+from sqlalchemy import column, func, literal_column, select, table, text, union_all
+from sqlalchemy.exc import OperationalError
+""" Full-text search over places with the SQLite FTS5 extension
+
+places_fts holds the title and description of each place, keyed by the rowid
+of the places row; reviews_fts holds the text of each review, keyed by the
+rowid of the reviews row, with the rowid of its place alongside. Triggers
+keep both in sync, so every write reindexes exactly the row it touched.
+"""
+
+places_fts = table('places_fts', column('rowid'), column('title'), column('description'))
+reviews_fts = table('reviews_fts', column('rowid'), column('text'), column('place_rowid'))
+
+# Weights for bm25(): a hit in the title counts more than one in the
+# description, which counts more than one in a review.
+BM25_WEIGHTS = (10.0, 5.0)
+REVIEW_WEIGHT = 1.0
+
+SNIPPET_TOKENS = 12
+
+# snippet() brackets hits with these control characters; highlight() turns
+# them into tags once the user-entered text around them is HTML-escaped.
+HIT_START = "\x02"
+HIT_END = "\x03"
+
+_TOKENIZE = "tokenize = 'porter unicode61 remove_diacritics 2'"
+_PLACE_ROWID = "(SELECT rowid FROM places WHERE id = {place_id})"
+
+FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS places_fts USING fts5(title, description, {_TOKENIZE})",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5(text, place_rowid UNINDEXED, {_TOKENIZE})",
+    "CREATE TRIGGER IF NOT EXISTS places_fts_insert AFTER INSERT ON places BEGIN"
+    " INSERT INTO places_fts (rowid, title, description) VALUES (new.rowid, new.title, new.description);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS places_fts_update AFTER UPDATE OF title, description ON places BEGIN"
+    " UPDATE places_fts SET title = new.title, description = new.description WHERE rowid = new.rowid;"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS places_fts_delete AFTER DELETE ON places BEGIN"
+    " DELETE FROM places_fts WHERE rowid = old.rowid;"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS reviews_fts_insert AFTER INSERT ON reviews BEGIN"
+    " INSERT INTO reviews_fts (rowid, text, place_rowid)"
+    f" VALUES (new.rowid, new.text, {_PLACE_ROWID.format(place_id='new.place_id')});"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS reviews_fts_update AFTER UPDATE OF text, place_id ON reviews BEGIN"
+    f" UPDATE reviews_fts SET text = new.text, place_rowid = {_PLACE_ROWID.format(place_id='new.place_id')}"
+    " WHERE rowid = new.rowid;"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS reviews_fts_delete AFTER DELETE ON reviews BEGIN"
+    " DELETE FROM reviews_fts WHERE rowid = old.rowid;"
+    " END",
+]
+
+
+# Engines known to have places_fts, checked once per engine
+_fts_engines = WeakKeyDictionary()
+
+
+def create_fts(connection):
+    """Create the full-text indexes and their triggers and load every place and review
+
+    Returns False when the database is not SQLite or lacks the FTS5 module.
+    """
+    if connection.dialect.name != "sqlite":
+        return False
+    try:
+        connection.execute(text(FTS_DDL[0]))
+    except OperationalError:
+        return False
+    for statement in FTS_DDL[1:]:
+        connection.execute(text(statement))
+    rebuild_fts(connection)
+    _fts_engines.pop(connection.engine, None)
+    return True
+
+
+def rebuild_fts(connection):
+    """Reload the full-text indexes from places and reviews, e.g. after a VACUUM"""
+    connection.execute(text("DELETE FROM places_fts"))
+    connection.execute(text("DELETE FROM reviews_fts"))
+    connection.execute(text(
+        "INSERT INTO places_fts (rowid, title, description) SELECT rowid, title, description FROM places"
+    ))
+    connection.execute(text(
+        "INSERT INTO reviews_fts (rowid, text, place_rowid)"
+        " SELECT reviews.rowid, reviews.text, places.rowid FROM reviews JOIN places ON places.id = reviews.place_id"
+    ))
+
+
+def has_fts(engine):
+    """Return True when the database behind `engine` has the places_fts table"""
+    if engine.dialect.name != "sqlite":
+        return False
+    if engine not in _fts_engines:
+        with engine.connect() as connection:
+            _fts_engines[engine] = connection.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE name = 'places_fts'"
+            )).first() is not None
+    return _fts_engines[engine]
+
+
+def search_terms(query):
+    """Split a user query into words, rejecting queries without any"""
+    terms = re.findall(r"\w+", query or "")
+    if not terms:
+        raise ValueError("Search query must contain at least one word")
+    return terms
+
+
+def match_expression(terms):
+    """Return an FTS5 query matching documents containing every term
+
+    Each term is quoted so user input can never be read as FTS5 syntax.
+    """
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def like_pattern(term):
+    """Return a LIKE pattern matching `term` anywhere, with % and _ taken literally"""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def highlight(snippet, open_tag="<b>", close_tag="</b>"):
+    """Return a raw snippet HTML-escaped, with its hits wrapped in the given tags"""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(HIT_START, open_tag).replace(HIT_END, close_tag)
+
+
+def ranked_matches(terms, open_tag=HIT_START, close_tag=HIT_END):
+    """Return a subquery of (place_rowid, rank, snippet) for places matching `terms`
+
+    A place matches when its own text or one of its reviews contains every
+    term. Its rank is the best BM25 score (lower is more relevant) among
+    those documents and its snippet comes from the best one. Snippets hold
+    raw user text: pass them through highlight() before they reach a client.
+    """
+    match = match_expression(terms)
+    place_hits = select(
+        places_fts.c.rowid.label("place_rowid"),
+        func.bm25(literal_column("places_fts"), *BM25_WEIGHTS).label("score"),
+        func.snippet(literal_column("places_fts"), -1, open_tag, close_tag, "…", SNIPPET_TOKENS).label("snippet"),
+    ).where(literal_column("places_fts").op("MATCH")(match))
+    review_hits = select(
+        reviews_fts.c.place_rowid,
+        func.bm25(literal_column("reviews_fts"), REVIEW_WEIGHT).label("score"),
+        func.snippet(literal_column("reviews_fts"), 0, open_tag, close_tag, "…", SNIPPET_TOKENS).label("snippet"),
+    ).where(literal_column("reviews_fts").op("MATCH")(match))
+    hits = union_all(place_hits, review_hits).subquery("hits")
+    # SQLite takes the bare snippet column from the row holding min(score)
+    return select(
+        hits.c.place_rowid,
+        func.min(hits.c.score).label("rank"),
+        hits.c.snippet,
+    ).group_by(hits.c.place_rowid).subquery("ranked")
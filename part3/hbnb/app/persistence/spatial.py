@@ -0,0 +1,132 @@
+import math
+from weakref import WeakKeyDictionary
+from sqlalchemy import and_, column, literal_column, or_, select, table, text
+from sqlalchemy.exc import OperationalError
+""" Spatial helpers: great-circle distances and the places R*Tree index
+
+On SQLite the places_rtree virtual table holds one point per place, keyed by
+the rowid of the places row and kept in sync by triggers. Bounding box
+searches use it as a prefilter; other databases fall back to the
+(latitude, longitude) B-tree index.
+"""
+
+EARTH_RADIUS_KM = 6371.0088
+
+places_rtree = table(
+    'places_rtree',
+    column('id'), column('min_lat'), column('max_lat'), column('min_lon'), column('max_lon')
+)
+
+RTREE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS places_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)",
+    "CREATE TRIGGER IF NOT EXISTS places_rtree_insert AFTER INSERT ON places"
+    " WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN"
+    " INSERT INTO places_rtree VALUES (new.rowid, new.latitude, new.latitude, new.longitude, new.longitude);"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS places_rtree_update AFTER UPDATE OF latitude, longitude ON places BEGIN"
+    " DELETE FROM places_rtree WHERE id = old.rowid;"
+    " INSERT INTO places_rtree SELECT new.rowid, new.latitude, new.latitude, new.longitude, new.longitude"
+    " WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;"
+    " END",
+    "CREATE TRIGGER IF NOT EXISTS places_rtree_delete AFTER DELETE ON places BEGIN"
+    " DELETE FROM places_rtree WHERE id = old.rowid;"
+    " END",
+]
+
+
+# Engines known to have places_rtree, checked once per engine
+_rtree_engines = WeakKeyDictionary()
+
+
+def create_rtree(connection):
+    """Create the R*Tree and its triggers and load every place into it
+
+    Returns False when the database is not SQLite or lacks the R*Tree module.
+    """
+    if connection.dialect.name != "sqlite":
+        return False
+    try:
+        connection.execute(text(RTREE_DDL[0]))
+    except OperationalError:
+        return False
+    for statement in RTREE_DDL[1:]:
+        connection.execute(text(statement))
+    rebuild_rtree(connection)
+    _rtree_engines.pop(connection.engine, None)
+    return True
+
+
+def rebuild_rtree(connection):
+    """Reload the R*Tree from places, needed after a VACUUM renumbers rowids"""
+    connection.execute(text("DELETE FROM places_rtree"))
+    connection.execute(text(
+        "INSERT INTO places_rtree SELECT rowid, latitude, latitude, longitude, longitude"
+        " FROM places WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+    ))
+
+
+def has_rtree(engine):
+    """Return True when the database behind `engine` has the places_rtree table"""
+    if engine.dialect.name != "sqlite":
+        return False
+    if engine not in _rtree_engines:
+        with engine.connect() as connection:
+            _rtree_engines[engine] = connection.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE name = 'places_rtree'"
+            )).first() is not None
+    return _rtree_engines[engine]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Return the great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lon, radius_km):
+    """Return (min_lon, min_lat, max_lon, max_lat) enclosing a circle
+
+    min_lon is greater than max_lon when the box crosses the antimeridian.
+    """
+    d_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = lat - d_lat, lat + d_lat
+    if min_lat <= -90 or max_lat >= 90:
+        return -180.0, max(min_lat, -90.0), 180.0, min(max_lat, 90.0)
+
+    d_lon = math.degrees(math.asin(min(1.0, math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(lat)))))
+    min_lon, max_lon = lon - d_lon, lon + d_lon
+    if min_lon < -180:
+        min_lon += 360
+    if max_lon > 180:
+        max_lon -= 360
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def bbox_filter(model, bbox, use_rtree):
+    """Return a filter selecting rows of `model` whose point lies in `bbox`
+
+    The exact comparison on latitude/longitude is always applied; with
+    `use_rtree` it is preceded by an R*Tree lookup of the candidate rowids.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    wraps = min_lon > max_lon
+
+    if wraps:
+        lon_clause = or_(model.longitude >= min_lon, model.longitude <= max_lon)
+    else:
+        lon_clause = model.longitude.between(min_lon, max_lon)
+    exact = and_(model.latitude.between(min_lat, max_lat), lon_clause)
+    if not use_rtree:
+        return exact
+
+    r = places_rtree.c
+    if wraps:
+        rtree_lon = or_(r.max_lon >= min_lon, r.min_lon <= max_lon)
+    else:
+        rtree_lon = and_(r.max_lon >= min_lon, r.min_lon <= max_lon)
+    candidates = select(r.id).where(r.max_lat >= min_lat, r.min_lat <= max_lat, rtree_lon)
+    rowid = literal_column(f"{model.__tablename__}.rowid")
+    return and_(rowid.in_(candidates), exact)
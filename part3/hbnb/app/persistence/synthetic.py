@@ -0,0 +1,310 @@
+import bisect
+import itertools
+import random
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, func, insert, select, text
+from app.models.amenity import Amenity
+from app.models.place import RATINGS, Place, place_amenities
+from app.models.review import Review
+from app.models.user import User
+from app.persistence import search, spatial
+from app.persistence.migrations import trigger_names
+from app.persistence.repository import chunked
+from app.persistence.versions import bump_versions
+""" Deterministic synthetic users, places, amenities and reviews at any scale
+
+Rows are generated from the seed alone: the same seed and sizes produce the
+same data whatever the chunk size. Places cluster around cities weighted by
+popularity, reviews per place follow a Zipf distribution and nobody reviews
+their own place or a place twice. Rows go straight to the tables through
+bulk INSERTs in chunked transactions; the full-text and R*Tree triggers are
+suspended meanwhile and their indexes rebuilt once at the end, and the
+secondary indexes of tables that start empty are built after loading too.
+"""
+
+CITIES = (
+    ("London", 51.5072, -0.1276), ("Paris", 48.8566, 2.3522), ("New York", 40.7128, -74.0060),
+    ("Tokyo", 35.6762, 139.6503), ("Barcelona", 41.3874, 2.1686), ("Rome", 41.9028, 12.4964),
+    ("Lisbon", 38.7223, -9.1393), ("Los Angeles", 34.0522, -118.2437), ("Sydney", -33.8688, 151.2093),
+    ("Berlin", 52.5200, 13.4050), ("Amsterdam", 52.3676, 4.9041), ("Mexico City", 19.4326, -99.1332),
+    ("Cape Town", -33.9249, 18.4241), ("Bangkok", 13.7563, 100.5018), ("Buenos Aires", -34.6037, -58.3816),
+    ("Istanbul", 41.0082, 28.9784), ("Marrakesh", 31.6295, -7.9811), ("Reykjavik", 64.1466, -21.9426),
+)
+ADJECTIVES = ("Cosy", "Sunny", "Quiet", "Spacious", "Modern", "Rustic", "Charming", "Bright",
+              "Elegant", "Tiny", "Historic", "Airy")
+KINDS = ("loft", "studio", "cabin", "villa", "apartment", "cottage", "flat", "house", "bungalow", "room")
+AMENITIES = ("Wifi", "Pool", "Parking", "Kitchen", "Washer", "Air conditioning", "Heating",
+             "Workspace", "TV", "Gym", "Hot tub", "Balcony")
+WORDS = ("great", "clean", "noisy", "friendly", "host", "view", "location", "comfortable", "small",
+         "breakfast", "quiet", "central", "bed", "shower", "value", "stay", "walk", "beach", "metro",
+         "garden", "terrace", "kitchen", "bright", "recommend", "again", "spacious", "late", "check-in")
+FIRST_NAMES = ("Ada", "Ben", "Chloe", "Diego", "Emma", "Farid", "Grace", "Hugo", "Ines", "Jun",
+               "Kofi", "Lea", "Mateo", "Nina", "Omar", "Priya", "Quinn", "Rosa", "Sven", "Yuki")
+LAST_NAMES = ("Smith", "Garcia", "Martin", "Nguyen", "Kim", "Rossi", "Silva", "Muller", "Dubois",
+              "Okafor", "Sato", "Novak", "Haddad", "Jensen", "Costa", "Ivanova")
+
+# Share of each rating per place profile, and how often each profile occurs
+RATING_PROFILES = ((1, 1, 3, 8, 12), (2, 2, 5, 6, 4), (6, 4, 4, 2, 1))
+PROFILE_WEIGHTS = (6, 3, 1)
+
+START = datetime(2022, 1, 1)
+SPAN_SECONDS = 3 * 365 * 24 * 3600
+SPREAD_DEGREES = 0.08  # standard deviation of places around their city, about 9 km
+TEXT_POOL_SIZE = 4096
+CHUNK_SIZE = 20000
+
+_UUID_CLEAR = ~(0xf000 << 64 | 0xc000 << 48)
+_UUID_SET = 0x4000 << 64 | 0x8000 << 48
+
+# Column order of the generated row tuples, that of the tables so rows need no reordering
+USER_COLUMNS = ("first_name", "last_name", "email", "password", "is_admin", "id", "created_at", "updated_at")
+AMENITY_COLUMNS = ("name", "id", "created_at", "updated_at")
+PLACE_COLUMNS = ("title", "description", "price", "latitude", "longitude", "review_count", "rating_sum",
+                 *(f"rating_{rating}" for rating in RATINGS), "owner_id", "id", "created_at", "updated_at")
+LINK_COLUMNS = ("place_id", "amenity_id")
+REVIEW_COLUMNS = ("text", "rating", "place_id", "user_id", "id", "created_at", "updated_at")
+
+
+def zipf_counts(total, n, exponent=1.0, cap=None):
+    """Split `total` over `n` ranks in proportion to 1 / rank ** exponent, at most `cap` each
+
+    What capped ranks cannot take is spread over the others, so the counts
+    sum to `total` unless every rank is at the cap.
+    """
+    if n <= 0:
+        return []
+    weights = [1.0 / rank ** exponent for rank in range(1, n + 1)]
+    suffix = list(itertools.accumulate(reversed(weights)))[::-1]
+    # Weights decrease with rank, so the capped ranks are a prefix
+    capped = 0
+    if cap is not None:
+        while capped < n and (total - capped * cap) * weights[capped] / suffix[capped] > cap:
+            capped += 1
+        if capped == n:
+            return [cap] * n
+    remaining = total - capped * (cap or 0)
+    scale = remaining / suffix[capped]
+    counts = [cap] * capped + [int(weight * scale) for weight in weights[capped:]]
+    for rank in range(capped, capped + remaining - sum(counts[capped:])):
+        counts[rank] += 1
+    return counts
+
+
+def _uuid(rng):
+    """Return a random version 4 UUID string drawn from `rng`, as uuid.UUID(version=4) would"""
+    digits = f"{rng.getrandbits(128) & _UUID_CLEAR | _UUID_SET:032x}"
+    return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+
+def _streams(seed):
+    """One generator per kind of value, so chunking never changes what is drawn"""
+    return {name: random.Random(f"{seed}:{name}") for name in ("users", "places", "ratings", "reviews")}
+
+
+def _city_picker(rng):
+    cumulative = list(itertools.accumulate(1.0 / rank for rank in range(1, len(CITIES) + 1)))
+    return lambda: CITIES[bisect.bisect(cumulative, rng.random() * cumulative[-1])]
+
+
+def generate(engine, users, places, amenities, reviews, seed=0, exponent=1.0, password_hash="",
+             chunk_size=CHUNK_SIZE, progress=None):
+    """Insert synthetic rows into the database of `engine` and return the counts written
+
+    Every user gets `password_hash`. `progress(table, rows)` is called after
+    each committed chunk. Raises ValueError when data of this seed is
+    already present. The suspended triggers and indexes are put back even
+    when loading fails; if the process dies first, migrations.upgrade
+    restores them on the next start.
+    """
+    if places and not users:
+        raise ValueError("Places need at least one user to own them")
+    streams = _streams(seed)
+    email_domain = f"s{seed}.synthetic.example"
+    with engine.connect() as connection:
+        if connection.execute(select(User.id).where(User.email == f"user0@{email_domain}")).first():
+            raise ValueError(f"Synthetic data of seed {seed} is already present")
+
+    tables = [User.__table__, Amenity.__table__, Place.__table__, place_amenities, Review.__table__]
+    loader = _Loader(engine, chunk_size, progress)
+    suspended, deferred = _suspend_indexes(engine, tables)
+    try:
+        user_ids = []
+        loader.write_all(User.__table__, USER_COLUMNS,
+                         _users(streams["users"], users, email_domain, password_hash, loader.stamp, user_ids))
+        amenity_ids = _insert_amenities(loader, amenities)
+        _insert_places_and_reviews(loader, streams, user_ids, amenity_ids, places, reviews, exponent)
+    finally:
+        _restore_indexes(engine, suspended, deferred)
+        with engine.begin() as connection:
+            bump_versions(connection, [table.name for table in tables])
+    return loader.written
+
+
+class _Loader:
+    """Writes row tuples in chunked transactions through INSERTs compiled once per table"""
+
+    def __init__(self, engine, chunk_size, progress=None):
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.written = {}
+        self._statements = {}
+        if engine.dialect.name == "sqlite":
+            # The text format SQLAlchemy stores SQLite datetimes in
+            self.stamp = lambda value: value.isoformat(" ", "microseconds")
+        else:
+            self.stamp = lambda value: value
+
+    def _statement(self, table, columns):
+        """Return the INSERT of `columns` and the order its positional parameters take them in"""
+        if table.name not in self._statements:
+            compiled = insert(table).values({name: bindparam(name) for name in columns}).compile(
+                dialect=self.engine.dialect)
+            order = None
+            if compiled.positiontup is not None:
+                order = [columns.index(name) for name in compiled.positiontup]
+            self._statements[table.name] = (str(compiled), order)
+        return self._statements[table.name]
+
+    def write(self, table, columns, rows):
+        """Insert `rows`, tuples ordered as `columns`, in one transaction"""
+        statement, order = self._statement(table, columns)
+        if order is None:
+            rows = [dict(zip(columns, row)) for row in rows]
+        elif order != list(range(len(columns))):
+            rows = [tuple(row[index] for index in order) for row in rows]
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(statement, rows)
+        self.written[table.name] = self.written.get(table.name, 0) + len(rows)
+        if self.progress is not None:
+            self.progress(table.name, self.written[table.name])
+
+    def write_all(self, table, columns, rows):
+        """Insert an iterable of rows a chunk at a time"""
+        for chunk in chunked(rows, self.chunk_size):
+            self.write(table, columns, chunk)
+
+
+def _users(rng, count, email_domain, password_hash, stamp, user_ids):
+    """Yield user rows, appending their IDs to `user_ids`"""
+    for n in range(count):
+        created_at = stamp(START + timedelta(seconds=rng.randrange(SPAN_SECONDS)))
+        user_id = _uuid(rng)
+        user_ids.append(user_id)
+        first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield (first_name, last_name, f"user{n}@{email_domain}", password_hash, False,
+               user_id, created_at, created_at)
+
+
+def _insert_amenities(loader, count):
+    """Create the first `count` amenity names and return their IDs, reusing amenities that exist"""
+    names = [AMENITIES[n] if n < len(AMENITIES) else f"{AMENITIES[n % len(AMENITIES)]} {n // len(AMENITIES)}"
+             for n in range(count)]
+    table = Amenity.__table__
+    with loader.engine.connect() as connection:
+        ids = dict(connection.execute(select(table.c.name, table.c.id).where(table.c.name.in_(names))).all())
+    created = loader.stamp(START)
+    rows = [(name, str(uuid.uuid5(uuid.NAMESPACE_URL, f"amenity:{name}")), created, created)
+            for name in names if name not in ids]
+    if rows:
+        loader.write(table, AMENITY_COLUMNS, rows)
+    ids.update((row[0], row[1]) for row in rows)
+    return [ids[name] for name in names]
+
+
+def _insert_places_and_reviews(loader, streams, user_ids, amenity_ids, count, total_reviews, exponent):
+    """Insert places a chunk at a time, each chunk followed by its amenity links and reviews
+
+    Ratings are drawn before their places are written so the places carry
+    their review aggregates from the start.
+    """
+    rng, ratings_rng, reviews_rng = streams["places"], streams["ratings"], streams["reviews"]
+    counts = zipf_counts(total_reviews, count, exponent, max(0, len(user_ids) - 1))
+    rng.shuffle(counts)
+    city = _city_picker(rng)
+    descriptions = [" ".join(rng.choices(WORDS, k=rng.randint(8, 40))).capitalize() for _ in range(TEXT_POOL_SIZE)]
+    texts = [" ".join(reviews_rng.choices(WORDS, k=reviews_rng.randint(3, 60))).capitalize()
+             for _ in range(TEXT_POOL_SIZE)]
+
+    for chunk in chunked(counts, loader.chunk_size):
+        places, links, reviewed = [], [], []
+        for review_count in chunk:
+            name, latitude, longitude = city()
+            created_at = START + timedelta(seconds=rng.randrange(SPAN_SECONDS))
+            place_id = _uuid(rng)
+            owner_id = rng.choice(user_ids)
+            profile = ratings_rng.choices(RATING_PROFILES, PROFILE_WEIGHTS)[0]
+            ratings = ratings_rng.choices(RATINGS, profile, k=review_count)
+            stamp = loader.stamp(created_at)
+            places.append((
+                f"{rng.choice(ADJECTIVES)} {rng.choice(KINDS)} in {name}",
+                rng.choice(descriptions),
+                round(rng.lognormvariate(4.5, 0.6), 2),
+                max(-90.0, min(90.0, rng.gauss(latitude, SPREAD_DEGREES))),
+                max(-180.0, min(180.0, rng.gauss(longitude, SPREAD_DEGREES))),
+                review_count, sum(ratings), *(ratings.count(rating) for rating in RATINGS),
+                owner_id, place_id, stamp, stamp,
+            ))
+            links.extend((place_id, amenity_id)
+                         for amenity_id in rng.sample(amenity_ids, rng.randint(0, min(8, len(amenity_ids)))))
+            if ratings:
+                reviewed.append((place_id, owner_id, created_at, ratings))
+
+        loader.write(Place.__table__, PLACE_COLUMNS, places)
+        loader.write_all(place_amenities, LINK_COLUMNS, links)
+        loader.write_all(Review.__table__, REVIEW_COLUMNS,
+                         _reviews(reviews_rng, reviewed, user_ids, texts, loader.stamp))
+
+
+def _reviews(rng, reviewed, user_ids, texts, stamp):
+    """Yield the reviews of each place, by distinct users other than its owner, after it was created"""
+    for place_id, owner_id, created_at, ratings in reviewed:
+        reviewers = rng.sample(range(len(user_ids)), len(ratings) + 1)
+        remaining = SPAN_SECONDS - int((created_at - START).total_seconds())
+        position = 0
+        for index in reviewers:
+            user_id = user_ids[index]
+            if user_id == owner_id:
+                continue
+            reviewed_at = stamp(created_at + timedelta(seconds=rng.randrange(max(1, remaining))))
+            review_id, body = _uuid(rng), texts[rng.randrange(TEXT_POOL_SIZE)]
+            yield (body, ratings[position], place_id, user_id, review_id, reviewed_at, reviewed_at)
+            position += 1
+            if position == len(ratings):
+                break
+
+
+def _suspend_indexes(engine, tables):
+    """Drop the index triggers, and the secondary indexes of `tables` that are empty
+
+    Returns what _restore_indexes needs to put them back.
+    """
+    suspended = set()
+    deferred = []
+    with engine.begin() as connection:
+        if engine.dialect.name == "sqlite":
+            existing = set(connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")).scalars())
+            for kind, ddl in (("fts", search.FTS_DDL), ("rtree", spatial.RTREE_DDL)):
+                for name in trigger_names(ddl):
+                    if name in existing:
+                        connection.execute(text(f"DROP TRIGGER {name}"))
+                        suspended.add(kind)
+        for table in tables:
+            if connection.execute(select(func.count()).select_from(select(table).limit(1).subquery())).scalar():
+                continue
+            for index in table.indexes:
+                index.drop(connection, checkfirst=True)
+                deferred.append(index)
+    return suspended, deferred
+
+
+def _restore_indexes(engine, suspended, deferred):
+    """Build the deferred indexes, then recreate the index triggers and reload what they index"""
+    with engine.begin() as connection:
+        for index in deferred:
+            index.create(connection, checkfirst=True)
+        if "fts" in suspended:
+            search.create_fts(connection)
+        if "rtree" in suspended:
+            spatial.create_rtree(connection)
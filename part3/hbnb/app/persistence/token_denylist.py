@@ -0,0 +1,41 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, String, delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.persistence.unit_of_work import unit_of_work
+""" Deny list of refresh tokens that were rotated or revoked
+
+Rows are keyed by the jti of a token, or by the id of a token family to
+revoke every token descending from one login. A row is only needed until
+the tokens it names expire, after which purge_expired drops it.
+"""
+
+token_denylist = db.Table(
+    'token_denylist',
+    Column('jti', String(36), primary_key=True),
+    Column('expires_at', DateTime, nullable=False, index=True)
+)
+
+
+def is_revoked(token_id):
+    """Return True when a token or family id is denied"""
+    return db.session.scalar(select(token_denylist.c.jti).where(token_denylist.c.jti == token_id)) is not None
+
+
+def revoke(token_id, expires_at):
+    """Deny a token or family id, returns False when it already was"""
+    try:
+        with unit_of_work():
+            db.session.execute(insert(token_denylist).values(jti=token_id, expires_at=expires_at))
+    except IntegrityError:
+        return False
+    return True
+
+
+def purge_expired(now=None):
+    """Drop the rows of tokens that have expired anyway, returns how many"""
+    with unit_of_work():
+        result = db.session.execute(
+            delete(token_denylist).where(token_denylist.c.expires_at < (now or datetime.utcnow()))
+        )
+    return result.rowcount
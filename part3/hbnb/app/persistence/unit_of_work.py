@@ -0,0 +1,34 @@
+from contextlib import contextmanager
+from app.extensions import db
+""" Unit of work scope shared by the repositories and the facade """
+
+_DEPTH_KEY = "unit_of_work_depth"
+
+
+def in_unit_of_work():
+    """Return True when a unit of work is open on the current session"""
+    return db.session.info.get(_DEPTH_KEY, 0) > 0
+
+
+@contextmanager
+def unit_of_work():
+    """Group repository writes so that the outermost block commits exactly once
+
+    Nested blocks join the enclosing one. Autoflush is disabled inside the
+    block, so pending changes reach the database in a single flush at commit
+    time, and the whole block is rolled back if anything raises.
+    """
+    session = db.session
+    depth = session.info.get(_DEPTH_KEY, 0)
+    session.info[_DEPTH_KEY] = depth + 1
+    try:
+        with session.no_autoflush:
+            yield session
+        if depth == 0:
+            session.commit()
+    except Exception:
+        if depth == 0:
+            session.rollback()
+        raise
+    finally:
+        session.info[_DEPTH_KEY] = depth
@@ -1,6 +1,24 @@
+from sqlalchemy import delete, or_, select
+from app.extensions import db
 from app.persistence.repository import SQLAlchemyRepository
+from app.persistence.place_repository import refresh_ratings
 from app.models.user import User
+from app.models.place import Place, place_amenities
+from app.models.review import Review
 
 class UserRepository(SQLAlchemyRepository):
     def __init__(self):
-        super().__init__(User)
\ No newline at end of file
+        super().__init__(User)
+
+    def _delete_dependents(self, obj_ids):
+        owned_places = select(Place.id).where(Place.owner_id.in_(obj_ids))
+        reviewed_places = set(db.session.scalars(
+            select(Review.place_id).where(Review.user_id.in_(obj_ids), Review.place_id.not_in(owned_places)).distinct()
+        ))
+        db.session.execute(delete(Review).where(or_(
+            Review.user_id.in_(obj_ids),
+            Review.place_id.in_(owned_places)
+        )))
+        db.session.execute(delete(place_amenities).where(place_amenities.c.place_id.in_(owned_places)))
+        db.session.execute(delete(Place).where(Place.owner_id.in_(obj_ids)))
+        refresh_ratings(reviewed_places)
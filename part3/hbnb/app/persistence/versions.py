@@ -0,0 +1,129 @@
+import random
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, String, event, func, inspect, insert, select, update
+from app.extensions import db
+""" Per-table version counters bumped by every committed write
+
+A counter lives in the database rather than in the process, so every worker
+sees the same version and a validator handed out by one worker is checked
+against writes made through any other. Writes are tracked per session, from
+ORM flushes and from bulk statements, and the counters of the tables they
+touched are bumped once, in the transaction that commits them.
+
+Each counter is split over VERSION_SHARDS rows and a commit bumps one of
+them at random, so concurrent writers to a table rarely wait on the same
+row; a table's version is the sum of its shards. The counters only
+validate collection listings: single resources are validated from the
+rows they show.
+"""
+
+_TOUCHED_KEY = "collection_versions_touched"
+
+collection_versions = db.Table(
+    'collection_versions',
+    Column('name', String(64), primary_key=True),
+    Column('version', Integer, nullable=False, default=0),
+    Column('updated_at', DateTime, nullable=False, default=datetime.utcnow)
+)
+
+VERSION_SHARDS = 8
+
+# A representation's validator: `tag` changes whenever the representation
+# may have changed, `last_modified` is when it last did.
+Version = namedtuple("Version", ["tag", "last_modified"])
+
+
+def shard_names(name, shards=VERSION_SHARDS):
+    """Return the counter rows of a table, the first one named after the table"""
+    return [name] + [f"{name}#{shard}" for shard in range(1, shards)]
+
+
+def seed_versions(connection, names, shards=VERSION_SHARDS):
+    """Create the counter shards of the named tables if they are missing"""
+    existing = set(connection.execute(select(collection_versions.c.name)).scalars())
+    missing = [{"name": shard, "version": 0, "updated_at": datetime.utcnow()}
+               for name in names for shard in shard_names(name, shards) if shard not in existing]
+    if missing:
+        connection.execute(insert(collection_versions), missing)
+
+
+def version_columns(names):
+    """Return labeled scalar subqueries reading the version and time of each table
+
+    They can be added to any SELECT so that a row and the counters it
+    depends on are read in a single statement.
+    """
+    columns = []
+    for name in names:
+        rows = collection_versions.c.name.in_(shard_names(name))
+        columns.append(select(func.sum(collection_versions.c.version)).where(rows)
+                       .scalar_subquery().label(f"{name}_version"))
+        columns.append(select(func.max(collection_versions.c.updated_at)).where(rows)
+                       .scalar_subquery().label(f"{name}_updated_at"))
+    return columns
+
+
+def combine(key, last_modified, row, names):
+    """Build a Version from a row holding the version_columns of `names`"""
+    parts = [key]
+    for name in names:
+        parts.append(f"{name}:{row._mapping[f'{name}_version']}")
+        updated_at = row._mapping[f"{name}_updated_at"]
+        if updated_at and (last_modified is None or updated_at > last_modified):
+            last_modified = updated_at
+    return Version("|".join(parts), last_modified)
+
+
+def collection_version(names):
+    """Return the Version of a listing built from the named tables"""
+    row = db.session.execute(select(*version_columns(names))).one()
+    return combine("", None, row, names)
+
+
+def bump_versions(executor, names):
+    """Bump one shard of the counter of each named table, for writes made outside of the session"""
+    shard = random.randrange(VERSION_SHARDS)
+    executor.execute(
+        update(collection_versions)
+        .where(collection_versions.c.name.in_(sorted(shard_names(name)[shard] for name in names)))
+        .values(version=collection_versions.c.version + 1, updated_at=datetime.utcnow())
+    )
+
+
+def _touch(session, name):
+    if name != collection_versions.name:
+        session.info.setdefault(_TOUCHED_KEY, set()).add(name)
+
+
+@event.listens_for(db.session, "before_flush")
+def _before_flush(session, flush_context, instances):
+    for obj in session.new | session.deleted | session.dirty:
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        _touch(session, obj.__table__.name)
+        # Rows of association tables are written by the flush itself
+        state = inspect(obj)
+        for relationship in state.mapper.relationships:
+            if relationship.secondary is not None and (
+                    obj in session.deleted or state.attrs[relationship.key].history.has_changes()):
+                _touch(session, relationship.secondary.name)
+
+
+@event.listens_for(db.session, "do_orm_execute")
+def _do_orm_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _touch(orm_execute_state.session, orm_execute_state.statement.table.name)
+
+
+@event.listens_for(db.session, "before_commit")
+def _before_commit(session):
+    session.flush()
+    touched = session.info.pop(_TOUCHED_KEY, None)
+    if touched:
+        bump_versions(session, touched)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(_TOUCHED_KEY, None)
@@ -1,84 +1,153 @@
-from app.persistence.repository import SQLAlchemyRepository
+from app.persistence.repository import SQLAlchemyRepository, chunked
 from app.persistence.user_repository import UserRepository
 from app.persistence.place_repository import PlaceRepository
 from app.persistence.review_repository import ReviewRepository
 from app.persistence.amenity_repository import AmenityRepository
+from app.persistence.unit_of_work import unit_of_work
+from app.persistence.cache import CachedRepository
+from app.persistence.versions import collection_version
+from app.persistence import export, token_denylist
+from app.extensions import db
+from app.services import importing, response_cache
 from app.models import storage
 from app.models.user import User
 from app.models.place import Place
 from app.models.review import Review
 from app.models.amenity import Amenity
+import logging
 import uuid
 from datetime import datetime
 """ Facade class to interact with the storage and perform business logic """
 
+log = logging.getLogger(__name__)
+
+
 class HBnBFacade:
     """ Facade class to interact with the storage and perform business logic """
     def __init__(self):
         """ Initialize the facade with in-memory repositories """
-        self.user_repo = UserRepository()
-        self.place_repo = PlaceRepository()
-        self.review_repo = ReviewRepository()
-        self.amenity_repo = AmenityRepository()
-        self.place_repo = SQLAlchemyRepository(Place)
-        self.review_repo = SQLAlchemyRepository(Review)
-        self.amenity_repo = SQLAlchemyRepository(Amenity)
+        self.user_repo = CachedRepository(UserRepository())
+        self.place_repo = CachedRepository(PlaceRepository())
+        self.review_repo = CachedRepository(ReviewRepository())
+        self.amenity_repo = CachedRepository(AmenityRepository())
         self.amenity_repository = SQLAlchemyRepository(Amenity)
         self.storage = storage
 
+    def unit_of_work(self):
+        """Open a scope in which every repository write is committed once at the end"""
+        return unit_of_work()
+
 #------------------------------------------------------------USERS-----------------------------------------------------------------
     def get_all_users(self):
-        """Retrieve all users from storage"""
-        users = self.storage.all(User).values()
-        return list(users)
+        """Retrieve all users"""
+        return self.user_repo.get_all()
+
+    def get_users_page(self, limit, after=None, with_total=False):
+        """Retrieve one page of users ordered by creation date"""
+        return self.user_repo.get_page(limit, after, with_total=with_total)
 
     def create_user(self, user_data):
         """Create a new user and store in storage"""
-        print(f"Received user data: {user_data}")
-        user = User(**user_data)
-        user.hash_password(user_data['password'])
-        self.user_repo.add(user)
+        with self.unit_of_work():
+            user = User(**user_data)
+            user.hash_password(user_data['password'])
+            self.user_repo.add(user)
+        log.info("User created", extra={"user_id": user.id})
         return user
 
     def delete_user(self, user_id):
         """Delete a user by ID."""
-        user = self.user_repo.get(user_id)
-        if not user:
-            raise ValueError(f"User with ID {user_id} not found")
+        with self.unit_of_work():
+            user = self.user_repo.get(user_id)
+            if not user:
+                raise ValueError(f"User with ID {user_id} not found")
 
-        self.user_repo.delete(user_id)
+            # Reviews left on other people's places go with the user
+            removed = {}
+            for review in user.reviews:
+                removed.setdefault(review.place_id, []).append(review.rating)
+            for place_id, ratings in removed.items():
+                place = self.place_repo.get(place_id)
+                if place.owner_id != user_id:
+                    place.adjust_ratings(removed=ratings)
+
+            self.user_repo.delete(user_id)
+            # Places and reviews go with the user
+            response_cache.invalidate()
         return {"message": f"User {user_id} deleted successfully"}
 
     def get_user(self, user_id):
         """Retrieve a user by ID"""
-        print(f"Fetching user with ID: {user_id}")
-        return self.user_repo.get(User, user_id)
+        return self.user_repo.get(user_id)
 
     def get_user_by_email(self, email):
         """Retrieve user by email"""
         return self.user_repo.get_by_attribute('email', email)
+
+    def authenticate(self, email, password):
+        """Return the user with these credentials, or None
+
+        A password hashed at another cost than the configured one is
+        rehashed, since this is the only time the plain password is known.
+        """
+        user = self.get_user_by_email(email)
+        if not user or not user.verify_password(password):
+            return None
+        if user.password_needs_rehash():
+            with self.unit_of_work():
+                user.hash_password(password)
+        return user
+
+    def is_token_family_revoked(self, family):
+        """Return True when the refresh tokens of a login were revoked"""
+        return token_denylist.is_revoked(family)
+
+    def rotate_refresh_token(self, jti, family, expires_at, family_expires_at):
+        """Retire a refresh token being exchanged for a new one
+
+        Returns False when the token was already exchanged, which means it
+        leaked or was replayed: its whole family is revoked in that case.
+        """
+        if token_denylist.revoke(jti, expires_at):
+            return True
+        token_denylist.revoke(family, family_expires_at)
+        return False
+
+    def purge_revoked_tokens(self):
+        """Forget revoked tokens that have expired, returns how many"""
+        return token_denylist.purge_expired()
     
     def update_user(self, user_id, user_data):
         """Update an existing user with new data."""
-        user = self.user_repo.get(User, user_id)
-        if not user:
-            raise ValueError(f"User with ID {user_id} not found")
-
-        existing_user = self.get_user_by_email(user_data.get("email"))
-        if existing_user and existing_user.id != user_id:
-            raise ValueError("Email already registered by another user")
+        with self.unit_of_work():
+            user = self.user_repo.get(user_id)
+            if not user:
+                raise ValueError(f"User with ID {user_id} not found")
 
-        for key, value in user_data.items():
-            setattr(user, key, value)
+            existing_user = self.get_user_by_email(user_data.get("email"))
+            if existing_user and existing_user.id != user_id:
+                raise ValueError("Email already registered by another user")
 
-        self.user_repo.add(user)
+            for key, value in user_data.items():
+                setattr(user, key, value)
+            response_cache.invalidate("users", f"user:{user_id}")
         return user
 
 #------------------------------------------------------------PLACES-----------------------------------------------------------------
-    def get_place(self, place_id):
-        """Retrieve a place by ID and return as a dictionary"""
-        place = self.place_repo.get(place_id)
-        return place.to_dict() if place else None
+    def get_place(self, place_id, strategy="selectin", fields=None, include=None):
+        """Retrieve a place by ID and return as a dictionary
+
+        `fields` and `include` select what to serialize, see Place.to_dict.
+        """
+        self._validate_fieldset(fields, include)
+        if fields is None and include is None:
+            place = self.place_repo.get(place_id, strategy=strategy)
+        else:
+            # All columns are loaded so the entity cache keeps whole rows
+            place = self.place_repo.get(place_id, options=self.place_repo.sparse_options(None, include))
+        if not place:
+            return None
+        return self._serialize_places([place], fields, include)[0]
 
     def create_place(self, place_data):
         """Create a new place with validation"""
@@ -107,137 +176,360 @@ class HBnBFacade:
         if not isinstance(longitude, (int, float)) or not -180 <= longitude <= 180:
             raise ValueError("Longitude must be between -180 and 180")
 
-        new_place = Place(
-            title=place_data.get("title"),
-            description=place_data.get("description", ""),
-            price=price,
-            latitude=latitude,
-            longitude=longitude,
-            owner_id=owner_id
-        )
-
-        self.place_repo.add(new_place)
+        with self.unit_of_work():
+            new_place = Place(
+                title=place_data.get("title"),
+                description=place_data.get("description", ""),
+                price=price,
+                latitude=latitude,
+                longitude=longitude,
+                owner=owner,
+                reviews=[],
+                amenities=[]
+            )
+            self.place_repo.add(new_place)
+            response_cache.invalidate("places")
+        log.info("Place created", extra={"place_id": new_place.id, "owner_id": owner.id})
         return new_place.to_dict()
 
-    def update_place(self, place_id, data):
-        """Update an existing place"""
-        place = self.place_repo.get(place_id)
-        if not place:
-            return None
+    # Columns a place's owner may change; the review aggregates are only
+    # ever written by Place.adjust_ratings and the ratings repair
+    PLACE_EDITABLE = ("title", "description", "price", "latitude", "longitude", "amenities")
 
-        for key, value in data.items():
-            if hasattr(place, key):
-                setattr(place, key, value)
+    def update_place(self, place_id, data, owner_editable=False):
+        """Update an existing place
 
-        self.place_repo.update(place_id, data)
+        Only PLACE_EDITABLE fields, and the owner_id when `owner_editable`,
+        may be set; an owner_id equal to the current one is accepted as is.
+        `amenities` is a list of amenity IDs.
+        """
+        with self.unit_of_work():
+            place = self.place_repo.get(place_id)
+            if not place:
+                return None
+
+            editable = set(self.PLACE_EDITABLE) | ({"owner_id"} if owner_editable else set())
+            rejected = {key for key in data if key not in editable} - (
+                {"owner_id"} if data.get("owner_id") == place.owner_id else set())
+            if rejected:
+                raise ValueError(f"Cannot update {', '.join(sorted(rejected))}")
+            if owner_editable and "owner_id" in data and not self.user_repo.get(data["owner_id"]):
+                raise ValueError(f"Owner with ID {data['owner_id']} not found")
+
+            for key, value in data.items():
+                if key == "amenities":
+                    amenities = self.amenity_repo.get_many(value)
+                    missing = set(value) - {amenity.id for amenity in amenities}
+                    if missing:
+                        raise ValueError(f"Amenity with ID {sorted(missing)[0]} not found")
+                    place.amenities = amenities
+                else:
+                    setattr(place, key, value)
+            response_cache.invalidate("places", f"place:{place_id}")
         return {"message": "Place updated successfully"}
 
-    def get_all_places(self):
-        """Retrieve all places from storage and return JSON-serializable data"""
-        return [place.to_dict() for place in self.place_repo.get_all()]
+    def get_all_places(self, strategy="selectin"):
+        """Retrieve all places and return JSON-serializable data
+
+        The owner, reviews and amenities are eager-loaded according to
+        `strategy` (see PlaceRepository.LOAD_STRATEGIES) so serializing the
+        listing does not issue one lazy load per place.
+        """
+        places = self.place_repo.get_all(strategy=strategy)
+        return [place.to_dict() for place in places]
+
+    PLACE_SORTS = ("created_at", "-created_at", "price", "-price", "rating", "-rating",
+                   "review_count", "-review_count")
+
+    def get_places_page(self, limit, after=None, with_total=False, strategy="selectin", bbox=None,
+                        min_price=None, max_price=None, sort="created_at", fields=None, include=None):
+        """Retrieve one page of places, optionally filtered and sorted
+
+        `bbox` is (min_lon, min_lat, max_lon, max_lat); min_lon may exceed
+        max_lon for a box crossing the antimeridian. `sort` is one of
+        PLACE_SORTS and cursors are only valid for the sort that issued them.
+        `fields` and `include` select what to load and serialize.
+        """
+        if sort not in self.PLACE_SORTS:
+            raise ValueError(f"sort must be one of: {', '.join(self.PLACE_SORTS)}")
+        filters = self._place_filters(bbox, min_price, max_price)
+        page = self.place_repo.get_page(limit, after, with_total=with_total, filters=filters, sort=sort,
+                                        **self._place_loading(strategy, fields, include))
+        return page._replace(items=self._serialize_places(page.items, fields, include))
+
+    # Streamed places are serialized in batches so capped reviews are
+    # fetched with one query per batch
+    STREAM_BATCH_SIZE = 200
+
+    def iter_places(self, strategy="selectin", bbox=None, min_price=None, max_price=None, fields=None, include=None):
+        """Yield every place as JSON-serializable data, in creation order
+
+        Rows are read in batches with yield_per rather than all at once; the
+        filters are those of get_places_page. Validation happens before the
+        first place is yielded.
+        """
+        places = self.place_repo.iter_all(filters=self._place_filters(bbox, min_price, max_price),
+                                          **self._place_loading(strategy, fields, include))
+        return (
+            place_data
+            for batch in chunked(places, self.STREAM_BATCH_SIZE)
+            for place_data in self._serialize_places(batch, fields, include)
+        )
+
+    # Tables behind each relation Place.to_dict can embed
+    PLACE_EMBED_TABLES = {
+        "owner": ("users",),
+        "reviews": ("reviews",),
+        "amenities": ("amenities", "place_amenities"),
+    }
+
+    def place_embeds(self, fields=None, include=None):
+        """Return the relations a place representation embeds"""
+        self._validate_fieldset(fields, include)
+        if fields is None and include is None:
+            include = Place.EMBEDDABLE
+        return sorted(include or ())
+
+    def place_embed_tables(self, fields=None, include=None):
+        """Return the tables a place representation reads besides places"""
+        return sorted({table for name in self.place_embeds(fields, include) for table in self.PLACE_EMBED_TABLES[name]})
+
+    def get_place_version(self, place_id, fields=None, include=None):
+        """Return the Version of a place representation, None if the place does not exist"""
+        return self.place_repo.get_version(place_id, self.place_embeds(fields, include))
+
+    def get_places_version(self, fields=None, include=None):
+        """Return the Version of place listings"""
+        return collection_version(["places"] + self.place_embed_tables(fields, include))
+
+    def get_search_version(self, fields=None, include=None):
+        """Return the Version of place search results, which also match on review text"""
+        return collection_version(sorted({"places", "reviews", *self.place_embed_tables(fields, include)}))
+
+    def _validate_fieldset(self, fields=None, include=None):
+        """Ensure the requested fields and embedded relations exist on Place"""
+        for name in fields or ():
+            if name not in Place.FIELDS:
+                raise ValueError(f"Unknown field: {name}")
+        for name in include or ():
+            if name not in Place.EMBEDDABLE:
+                raise ValueError(f"Cannot include: {name}")
+
+    def _place_loading(self, strategy, fields=None, include=None):
+        """Return the repository keyword arguments loading what will be serialized"""
+        self._validate_fieldset(fields, include)
+        if fields is None and include is None:
+            return {"strategy": strategy}
+        return {"options": self.place_repo.sparse_options(fields, include)}
+
+    def _serialize_places(self, places, fields=None, include=None):
+        """Serialize places, fetching capped review lists in one batch"""
+        limit = (include or {}).get("reviews")
+        if limit is None:
+            return [place.to_dict(fields, include) for place in places]
+        latest = self.review_repo.latest_for_places([place.id for place in places], limit)
+        return [place.to_dict(fields, include, reviews=latest[place.id]) for place in places]
+
+    def _place_filters(self, bbox=None, min_price=None, max_price=None):
+        """Validate listing filters and return them as SQL criteria"""
+        for name, value in (("min_price", min_price), ("max_price", max_price)):
+            if value is not None and value < 0:
+                raise ValueError(f"{name} must be a non-negative number")
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise ValueError("min_price must not exceed max_price")
+
+        filters = self.place_repo.price_filters(min_price, max_price)
+        if bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            self._validate_coordinates(min_lat, min_lon)
+            self._validate_coordinates(max_lat, max_lon)
+            if min_lat > max_lat:
+                raise ValueError("bbox minimum latitude must not exceed its maximum latitude")
+            filters.append(self.place_repo.bbox_filter(bbox))
+        return filters
+
+    def search_places(self, query, limit, after=None, with_total=False, strategy="selectin", fields=None, include=None):
+        """Retrieve one page of places matching a full-text query, best match first
+
+        Each place carries a `snippet` of the matching text, HTML-escaped, with hits in <b>.
+        """
+        page = self.place_repo.search_page(query, limit, after, with_total=with_total,
+                                           **self._place_loading(strategy, fields, include))
+        places = self._serialize_places([place for place, _ in page.items], fields, include)
+        for place_data, (_, snippet) in zip(places, page.items):
+            place_data["snippet"] = snippet
+        return page._replace(items=places)
+
+    def get_places_near(self, latitude, longitude, radius_km, limit, strategy="selectin", fields=None, include=None,
+                        min_price=None, max_price=None):
+        """Retrieve the places within radius_km of a point, nearest first, optionally in a price range"""
+        self._validate_coordinates(latitude, longitude)
+        if not 0 < radius_km <= 20000:
+            raise ValueError("radius_km must be between 0 and 20000")
+
+        nearby = self.place_repo.get_nearby(latitude, longitude, radius_km, limit,
+                                            filters=self._place_filters(None, min_price, max_price),
+                                            **self._place_loading(strategy, fields, include))
+        places = self._serialize_places([place for place, _ in nearby], fields, include)
+        for place_data, (_, distance) in zip(places, nearby):
+            place_data["distance_km"] = round(distance, 3)
+        return places
+
+    def _validate_coordinates(self, latitude, longitude):
+        """Ensure a point has a valid latitude and longitude"""
+        if not -90 <= latitude <= 90:
+            raise ValueError("Latitude must be between -90 and 90")
+        if not -180 <= longitude <= 180:
+            raise ValueError("Longitude must be between -180 and 180")
 
 #------------------------------------------------------------REVIEWS-----------------------------------------------------------------
 
     def create_review(self, review_data):
         """Create a new review with validation"""
+        user_id = review_data.get("user_id")
+        place_id = review_data.get("place_id")
+        rating = review_data.get("rating")
+        text = review_data.get("text")
         try:
-            print(f"Received review data: {review_data}")
-
-            user_id = review_data.get("user_id")
-            place_id = review_data.get("place_id")
-            rating = review_data.get("rating")
-            text = review_data.get("text")
-
-            print(f"Checking user with ID: {user_id}")
-            user = self.user_repo.get(user_id)
-            if not user:
-                raise ValueError(f"User with ID {user_id} not found")
-
-            print(f"Checking place with ID: {place_id}")
-            place = self.place_repo.get(place_id)
-            if not place:
-                raise ValueError(f"Place with ID {place_id} not found")
-
-            print(f"Validating rating: {rating}")
-            if rating is None or not isinstance(rating, int) or not 1 <= rating <= 5:
-                raise ValueError("Rating must be an integer between 1 and 5")
-
-            print(f"Validating review text: {text}")
-            if not text or not isinstance(text, str) or text.strip() == "":
-                raise ValueError("Review text cannot be empty")
-
-            print("All validations passed. Creating review...")
-            new_review = Review(
-                id=str(uuid.uuid4()),
-                user_id=user_id,
-                place_id=place_id,
-                rating=rating,
-                text=text,
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow()
-            )
-
-            print(f"Assigned ID to review: {new_review.id}")
-            self.review_repo.add(new_review)
-
-            stored_review = self.review_repo.get(new_review.id)
-            print(f"Successfully created review: {stored_review}")
-            return stored_review.to_dict()
+            with self.unit_of_work():
+                user = self.user_repo.get(user_id)
+                if not user:
+                    raise ValueError(f"User with ID {user_id} not found")
+
+                place = self.place_repo.get(place_id)
+                if not place:
+                    raise ValueError(f"Place with ID {place_id} not found")
+
+                if rating is None or not isinstance(rating, int) or not 1 <= rating <= 5:
+                    raise ValueError("Rating must be an integer between 1 and 5")
+
+                if not text or not isinstance(text, str) or text.strip() == "":
+                    raise ValueError("Review text cannot be empty")
+
+                new_review = Review(
+                    id=str(uuid.uuid4()),
+                    user_id=user_id,
+                    place_id=place_id,
+                    rating=rating,
+                    text=text,
+                    created_at=datetime.utcnow(),
+                    updated_at=datetime.utcnow()
+                )
+
+                self.review_repo.add(new_review)
+                place.adjust_ratings(added=[rating])
+                response_cache.invalidate("reviews", "places", f"place:{place_id}")
+
+            log.info("Review created", extra={"review_id": new_review.id, "place_id": place_id, "user_id": user_id})
+            return new_review.to_dict()
 
         except Exception as e:
-            print(f"Error creating review: {str(e)}")
+            log.warning("Review rejected", extra={"place_id": place_id, "user_id": user_id, "reason": str(e)})
             raise
 
-    def get_review(self, review_id):
-        """Fetch a review by its ID."""
-        review = self.review_repo.get(review_id)
+    def get_review(self, review_id, as_of=None):
+        """Fetch a review by its ID, as of the updated_at its validator was read from if given"""
+        review = self.review_repo.get(review_id, as_of=as_of)
         if not review:
             raise ValueError(f"Review with ID {review_id} not found.")
         return review
 
+    def get_user_review_for_place(self, user_id, place_id):
+        """Retrieve the review a user already left on a place, if any"""
+        return self.review_repo.get_by_user_and_place(user_id, place_id)
+
     def save_review(self, review):
         """Save a review to repository"""
-        try:
-            print(f"Saving review: {review.id}")
-            self.review_repo.add(review)
-        except Exception as e:
-            print(f"Error saving review: {str(e)}")
-            raise
+        self.review_repo.add(review)
 
     def get_all_reviews(self):
         """Retrieve all reviews and return JSON-serializable data"""
-        try:
-            reviews = self.review_repo.get_all()
-            print(f"Retrieved {len(reviews)} reviews")
+        reviews_list = [review.to_dict() for review in self.review_repo.get_all()]
+        log.debug("Reviews listed", extra={"count": len(reviews_list)})
+        return reviews_list
 
-            reviews_list = [review.to_dict() for review in reviews]
-            print(f"Successfully converted reviews: {reviews_list}")
+    def iter_reviews(self):
+        """Yield every review as JSON-serializable data, read in batches"""
+        return (review.to_dict() for review in self.review_repo.iter_all())
 
-            return reviews_list
-        except Exception as e:
-            print(f"Error retrieving reviews: {str(e)}")
-            raise
+    def get_review_version(self, review_id):
+        """Return the Version of a review, None if it does not exist"""
+        return self.review_repo.get_version(review_id)
+
+    def get_reviews_version(self):
+        """Return the Version of review listings"""
+        return collection_version(["reviews"])
+
+    def get_place_reviews_version(self, place_id):
+        """Return the Version of a place's review listing, None if the place does not exist"""
+        return self.place_repo.get_version(place_id, ["reviews"])
+
+    def get_reviews_page(self, limit, after=None, with_total=False):
+        """Retrieve one page of reviews as JSON-serializable data"""
+        page = self.review_repo.get_page(limit, after, with_total=with_total)
+        return page._replace(items=[review.to_dict() for review in page.items])
+
+    def get_reviews_by_place(self, place_id, limit, after=None, min_rating=None, with_total=False):
+        """Retrieve one page of a place's reviews, newest first
+
+        The total comes from the place's rating histogram, not a COUNT.
+        """
+        place = self.place_repo.get(place_id)
+        if not place:
+            raise ValueError(f"Place with ID {place_id} not found")
+        if min_rating is not None and (not isinstance(min_rating, int) or not 1 <= min_rating <= 5):
+            raise ValueError("min_rating must be an integer between 1 and 5")
+
+        page = self.review_repo.get_place_page(place_id, limit, after, min_rating)
+        total = None
+        if with_total:
+            total = sum(getattr(place, f"rating_{rating}") for rating in range(min_rating or 1, 6))
+        return page._replace(items=[review.to_dict() for review in page.items], total=total)
 
     def update_review(self, review_id, review_data):
         """Update the review with new data."""
-        review = self.get_review(review_id)
-        if not review:
-            raise ValueError(f"Review with ID {review_id} not found.")
+        with self.unit_of_work():
+            review = self.get_review(review_id)
+            if not review:
+                raise ValueError(f"Review with ID {review_id} not found.")
 
-        review.text = review_data.get("text", review.text)
-        review.rating = review_data.get("rating", review.rating)
-        review.updated_at = datetime.utcnow()
+            rating = review_data.get("rating", review.rating)
+            if not isinstance(rating, int) or not 1 <= rating <= 5:
+                raise ValueError("Rating must be an integer between 1 and 5")
+            if rating != review.rating:
+                self.place_repo.get(review.place_id).adjust_ratings(added=[rating], removed=[review.rating])
 
-        self.save_review(review)
+            review.text = review_data.get("text", review.text)
+            review.rating = rating
+            review.updated_at = datetime.utcnow()
+
+            self.save_review(review)
+            response_cache.invalidate("reviews", "places", f"place:{review.place_id}", f"review:{review_id}")
 
         return review.to_dict()
 
+    def delete_review(self, review_id):
+        """Delete a review and take its rating out of its place's aggregates"""
+        with self.unit_of_work():
+            review = self.get_review(review_id)
+            self.place_repo.get(review.place_id).adjust_ratings(removed=[review.rating])
+            self.review_repo.delete(review_id)
+            response_cache.invalidate("reviews", "places", f"place:{review.place_id}", f"review:{review_id}")
+
+    def repair_place_ratings(self):
+        """Recompute every place's review aggregates, returns the ids that drifted"""
+        with self.unit_of_work():
+            drifted = self.place_repo.refresh_ratings()
+            if drifted:
+                self.place_repo.invalidate(drifted)
+                response_cache.invalidate("places", *(f"place:{place_id}" for place_id in drifted))
+            return drifted
+
 #------------------------------------------------------------AMENITIES-----------------------------------------------------------------
 
     def create_amenity(self, amenity_data):
         """Create a new amenity and store it"""
         try:
-            print(f"Creating amenity with data: {amenity_data}")
             new_amenity = Amenity(
                 id=str(uuid.uuid4()),
                 name=amenity_data["name"],
@@ -245,11 +537,11 @@ class HBnBFacade:
                 updated_at=datetime.utcnow()
             )
             self.amenity_repo.add(new_amenity)
-            stored_amenity = self.amenity_repo.get(new_amenity.id)
-            print(f"Amenity created successfully: {stored_amenity}")
-            return stored_amenity
+            response_cache.invalidate("amenities")
+            log.info("Amenity created", extra={"amenity_id": new_amenity.id})
+            return new_amenity
         except Exception as e:
-            print(f"Error creating amenity: {str(e)}")
+            log.warning("Amenity rejected", extra={"reason": str(e)})
             raise
 
 
@@ -258,9 +550,9 @@ class HBnBFacade:
         return self.amenity_repo.get_by_attribute("name", name)
 
 
-    def get_amenity(self, amenity_id):
-        """Retrieve an amenity by its ID"""
-        return self.amenity_repo.get(amenity_id)
+    def get_amenity(self, amenity_id, as_of=None):
+        """Retrieve an amenity by its ID, as of the updated_at its validator was read from if given"""
+        return self.amenity_repo.get(amenity_id, as_of=as_of)
 
 
     def get_all_amenities(self):
@@ -268,16 +560,213 @@ class HBnBFacade:
         return self.amenity_repo.get_all()
 
 
-    def update_amenity(self, amenity_id, amenity_data):
-        """Update the name of an amenity if it exists"""
-        amenity = self.amenity_repo.get(amenity_id)
-        if not amenity:
-            raise ValueError(f"Amenity with ID {amenity_id} not found")
+    def get_amenity_version(self, amenity_id):
+        """Return the Version of an amenity, None if it does not exist"""
+        return self.amenity_repo.get_version(amenity_id)
+
+    def get_amenities_version(self):
+        """Return the Version of amenity listings"""
+        return collection_version(["amenities"])
 
-        print(f"Updating amenity {amenity_id} with data: {amenity_data}")
-        amenity.name = amenity_data["name"]
-        amenity.updated_at = datetime.utcnow()
-        self.amenity_repo.update(amenity_id, {"name": amenity.name, "updated_at": amenity.updated_at})
+    def get_amenities_page(self, limit, after=None, with_total=False):
+        """Retrieve one page of amenities ordered by creation date"""
+        return self.amenity_repo.get_page(limit, after, with_total=with_total)
 
-        updated_amenity = self.amenity_repo.get(amenity_id)
-        return updated_amenity
\ No newline at end of file
+
+    def update_amenity(self, amenity_id, amenity_data):
+        """Update the name of an amenity if it exists"""
+        with self.unit_of_work():
+            amenity = self.amenity_repo.get(amenity_id)
+            if not amenity:
+                raise ValueError(f"Amenity with ID {amenity_id} not found")
+
+            amenity.name = amenity_data["name"]
+            amenity.updated_at = datetime.utcnow()
+            response_cache.invalidate("amenities", f"amenity:{amenity_id}")
+        log.info("Amenity updated", extra={"amenity_id": amenity_id})
+        return amenity
+
+#------------------------------------------------------------BULK-----------------------------------------------------------------
+
+    def _validate_rows(self, model, rows, required=()):
+        """Run the model validators over each row and return copies of the rows
+
+        The @validates functions are called directly rather than through a
+        model instance per row, which would cost an ORM object per row.
+        """
+        validated = []
+        for index, row in enumerate(rows):
+            try:
+                for field in required:
+                    if row.get(field) is None:
+                        raise ValueError(f"{field} is required")
+                row = model.validate_columns(row)
+            except (ValueError, TypeError) as e:
+                raise ValueError(f"Row {index}: {e}")
+            validated.append(row)
+        return validated
+
+    def _check_references(self, repo, rows, field, label):
+        """Ensure every row's `field` refers to an existing object, in batched lookups"""
+        wanted = {row[field] for row in rows if field in row}
+        found = {obj.id for obj in repo.get_many(wanted)}
+        for index, row in enumerate(rows):
+            if field in row and row[field] not in found:
+                raise ValueError(f"Row {index}: {label} with ID {row[field]} not found")
+
+    def _validate_ratings(self, rows):
+        """Ensure every row carrying a rating has an integer between 1 and 5"""
+        for index, row in enumerate(rows):
+            rating = row.get("rating", 1)
+            if not isinstance(rating, int) or not 1 <= rating <= 5:
+                raise ValueError(f"Row {index}: Rating must be an integer between 1 and 5")
+
+    def _check_emails(self, rows):
+        """Ensure no row takes an email registered by another user or by another row, in batched lookups
+
+        Rows without an id are new users, distinct from every other row.
+        """
+        emails = [row["email"] for row in rows if "email" in row]
+        owners = {user.email: user.id for user in self.user_repo.get_many_by_attribute("email", emails)}
+        for index, row in enumerate(rows):
+            if "email" not in row:
+                continue
+            if not isinstance(row["email"], str) or not User.validate_email(row["email"]):
+                raise ValueError(f"Row {index}: Invalid email format")
+            user = row.get("id") or ("new", index)
+            if owners.setdefault(row["email"], user) != user:
+                raise ValueError(f"Row {index}: Email already registered by another user")
+
+    def _hash_passwords(self, rows):
+        """Replace plain passwords in user rows by their bcrypt hash"""
+        for row in rows:
+            if row.get("password"):
+                user = User()
+                user.hash_password(row["password"], block=True)
+                row["password"] = user.password
+
+    def bulk_create_users(self, users_data):
+        """Create many users in a single transaction and return their IDs"""
+        rows = self._validate_rows(User, users_data, ["first_name", "last_name", "email", "password"])
+        self._check_emails(rows)
+        self._hash_passwords(rows)
+        return self.user_repo.add_many(rows)
+
+    def bulk_update_users(self, updates):
+        """Update many users by ID in a single transaction"""
+        rows = self._validate_rows(User, updates, ["id"])
+        self._check_emails(rows)
+        self._hash_passwords(rows)
+        result = self.user_repo.update_many(rows)
+        response_cache.invalidate("users", *(f"user:{row['id']}" for row in rows))
+        return result
+
+    def bulk_delete_users(self, user_ids):
+        """Delete many users, with their places and reviews, in a single transaction"""
+        result = self.user_repo.delete_many(user_ids)
+        response_cache.invalidate()
+        return result
+
+    def bulk_create_places(self, places_data):
+        """Create many places and their amenity links in a single transaction"""
+        amenity_ids = [row.get("amenities") or [] for row in places_data]
+        rows = self._validate_rows(
+            Place,
+            [{k: v for k, v in row.items() if k != "amenities"} for row in places_data],
+            ["title", "price", "latitude", "longitude", "owner_id"]
+        )
+        self._check_references(self.user_repo, rows, "owner_id", "Owner")
+
+        known_amenities = {a.id for a in self.amenity_repo.get_many(
+            {amenity_id for ids in amenity_ids for amenity_id in ids})}
+        links = []
+        for index, (row, ids) in enumerate(zip(rows, amenity_ids)):
+            row.setdefault("id", str(uuid.uuid4()))
+            for amenity_id in ids:
+                if amenity_id not in known_amenities:
+                    raise ValueError(f"Row {index}: Amenity with ID {amenity_id} not found")
+                links.append((row["id"], amenity_id))
+        place_ids = self.place_repo.add_many(rows, amenity_links=links)
+        response_cache.invalidate("places")
+        return place_ids
+
+    def bulk_update_places(self, updates):
+        """Update many places by ID in a single transaction"""
+        rows = self._validate_rows(Place, updates, ["id"])
+        self._check_references(self.user_repo, rows, "owner_id", "Owner")
+        result = self.place_repo.update_many(rows)
+        response_cache.invalidate("places", *(f"place:{row['id']}" for row in rows))
+        return result
+
+    def bulk_delete_places(self, place_ids):
+        """Delete many places, with their reviews, in a single transaction"""
+        result = self.place_repo.delete_many(place_ids)
+        response_cache.invalidate()
+        return result
+
+    def bulk_create_reviews(self, reviews_data):
+        """Create many reviews in a single transaction and return their IDs"""
+        rows = self._validate_rows(Review, reviews_data, ["text", "rating", "user_id", "place_id"])
+        self._validate_ratings(rows)
+        self._check_references(self.user_repo, rows, "user_id", "User")
+        self._check_references(self.place_repo, rows, "place_id", "Place")
+        review_ids = self.review_repo.add_many(rows)
+        response_cache.invalidate("reviews", "places", *{f"place:{row['place_id']}" for row in rows})
+        return review_ids
+
+    def bulk_update_reviews(self, updates):
+        """Update the text and rating of many reviews in a single transaction"""
+        rows = self._validate_rows(Review, updates, ["id"])
+        self._validate_ratings(rows)
+        place_ids = self.review_repo.place_ids_of([row["id"] for row in rows])
+        result = self.review_repo.update_many(rows)
+        self._invalidate_reviews([row["id"] for row in rows], place_ids)
+        return result
+
+    def bulk_delete_reviews(self, review_ids):
+        """Delete many reviews in a single transaction"""
+        place_ids = self.review_repo.place_ids_of(review_ids)
+        result = self.review_repo.delete_many(review_ids)
+        self._invalidate_reviews(review_ids, place_ids)
+        return result
+
+    def _invalidate_reviews(self, review_ids, place_ids):
+        """Drop the cached responses showing the given reviews or their places"""
+        response_cache.invalidate("reviews", "places", *(f"review:{review_id}" for review_id in review_ids),
+                                  *(f"place:{place_id}" for place_id in place_ids))
+
+    def bulk_create_amenities(self, amenities_data):
+        """Create many amenities in a single transaction and return their IDs"""
+        rows = self._validate_rows(Amenity, amenities_data, ["name"])
+        amenity_ids = self.amenity_repo.add_many(rows)
+        response_cache.invalidate("amenities")
+        return amenity_ids
+
+    def bulk_update_amenities(self, updates):
+        """Rename many amenities in a single transaction"""
+        rows = self._validate_rows(Amenity, updates, ["id", "name"])
+        result = self.amenity_repo.update_many(rows)
+        response_cache.invalidate("amenities", *(f"amenity:{row['id']}" for row in rows))
+        return result
+
+    def bulk_delete_amenities(self, amenity_ids):
+        """Delete many amenities and their place links in a single transaction"""
+        result = self.amenity_repo.delete_many(amenity_ids)
+        response_cache.invalidate("amenities", *(f"amenity:{amenity_id}" for amenity_id in amenity_ids))
+        return result
+
+#------------------------------------------------------------IMPORT-----------------------------------------------------------------
+
+    def import_records(self, kind, records, batch_size=1000, dry_run=False, error_limit=1000):
+        """Import parsed records of amenities, places or reviews in batches and return the ImportReport"""
+        return importing.import_records(self, kind, records, batch_size, dry_run, error_limit)
+
+#------------------------------------------------------------EXPORT-----------------------------------------------------------------
+
+    def export_dataset(self, tables=None, batch_size=1000, compress=False):
+        """Return an iterator of the NDJSON export of `tables`, all by default, as bytes
+
+        Every table is read from one snapshot; `compress` gzips the stream.
+        Unknown tables raise ValueError before anything is read.
+        """
+        return export.encode_chunks(export.export_chunks(db.engine, tables, batch_size), compress)
@@ -0,0 +1,322 @@
+import csv
+import io
+import json
+import logging
+import uuid
+from collections import namedtuple
+from sqlalchemy.exc import IntegrityError
+from app.models.place import Place
+from app.models.review import Review
+from app.persistence.repository import chunked
+from app.services import response_cache
+""" Bulk import of amenities, places and reviews from CSV or NDJSON
+
+Records are parsed as the input streams in and handled a batch at a time:
+the batch is validated with the model validators, the users, places and
+amenities it refers to are resolved with one lookup per kind, and its valid
+rows are inserted in one transaction. A rejected record is reported with its
+line number and never stops the import.
+"""
+
+log = logging.getLogger(__name__)
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# CSV cells are text: these columns are converted and lists are split on "|"
+CSV_TYPES = {"price": float, "latitude": float, "longitude": float, "rating": int}
+CSV_LIST_SEPARATOR = "|"
+
+FIELDS = {
+    "amenities": {"name"},
+    "places": {"title", "description", "price", "latitude", "longitude", "owner_id", "owner_email", "amenities"},
+    "reviews": {"text", "rating", "place_id", "user_id", "user_email"},
+}
+
+# A parsed input record, or the reason it could not be parsed
+Record = namedtuple("Record", ["line", "data", "error"])
+
+
+class ImportReport:
+    """Counts of an import and the errors of its rejected records, by line"""
+
+    def __init__(self, kind, dry_run=False, error_limit=1000):
+        self.kind = kind
+        self.dry_run = dry_run
+        self.error_limit = error_limit
+        self.rows = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def reject(self, line, message):
+        self.failed += 1
+        if len(self.errors) < self.error_limit:
+            self.errors.append({"line": line, "error": message})
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "dry_run": self.dry_run,
+            "rows": self.rows,
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def format_of(content_type):
+    """Return the import format of a Content-Type, None when it is neither CSV nor NDJSON"""
+    mimetype = (content_type or "").split(";")[0].strip().lower()
+    for name, known in FORMATS.items():
+        if mimetype == known:
+            return name
+    return "ndjson" if mimetype in ("application/jsonl", "application/json-lines") else None
+
+
+def read_records(stream, fmt):
+    """Return an iterator of the Records in a binary `stream` of CSV or NDJSON"""
+    if fmt not in FORMATS:
+        raise ValueError("Format must be csv or ndjson")
+    if not isinstance(stream, io.BufferedIOBase):
+        stream = io.BufferedReader(stream)
+    if fmt == "csv":
+        return _read_csv(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    return _read_ndjson(stream)
+
+
+def _read_csv(text):
+    reader = csv.DictReader(text)
+    line = 1
+    try:
+        for cells in reader:
+            line = reader.line_num
+            if None in cells:
+                yield Record(line, None, "Row has more cells than the header")
+                continue
+            try:
+                yield Record(line, _from_csv(cells), None)
+            except ValueError as e:
+                yield Record(line, None, str(e))
+    except (csv.Error, UnicodeDecodeError) as e:
+        yield Record(line + 1, None, f"Unreadable CSV, the rest of the input was skipped: {e}")
+
+
+def _from_csv(cells):
+    """Convert the non-empty cells of a CSV row to the types NDJSON would carry"""
+    data = {}
+    for name, value in cells.items():
+        if value is None or value == "":
+            continue
+        if name in CSV_TYPES:
+            try:
+                value = CSV_TYPES[name](value)
+            except ValueError:
+                raise ValueError(f"{name} must be a number")
+        elif name == "amenities":
+            value = [part.strip() for part in value.split(CSV_LIST_SEPARATOR) if part.strip()]
+        data[name] = value
+    return data
+
+
+def _read_ndjson(stream):
+    for line, raw in enumerate(stream, 1):
+        if not raw.strip():
+            continue
+        try:
+            data = json.loads(raw)
+        except ValueError as e:
+            yield Record(line, None, f"Invalid JSON: {e}")
+            continue
+        if not isinstance(data, dict):
+            yield Record(line, None, "Each line must hold a JSON object")
+            continue
+        yield Record(line, data, None)
+
+
+def import_records(facade, kind, records, batch_size=1000, dry_run=False, error_limit=1000):
+    """Validate and insert `records` of `kind` a batch at a time and return the ImportReport
+
+    With `dry_run` nothing is written; duplicates are then only detected
+    within a batch and against existing rows.
+    """
+    if kind not in FIELDS:
+        raise ValueError(f"Cannot import {kind}, only {', '.join(sorted(FIELDS))}")
+    validate, insert = _HANDLERS[kind]
+    report = ImportReport(kind, dry_run, error_limit)
+    for batch in chunked(records, batch_size):
+        report.rows += len(batch)
+        reported = len(report.errors)
+        rows = []
+        for record in batch:
+            if record.error:
+                report.reject(record.line, record.error)
+                continue
+            unknown = set(record.data) - FIELDS[kind]
+            if unknown:
+                report.reject(record.line, f"Unknown field(s): {', '.join(sorted(unknown))}")
+                continue
+            rows.append((record.line, record.data))
+        rows = validate(facade, rows, report)
+        if dry_run:
+            report.imported += len(rows)
+        elif rows:
+            _insert(facade, insert, rows, report)
+        report.errors[reported:] = sorted(report.errors[reported:], key=lambda error: error["line"])
+    log.info("Import finished", extra={"kind": kind, "rows": report.rows, "imported": report.imported,
+                                       "failed": report.failed, "dry_run": dry_run})
+    return report
+
+
+def _insert(facade, insert, rows, report):
+    """Insert a batch in one transaction, or row by row to single out the rows that conflict"""
+    try:
+        insert(facade, [row for _, row in rows])
+        report.imported += len(rows)
+        return
+    except IntegrityError:
+        pass
+    for line, row in rows:
+        try:
+            insert(facade, [row])
+            report.imported += 1
+        except IntegrityError:
+            report.reject(line, "Conflicts with an existing record")
+
+
+def _require(data, fields):
+    for field in fields:
+        if data.get(field) is None:
+            raise ValueError(f"{field} is required")
+
+
+def _strings(rows, field):
+    return {data[field] for _, data in rows if isinstance(data.get(field), str)}
+
+
+def _user_lookup(facade, rows, prefix):
+    """Look up the users the rows refer to by `<prefix>_id` or `<prefix>_email`"""
+    by_id = {user.id for user in facade.user_repo.get_many(_strings(rows, f"{prefix}_id"))}
+    by_email = {user.email: user.id
+                for user in facade.user_repo.get_many_by_attribute("email", _strings(rows, f"{prefix}_email"))}
+    return by_id, by_email
+
+
+def _resolve_user(data, prefix, label, lookup):
+    by_id, by_email = lookup
+    if data.get(f"{prefix}_id") is not None:
+        if data[f"{prefix}_id"] not in by_id:
+            raise ValueError(f"{label} with ID {data[f'{prefix}_id']} not found")
+        return data[f"{prefix}_id"]
+    if data.get(f"{prefix}_email") is not None:
+        if data[f"{prefix}_email"] not in by_email:
+            raise ValueError(f"{label} with email {data[f'{prefix}_email']} not found")
+        return by_email[data[f"{prefix}_email"]]
+    raise ValueError(f"{prefix}_id or {prefix}_email is required")
+
+
+def _validate_amenities(facade, rows, report):
+    existing = {amenity.name for amenity in facade.amenity_repo.get_many_by_attribute("name", _strings(rows, "name"))}
+    valid = []
+    for line, data in rows:
+        name = data.get("name")
+        if not isinstance(name, str) or not name.strip():
+            report.reject(line, "name is required")
+        elif name in existing:
+            report.reject(line, f"Amenity {name} already exists")
+        else:
+            existing.add(name)
+            valid.append((line, {"name": name}))
+    return valid
+
+
+def _insert_amenities(facade, rows):
+    facade.amenity_repo.add_many([dict(row) for row in rows])
+    response_cache.invalidate("amenities")
+
+
+def _validate_places(facade, rows, report):
+    owners = _user_lookup(facade, rows, "owner")
+    tokens = {token for _, data in rows if isinstance(data.get("amenities"), list)
+              for token in data["amenities"] if isinstance(token, str)}
+    amenities = {amenity.id: amenity.id for amenity in facade.amenity_repo.get_many(tokens)}
+    amenities.update((amenity.name, amenity.id)
+                     for amenity in facade.amenity_repo.get_many_by_attribute("name", tokens - set(amenities)))
+    valid = []
+    for line, data in rows:
+        try:
+            row = {field: data.get(field) for field in ("title", "description", "price", "latitude", "longitude")}
+            _require(row, ("title", "price", "latitude", "longitude"))
+            row["owner_id"] = _resolve_user(data, "owner", "Owner", owners)
+            row = Place.validate_columns(row)
+            listed = data.get("amenities") or []
+            if not isinstance(listed, list):
+                raise ValueError("amenities must be a list of amenity IDs or names")
+            amenity_ids = []
+            for token in listed:
+                if not isinstance(token, str) or token not in amenities:
+                    raise ValueError(f"Amenity {token} not found")
+                amenity_ids.append(amenities[token])
+        except (ValueError, TypeError) as e:
+            report.reject(line, str(e))
+            continue
+        row["id"] = str(uuid.uuid4())
+        row["amenities"] = list(dict.fromkeys(amenity_ids))
+        valid.append((line, row))
+    return valid
+
+
+def _insert_places(facade, rows):
+    links = [(row["id"], amenity_id) for row in rows for amenity_id in row["amenities"]]
+    facade.place_repo.add_many([{k: v for k, v in row.items() if k != "amenities"} for row in rows],
+                               amenity_links=links)
+    response_cache.invalidate("places")
+
+
+def _validate_reviews(facade, rows, report):
+    users = _user_lookup(facade, rows, "user")
+    owners = {place.id: place.owner_id for place in facade.place_repo.get_many(_strings(rows, "place_id"))}
+    candidates = []
+    seen = set()
+    for line, data in rows:
+        try:
+            row = {field: data.get(field) for field in ("text", "rating", "place_id")}
+            _require(row, ("text", "rating", "place_id"))
+            row["user_id"] = _resolve_user(data, "user", "User", users)
+            row = Review.validate_columns(row)
+            # bool is an int subclass, but true is not a rating
+            if isinstance(row["rating"], bool) or not isinstance(row["rating"], int) or not 1 <= row["rating"] <= 5:
+                raise ValueError("Rating must be an integer between 1 and 5")
+            if row["place_id"] not in owners:
+                raise ValueError(f"Place with ID {row['place_id']} not found")
+            if owners[row["place_id"]] == row["user_id"]:
+                raise ValueError("You cannot review your own place")
+            pair = (row["user_id"], row["place_id"])
+            if pair in seen:
+                raise ValueError("Duplicate review of this place by this user")
+        except (ValueError, TypeError) as e:
+            report.reject(line, str(e))
+            continue
+        seen.add(pair)
+        candidates.append((line, row))
+
+    existing = facade.review_repo.existing_pairs([(row["user_id"], row["place_id"]) for _, row in candidates])
+    valid = []
+    for line, row in candidates:
+        if (row["user_id"], row["place_id"]) in existing:
+            report.reject(line, "You have already reviewed this place")
+        else:
+            valid.append((line, row))
+    return valid
+
+
+def _insert_reviews(facade, rows):
+    facade.review_repo.add_many([dict(row) for row in rows])
+    response_cache.invalidate("reviews", "places", *{f"place:{row['place_id']}" for row in rows})
+
+
+_HANDLERS = {
+    "amenities": (_validate_amenities, _insert_amenities),
+    "places": (_validate_places, _insert_places),
+    "reviews": (_validate_reviews, _insert_reviews),
+}
@@ -0,0 +1,107 @@
+from collections import namedtuple
+from sqlalchemy import event
+from app.extensions import db
+from app.persistence.cache import LRUCache
+""" Shared cache of rendered public GET responses, invalidated by tags
+
+Each entry carries the tags of the data it was rendered from, e.g.
+"places" for anything listing places or "place:<id>" for anything showing
+that place. Facade writes name the tags they affect and every entry
+carrying one of them is dropped, once when the write is made and again
+when its transaction commits. Entries are also keyed on the version of the
+data they show, so writes that name no tags, such as bulk loads or writes
+committed by another process, are never served stale either.
+"""
+
+_PENDING_KEY = "response_cache_pending"
+
+# A rendered response; `headers` is a tuple of (name, value) pairs
+CachedResponse = namedtuple("CachedResponse", ["body", "status", "headers", "tags"])
+
+# Stands for every tag, for writes whose effects are too wide to list
+ALL = None
+
+
+class ResponseCache(LRUCache):
+    """LRU cache of responses that can also be invalidated by tag"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.enabled = True
+        self._keys_by_tag = {}
+
+    def invalidate_tags(self, tags):
+        """Drop every entry carrying one of `tags`"""
+        with self._lock:
+            self.generation += 1
+            for tag in tags:
+                for key in self._keys_by_tag.pop(tag, ()):
+                    if key in self._entries:
+                        self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._keys_by_tag.clear()
+
+    def _added(self, key, value):
+        for tag in value.tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+
+    def _remove(self, key):
+        value = super()._remove(key)
+        for tag in value.tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+        return value
+
+
+cache = ResponseCache(max_entries=5000, max_bytes=64 * 1024 * 1024, ttl=60)
+_route_ttls = {}
+
+
+def route_ttl(route):
+    """Return the lifetime in seconds of responses cached for `route`"""
+    return _route_ttls.get(route, cache.ttl)
+
+
+def invalidate(*tags):
+    """Drop the responses carrying any of `tags`, or every response without tags
+
+    Inside a transaction the tags are dropped again once it ends, so a
+    response rendered from the data it replaces cannot outlive the commit.
+    """
+    _invalidate(tags or ALL)
+    if db.session().in_transaction():
+        pending = db.session.info.setdefault(_PENDING_KEY, [])
+        pending.append(tags or ALL)
+
+
+def _invalidate(tags):
+    if tags is ALL:
+        cache.clear()
+    else:
+        cache.invalidate_tags(tags)
+
+
+def init_response_cache(app):
+    """Apply the RESPONSE_CACHE_* settings of `app` and start from an empty cache"""
+    cache.enabled = app.config.get("RESPONSE_CACHE_ENABLED", True)
+    cache.max_entries = app.config.get("RESPONSE_CACHE_MAX_ENTRIES", cache.max_entries)
+    cache.max_bytes = app.config.get("RESPONSE_CACHE_MAX_BYTES", cache.max_bytes)
+    cache.ttl = app.config.get("RESPONSE_CACHE_TTL", cache.ttl)
+    _route_ttls.clear()
+    _route_ttls.update(app.config.get("RESPONSE_CACHE_TTLS", {}))
+    cache.clear()
+
+
+@event.listens_for(db.session, "after_commit")
+@event.listens_for(db.session, "after_rollback")
+def _after_transaction(session):
+    for tags in session.info.pop(_PENDING_KEY, []):
+        _invalidate(tags)
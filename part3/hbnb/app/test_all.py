@@ -90,4 +90,2154 @@ class TestAPIEndpoints(unittest.TestCase):
             "comment": "Amazing place!"
         })
         self.assertEqual(response.status_code, 201)
-        self.assertIn('id', response.json)
\ No newline at end of file
+        self.assertIn('id', response.json)
+
+class TestPlaceListingQueries(unittest.TestCase):
+    """ Test that listing places runs a fixed number of queries """
+
+    def setUp(self):
+        """ Set up an in-memory application """
+        from config import TestingConfig
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+
+    def seed_places(self, count):
+        """ Store `count` places, each with an owner, a review and an amenity """
+        from app.extensions import db
+        from app.models.user import User
+        from app.models.place import Place
+        from app.models.review import Review
+        from app.models.amenity import Amenity
+
+        with self.app.app_context():
+            offset = Place.query.count()
+            for i in range(offset, offset + count):
+                owner = User(first_name="Owner", last_name=str(i),
+                             email=f"owner{i}@example.com", password="x")
+                guest = User(first_name="Guest", last_name=str(i),
+                             email=f"guest{i}@example.com", password="x")
+                amenity = Amenity(name=f"Amenity {i}")
+                place = Place(title=f"Place {i}", description="", price=10.0,
+                              latitude=1.0, longitude=1.0, owner=owner)
+                place.amenities.append(amenity)
+                db.session.add_all([owner, guest, amenity, place])
+                db.session.flush()
+                db.session.add(Review(text="Nice", rating=5,
+                                      place_id=place.id, user_id=guest.id))
+            db.session.commit()
+
+    def count_listing_queries(self):
+        """ Return the number of statements issued by GET /api/v1/places/ """
+        from sqlalchemy import event
+        from app.extensions import db
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            response = self.client.get('/api/v1/places/')
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        self.assertEqual(response.status_code, 200)
+        return len(response.json), len(statements)
+
+    def test_listing_query_count_does_not_grow_with_places(self):
+        """Test that the number of queries is independent of the listing size"""
+        self.seed_places(2)
+        small_count, small_queries = self.count_listing_queries()
+        self.seed_places(20)
+        large_count, large_queries = self.count_listing_queries()
+
+        self.assertEqual(small_count, 2)
+        self.assertEqual(large_count, 22)
+        self.assertEqual(small_queries, large_queries)
+        # One statement reads the validators, the rest build the listing
+        self.assertLessEqual(large_queries, 4)
+
+    def test_loading_strategies_return_same_listing(self):
+        """Test that every loading strategy serializes the same places"""
+        from app.services import facade
+
+        self.seed_places(3)
+        with self.app.app_context():
+            listings = [
+                sorted(facade.get_all_places(strategy=strategy), key=lambda p: p["id"])
+                for strategy in ("select", "joined", "selectin")
+            ]
+        self.assertEqual(listings[0], listings[1])
+        self.assertEqual(listings[0], listings[2])
+        self.assertEqual(len(listings[0][0]["amenities"]), 1)
+        self.assertEqual(len(listings[0][0]["reviews"]), 1)
+
+
+class TestPagination(unittest.TestCase):
+    """ Test keyset pagination on the collection endpoints """
+
+    def setUp(self):
+        """ Set up an in-memory application with amenities sharing timestamps """
+        from datetime import datetime
+        from config import TestingConfig
+        from app.extensions import db
+        from app.models.amenity import Amenity
+
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        created_at = datetime(2024, 1, 1)
+        with self.app.app_context():
+            for i in range(7):
+                db.session.add(Amenity(name=f"Amenity {i}", created_at=created_at))
+            db.session.commit()
+
+    def test_pages_cover_collection_once(self):
+        """Test that following the cursors returns every row exactly once"""
+        names = []
+        response = self.client.get('/api/v1/amenities/?limit=3&count=1')
+        self.assertEqual(response.headers['X-Total-Count'], '7')
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.json), 3)
+            names.extend(amenity['name'] for amenity in response.json)
+            cursor = response.headers.get('X-Next-Cursor')
+            if not cursor:
+                break
+            self.assertIn('rel="next"', response.headers['Link'])
+            response = self.client.get(f'/api/v1/amenities/?limit=3&after={cursor}')
+
+        self.assertEqual(sorted(names), [f"Amenity {i}" for i in range(7)])
+
+    def test_last_page_has_no_cursor(self):
+        """Test that a page holding the remaining rows has no next cursor"""
+        response = self.client.get('/api/v1/amenities/?limit=7')
+        self.assertEqual(len(response.json), 7)
+        self.assertNotIn('X-Next-Cursor', response.headers)
+        self.assertNotIn('X-Total-Count', response.headers)
+
+    def test_invalid_pagination_parameters(self):
+        """Test that malformed limits and cursors are rejected"""
+        self.assertEqual(self.client.get('/api/v1/amenities/?limit=abc').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/amenities/?limit=0').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/places/?after=not-a-cursor').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/users/?after=not-a-cursor').status_code, 400)
+
+
+class TestBulkOperations(unittest.TestCase):
+    """ Test the facade bulk write operations """
+
+    def setUp(self):
+        """ Set up an in-memory application with one owner and one amenity """
+        from config import TestingConfig
+        from app.services import facade
+
+        self.app = create_app(TestingConfig)
+        self.facade = facade
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.owner_id, self.guest_id = facade.bulk_create_users([
+            {"first_name": "Owner", "last_name": "One", "email": "owner@example.com", "password": "x"},
+            {"first_name": "Guest", "last_name": "Two", "email": "guest@example.com", "password": "y"},
+        ])
+        self.amenity_id, = facade.bulk_create_amenities([{"name": "Wi-Fi"}])
+
+    def tearDown(self):
+        """ Pop the application context """
+        self.ctx.pop()
+
+    def place_rows(self, count):
+        """ Build `count` valid place rows """
+        return [{"title": f"Place {i}", "price": float(i), "latitude": 1.0, "longitude": 2.0,
+                 "owner_id": self.owner_id, "amenities": [self.amenity_id]}
+                for i in range(count)]
+
+    def test_bulk_create_commits_once(self):
+        """Test that a multi-chunk import is committed in one transaction"""
+        from sqlalchemy import event
+        from app.extensions import db
+        from app.models.place import Place
+
+        commits = []
+
+        def after_commit(session):
+            commits.append(session)
+
+        event.listen(db.session, "after_commit", after_commit)
+        try:
+            place_ids = self.facade.bulk_create_places(self.place_rows(1200))
+        finally:
+            event.remove(db.session, "after_commit", after_commit)
+
+        self.assertEqual(len(commits), 1)
+        self.assertEqual(len(place_ids), 1200)
+        self.assertEqual(Place.query.count(), 1200)
+        self.assertEqual(len(self.facade.get_place(place_ids[0])["amenities"]), 1)
+        self.assertTrue(self.facade.get_user_by_email("owner@example.com").verify_password("x"))
+
+    def test_invalid_row_aborts_batch(self):
+        """Test that one invalid row rejects the whole batch"""
+        from app.models.place import Place
+
+        rows = self.place_rows(3)
+        rows[2]["price"] = -1
+        with self.assertRaises(ValueError):
+            self.facade.bulk_create_places(rows)
+        rows[2]["price"] = 1.0
+        rows[1]["owner_id"] = "missing"
+        with self.assertRaises(ValueError):
+            self.facade.bulk_create_places(rows)
+        self.assertEqual(Place.query.count(), 0)
+
+    def test_bulk_validation_runs_model_validators(self):
+        """Test that rows are checked by the model validators without building instances"""
+        from unittest import mock
+        from app.models.user import User
+
+        with mock.patch.object(User, "__init__", side_effect=AssertionError("instance built")):
+            self.facade.bulk_update_users([{"id": self.guest_id, "first_name": "Guest"}])
+        with self.assertRaisesRegex(ValueError, "Row 0: first_name cannot be empty"):
+            self.facade.bulk_update_users([{"id": self.guest_id, "first_name": " "}])
+        with self.assertRaisesRegex(ValueError, "Row 0: .*nickname"):
+            self.facade.bulk_update_users([{"id": self.guest_id, "nickname": "G"}])
+
+    def test_bulk_update_users_checks_emails(self):
+        """Test that bulk user updates refuse emails taken by another user"""
+        with self.assertRaisesRegex(ValueError, "Row 1: Email already registered"):
+            self.facade.bulk_update_users([{"id": self.owner_id, "first_name": "Owner"},
+                                           {"id": self.guest_id, "email": "owner@example.com"}])
+        with self.assertRaisesRegex(ValueError, "Row 1: Email already registered"):
+            self.facade.bulk_update_users([{"id": self.owner_id, "email": "new@example.com"},
+                                           {"id": self.guest_id, "email": "new@example.com"}])
+        with self.assertRaisesRegex(ValueError, "Row 0: Invalid email format"):
+            self.facade.bulk_update_users([{"id": self.guest_id, "email": "guest"}])
+        self.facade.bulk_update_users([{"id": self.guest_id, "email": "guest@example.com"},
+                                       {"id": self.owner_id, "email": "host@example.com"}])
+        self.assertEqual(self.facade.get_user(self.owner_id).email, "host@example.com")
+
+    def test_bulk_create_users_checks_emails(self):
+        """Test that bulk user creation refuses registered and repeated emails"""
+        from app.models.user import User
+
+        new = lambda email: {"first_name": "New", "last_name": "User", "email": email, "password": "x"}
+        with self.assertRaisesRegex(ValueError, "Row 1: Email already registered"):
+            self.facade.bulk_create_users([new("a@example.com"), new("guest@example.com")])
+        with self.assertRaisesRegex(ValueError, "Row 1: Email already registered"):
+            self.facade.bulk_create_users([new("a@example.com"), new("a@example.com")])
+        self.assertEqual(User.query.count(), 2)
+
+    def test_update_place_only_sets_editable_fields(self):
+        """Test that a place update refuses the review aggregates and resolves amenity IDs"""
+        place_id, = self.facade.bulk_create_places(self.place_rows(1))
+        for data in ({"review_count": 100}, {"rating_sum": 5, "title": "Hacked"}, {"rating_5": 3},
+                     {"owner_id": self.guest_id}):
+            with self.assertRaisesRegex(ValueError, "Cannot update"):
+                self.facade.update_place(place_id, data)
+        with self.assertRaisesRegex(ValueError, "Amenity with ID missing not found"):
+            self.facade.update_place(place_id, {"amenities": ["missing"]})
+
+        self.facade.update_place(place_id, {"title": "Renamed", "owner_id": self.owner_id, "amenities": []})
+        place = self.facade.get_place(place_id)
+        self.assertEqual((place["title"], place["reviews_total"], place["amenities"]), ("Renamed", 0, []))
+        self.facade.update_place(place_id, {"owner_id": self.guest_id}, owner_editable=True)
+        self.assertEqual(self.facade.get_place(place_id)["owner_id"], self.guest_id)
+
+    def test_bulk_update_and_delete(self):
+        """Test bulk updates and cascading bulk deletes"""
+        from app.models.place import Place
+        from app.models.review import Review
+
+        place_ids = self.facade.bulk_create_places(self.place_rows(3))
+        self.facade.bulk_create_reviews([
+            {"text": "Great", "rating": 5, "user_id": self.guest_id, "place_id": place_id}
+            for place_id in place_ids
+        ])
+        self.facade.bulk_update_places([{"id": place_id, "price": 99.0} for place_id in place_ids])
+        self.assertEqual({p["price"] for p in self.facade.get_all_places()}, {99.0})
+
+        self.assertEqual(self.facade.bulk_delete_places(place_ids[:1]), 1)
+        self.assertEqual(Review.query.count(), 2)
+        self.facade.bulk_delete_users([self.owner_id])
+        self.assertEqual(Place.query.count(), 0)
+        self.assertEqual(Review.query.count(), 0)
+
+
+class TestUnitOfWork(unittest.TestCase):
+    """ Test that facade writes commit once and do not re-read their rows """
+
+    def setUp(self):
+        """ Set up an in-memory application with a user, a place and an amenity """
+        from sqlalchemy import event
+        from config import TestingConfig
+        from app.extensions import db
+        from app.services import facade
+
+        self.app = create_app(TestingConfig)
+        self.facade = facade
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.user_id, = facade.bulk_create_users([
+            {"first_name": "Guest", "last_name": "One", "email": "guest@example.com", "password": "x"}
+        ])
+        self.place_id, = facade.bulk_create_places([
+            {"title": "Cabin", "price": 10.0, "latitude": 1.0, "longitude": 2.0, "owner_id": self.user_id}
+        ])
+        self.amenity_id, = facade.bulk_create_amenities([{"name": "Wi-Fi"}])
+        db.session.remove()
+
+        self.statements = []
+        self.commits = []
+        self.engine = db.engine
+        event.listen(self.engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(self.engine, "commit", self.on_commit)
+
+    def tearDown(self):
+        """ Remove the listeners and pop the application context """
+        from sqlalchemy import event
+        event.remove(self.engine, "before_cursor_execute", self.before_cursor_execute)
+        event.remove(self.engine, "commit", self.on_commit)
+        self.ctx.pop()
+
+    def before_cursor_execute(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def on_commit(self, conn):
+        self.commits.append(conn)
+
+    def test_create_review_commits_once_without_rereading(self):
+        """Test that creating a review is one INSERT and one commit"""
+        review = self.facade.create_review({
+            "user_id": self.user_id, "place_id": self.place_id, "rating": 4, "text": "Cozy"
+        })
+        self.assertEqual(review["rating"], 4)
+        self.assertEqual(len(self.commits), 1)
+        self.assertFalse([s for s in self.statements if s.startswith("SELECT") and "FROM reviews" in s])
+        self.assertEqual(len([s for s in self.statements if s.startswith("INSERT")]), 1)
+
+    def test_update_amenity_commits_once_without_rereading(self):
+        """Test that updating an amenity reads it once and commits once"""
+        amenity = self.facade.update_amenity(self.amenity_id, {"name": "Fast Wi-Fi"})
+        self.assertEqual(amenity.name, "Fast Wi-Fi")
+        self.assertEqual(len(self.commits), 1)
+        self.assertEqual(len([s for s in self.statements if s.startswith("SELECT")]), 1)
+
+    def test_failed_unit_of_work_rolls_back(self):
+        """Test that an error inside a unit of work discards every write"""
+        from app.models.amenity import Amenity
+
+        with self.assertRaises(ValueError):
+            with self.facade.unit_of_work():
+                self.facade.create_amenity({"name": "Pool"})
+                self.facade.update_amenity("missing", {"name": "Sauna"})
+        self.assertEqual(self.commits, [])
+        self.assertIsNone(Amenity.query.filter_by(name="Pool").first())
+
+
+class TestEntityCache(unittest.TestCase):
+    """ Test the read-through entity cache in front of the repositories """
+
+    def setUp(self):
+        """ Set up an in-memory application with an owner, a place and an amenity """
+        from sqlalchemy import event
+        from config import TestingConfig
+        from app.extensions import db
+        from app.services import facade
+
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        self.facade = facade
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.owner_id, = facade.bulk_create_users([
+            {"first_name": "Owner", "last_name": "One", "email": "owner@example.com", "password": "x"}
+        ])
+        self.place_id, = facade.bulk_create_places([
+            {"title": "Cabin", "price": 10.0, "latitude": 1.0, "longitude": 2.0, "owner_id": self.owner_id}
+        ])
+        self.amenity = facade.create_amenity({"name": "Wi-Fi"})
+        db.session.remove()
+
+        self.statements = []
+        self.engine = db.engine
+        event.listen(self.engine, "before_cursor_execute", self.before_cursor_execute)
+
+    def tearDown(self):
+        """ Remove the listener and pop the application context """
+        from sqlalchemy import event
+        event.remove(self.engine, "before_cursor_execute", self.before_cursor_execute)
+        self.ctx.pop()
+
+    def before_cursor_execute(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def selects_during(self, func, *args):
+        """ Return the result of `func` in a fresh session and the SELECTs it ran """
+        from app.extensions import db
+        db.session.remove()
+        self.statements.clear()
+        result = func(*args)
+        return result, [s for s in self.statements if s.startswith("SELECT")]
+
+    def test_amenity_lookups_hit_the_cache(self):
+        """Test that repeated amenity lookups by id and name run no SQL"""
+        self.selects_during(self.facade.get_amenity_by_name, "Wi-Fi")
+        amenity, selects = self.selects_during(self.facade.get_amenity, self.amenity.id)
+        self.assertEqual(amenity.name, "Wi-Fi")
+        self.assertEqual(selects, [])
+        amenity, selects = self.selects_during(self.facade.get_amenity_by_name, "Wi-Fi")
+        self.assertEqual(amenity.id, self.amenity.id)
+        self.assertEqual(selects, [])
+
+    def test_writes_invalidate_cached_entities(self):
+        """Test that an update is visible on the next cached read"""
+        self.selects_during(self.facade.get_amenity, self.amenity.id)
+        self.facade.update_amenity(self.amenity.id, {"name": "Fast Wi-Fi"})
+        amenity, selects = self.selects_during(self.facade.get_amenity, self.amenity.id)
+        self.assertEqual(amenity.name, "Fast Wi-Fi")
+        self.assertIsNone(self.facade.get_amenity_by_name("Wi-Fi"))
+
+        self.facade.bulk_update_places([{"id": self.place_id, "price": 20.0}])
+        place, selects = self.selects_during(self.facade.get_place, self.place_id)
+        self.assertEqual(place["price"], 20.0)
+
+    def test_loader_options_skip_cached_snapshots(self):
+        """Test that a get with a strategy keeps its eager loads on a warm cache"""
+        from sqlalchemy import inspect
+        from app.extensions import db
+
+        self.selects_during(self.facade.place_repo.get, self.place_id)
+        place, selects = self.selects_during(self.facade.place_repo.get, self.place_id)
+        self.assertEqual(selects, [])
+        place, selects = self.selects_during(lambda: self.facade.place_repo.get(self.place_id, strategy="selectin"))
+        self.assertFalse({"owner", "reviews", "amenities"} & inspect(place).unloaded)
+        self.assertEqual(place.owner.id, self.owner_id)
+
+        db.session.remove()
+        first = self.client.get(f'/api/v1/places/{self.place_id}').json
+        self.statements.clear()
+        # A different Accept header misses the response cache and renders again
+        second = self.client.get(f'/api/v1/places/{self.place_id}', headers={"Accept": "application/json"}).json
+        selects = [s for s in self.statements if s.startswith("SELECT")]
+        self.assertEqual(first, second)
+        # The owner comes joined to the place, never from a lazy load
+        self.assertEqual(len([s for s in selects if "FROM places" in s.split("WHERE")[0]]), 1)
+        self.assertFalse([s for s in selects if s.startswith("SELECT users.")])
+
+    def test_lru_cache_bounds_and_counters(self):
+        """Test entry, byte and TTL limits of the LRU cache"""
+        import time
+        from app.persistence.cache import LRUCache
+
+        cache = LRUCache(max_entries=2, max_bytes=10 ** 6, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.stats()["hits"], 2)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+        small = LRUCache(max_entries=100, max_bytes=200, ttl=60)
+        for i in range(10):
+            small.set(i, "x" * 20)
+        self.assertLessEqual(small.stats()["bytes"], 200)
+        self.assertGreater(small.stats()["evictions"], 0)
+
+        expiring = LRUCache(ttl=0)
+        expiring.set("a", 1)
+        time.sleep(0.01)
+        self.assertIsNone(expiring.get("a"))
+
+        stale = LRUCache()
+        generation = stale.generation
+        stale.invalidate("a")
+        stale.set("a", 1, generation)
+        self.assertIsNone(stale.get("a"))
+
+
+class TestEngineConfiguration(unittest.TestCase):
+    """ Test that the engine settings come from the config classes """
+
+    def setUp(self):
+        """ Set up an application on a temporary SQLite file """
+        import os
+        import tempfile
+        from config import Config
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmpdir.name, "hbnb.db")
+
+        class FileConfig(Config):
+            TESTING = True
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+            DB_POOL_SIZE = 3
+            SQLITE_BUSY_TIMEOUT = 1234
+
+        self.app = create_app(FileConfig)
+
+    def tearDown(self):
+        """ Dispose the engine and remove the temporary database """
+        from app.extensions import db
+        with self.app.app_context():
+            db.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def pragma(self, name):
+        from sqlalchemy import text
+        from app.extensions import db
+        with self.app.app_context():
+            with db.engine.connect() as connection:
+                return connection.execute(text(f"PRAGMA {name}")).scalar()
+
+    def test_pragmas_applied_on_connect(self):
+        """Test that every connection uses WAL and the configured pragmas"""
+        self.assertEqual(self.pragma("journal_mode"), "wal")
+        self.assertEqual(self.pragma("synchronous"), 1)
+        self.assertEqual(self.pragma("busy_timeout"), 1234)
+        self.assertEqual(self.pragma("cache_size"), -64000)
+
+    def test_pool_sized_from_config(self):
+        """Test that the connection pool uses the DB_POOL_* settings"""
+        from app.extensions import db
+        with self.app.app_context():
+            self.assertEqual(db.engine.pool.size(), 3)
+
+
+class TestIndexesAndMigrations(unittest.TestCase):
+    """ Test the secondary indexes and the schema migrations """
+
+    def query_plan(self, app, sql):
+        """ Return the EXPLAIN QUERY PLAN details of a statement """
+        from sqlalchemy import text
+        from app.extensions import db
+        with app.app_context():
+            rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+        return " ".join(row[-1] for row in rows)
+
+    def test_hot_queries_use_indexes(self):
+        """Test that the hot lookups are index searches, not table scans"""
+        from config import TestingConfig
+        app = create_app(TestingConfig)
+
+        expectations = {
+            "SELECT * FROM places WHERE owner_id = 'x'": "ix_places_owner_id",
+            "SELECT * FROM places WHERE price BETWEEN 10 AND 20": "ix_places_price",
+            "SELECT * FROM places WHERE latitude BETWEEN 1 AND 2 AND longitude = 3": "ix_places_latitude_longitude",
+            "SELECT * FROM reviews WHERE place_id = 'x'": "ix_reviews_place_id_created_at",
+            "SELECT * FROM reviews WHERE user_id = 'x'": "uq_reviews_user_place",
+            "SELECT * FROM reviews WHERE user_id = 'x' AND place_id = 'y'": "uq_reviews_user_place",
+        }
+        for sql, index in expectations.items():
+            plan = self.query_plan(app, sql)
+            self.assertIn(index, plan, sql)
+            self.assertNotIn("SCAN", plan.replace(f"USING INDEX {index}", ""), sql)
+
+    def test_upgrade_indexes_existing_database(self):
+        """Test that a database created before the indexes is migrated in place"""
+        import os
+        import sqlite3
+        import tempfile
+        from config import TestingConfig
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "hbnb.db")
+            legacy = sqlite3.connect(path)
+            legacy.executescript("""
+                CREATE TABLE reviews (text VARCHAR(1024) NOT NULL, rating INTEGER NOT NULL,
+                    place_id VARCHAR(60) NOT NULL, user_id VARCHAR(60) NOT NULL,
+                    id VARCHAR(36) NOT NULL, created_at DATETIME, updated_at DATETIME, PRIMARY KEY (id));
+                INSERT INTO reviews VALUES ('first', 5, 'p', 'u', 'a', '2024-01-01', '2024-01-01');
+                INSERT INTO reviews VALUES ('again', 4, 'p', 'u', 'b', '2024-02-01', '2024-02-01');
+            """)
+            legacy.commit()
+            legacy.close()
+
+            class LegacyConfig(TestingConfig):
+                SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+
+            app = create_app(LegacyConfig)
+            self.assertIn("ix_reviews_place_id_created_at",
+                          self.query_plan(app, "SELECT * FROM reviews WHERE place_id = 'p'"))
+
+            from sqlalchemy import text
+            from app.extensions import db
+            from app.persistence import migrations
+            with app.app_context():
+                # Startup never deletes the duplicates that block the unique index
+                texts = db.session.execute(text("SELECT text FROM reviews ORDER BY created_at")).scalars().all()
+                self.assertEqual(texts, ["first", "again"])
+                self.assertEqual(migrations.upgrade(db.engine), len(migrations.MIGRATIONS))
+                db.session.remove()
+
+                runner = app.test_cli_runner()
+                self.assertIn("1 duplicate review(s) block", runner.invoke(args=["db-upgrade"]).output)
+                result = runner.invoke(args=["db-upgrade", "--drop-duplicate-reviews"])
+                self.assertIn("Deleted 1 duplicate review(s)", result.output)
+                texts = db.session.execute(text("SELECT text FROM reviews")).scalars().all()
+                self.assertEqual(texts, ["first"])
+                db.session.remove()
+                db.engine.dispose()
+            self.assertIn("uq_reviews_user_place",
+                          self.query_plan(app, "SELECT * FROM reviews WHERE user_id = 'u' AND place_id = 'p'"))
+            with app.app_context():
+                db.engine.dispose()
+
+    def test_upgrade_replaces_version_3_full_text_index(self):
+        """Test that a database indexed by version 3 gets per-review documents from version 7"""
+        import os
+        import tempfile
+        from unittest import mock
+        from sqlalchemy import text
+        from config import TestingConfig
+        from app.extensions import db
+        from app.persistence import migrations
+        from app.services import facade
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            class FileConfig(TestingConfig):
+                SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmpdir, 'hbnb.db')}"
+
+            with mock.patch.object(migrations, "MIGRATIONS", migrations.MIGRATIONS[:6]):
+                app = create_app(FileConfig)
+            with app.app_context():
+                owner, guest, other = facade.bulk_create_users([
+                    {"first_name": "Ann", "last_name": "Lee", "email": "ann@example.com", "password": "x"},
+                    {"first_name": "Bob", "last_name": "Ray", "email": "bob@example.com", "password": "x"},
+                    {"first_name": "Cy", "last_name": "Hill", "email": "cy@example.com", "password": "x"},
+                ])
+                place_id, = facade.bulk_create_places([{"title": "Old barn", "price": 40.0, "latitude": 0.0,
+                                                        "longitude": 0.0, "owner_id": owner}])
+                facade.bulk_create_reviews([{"text": "Lovely garden", "rating": 5, "user_id": guest,
+                                             "place_id": place_id}])
+                columns = db.session.execute(text("SELECT * FROM places_fts")).keys()
+                self.assertIn("reviews", list(columns))
+                db.session.remove()
+                db.engine.dispose()
+
+            app = create_app(FileConfig)
+            with app.app_context():
+                self.assertEqual([p["title"] for p in facade.search_places("garden", 10).items], ["Old barn"])
+                facade.bulk_create_reviews([{"text": "Huge orchard", "rating": 4, "user_id": other,
+                                             "place_id": place_id}])
+                self.assertEqual(len(facade.search_places("orchard", 10).items), 1)
+                db.session.remove()
+                db.engine.dispose()
+
+
+class TestGeospatialSearch(unittest.TestCase):
+    """ Test bounding box and radius searches over places """
+
+    PLACES = {
+        "Paris": (48.8566, 2.3522),
+        "Versailles": (48.8049, 2.1204),
+        "London": (51.5074, -0.1278),
+        "Fiji East": (-17.7, 179.9),
+        "Fiji West": (-17.7, -179.9),
+    }
+
+    def setUp(self):
+        """ Set up an in-memory application with places around the world """
+        from config import TestingConfig
+        from app.services import facade
+
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        self.facade = facade
+        with self.app.app_context():
+            owner_id, = facade.bulk_create_users([
+                {"first_name": "Owner", "last_name": "One", "email": "owner@example.com", "password": "x"}
+            ])
+            self.ids = dict(zip(self.PLACES, facade.bulk_create_places([
+                {"title": title, "price": 10.0, "latitude": lat, "longitude": lon, "owner_id": owner_id}
+                for title, (lat, lon) in self.PLACES.items()
+            ])))
+
+    def titles(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.json)
+        return sorted(place["title"] for place in response.json)
+
+    def test_bbox_search(self):
+        """Test that a bounding box returns the places inside it"""
+        self.assertEqual(self.titles('/api/v1/places/?bbox=-1,48,3,52'), ["London", "Paris", "Versailles"])
+        self.assertEqual(self.titles('/api/v1/places/?bbox=179,-20,-179,-15'), ["Fiji East", "Fiji West"])
+        self.assertEqual(self.client.get('/api/v1/places/?bbox=1,2,3').status_code, 400)
+
+    def test_radius_search_sorted_by_distance(self):
+        """Test that a radius search returns the nearest places first"""
+        response = self.client.get('/api/v1/places/?near=48.85,2.35&radius_km=50')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p["title"] for p in response.json], ["Paris", "Versailles"])
+        self.assertLess(response.json[0]["distance_km"], response.json[1]["distance_km"])
+        self.assertAlmostEqual(response.json[1]["distance_km"], 17.2, delta=1)
+
+        response = self.client.get('/api/v1/places/?near=-17.7,180&radius_km=30')
+        self.assertEqual(sorted(p["title"] for p in response.json), ["Fiji East", "Fiji West"])
+        self.assertEqual(self.client.get('/api/v1/places/?near=48.85,2.35').status_code, 400)
+
+    def test_radius_search_rejects_a_cursor(self):
+        """Test that near refuses an after cursor, a sort or a count it would not apply"""
+        for param in ("after=abc", "sort=price", "count=1"):
+            response = self.client.get(f'/api/v1/places/?near=48.85,2.35&radius_km=50&{param}')
+            self.assertEqual(response.status_code, 400, param)
+            self.assertIn(param.split("=")[0], response.json["error"])
+
+    def test_radius_search_with_price_range(self):
+        """Test that near applies min_price and max_price"""
+        from app.services import facade
+
+        with self.app.app_context():
+            facade.bulk_update_places([{"id": self.ids["Versailles"], "price": 80.0}])
+        url = '/api/v1/places/?near=48.85,2.35&radius_km=50'
+        self.assertEqual(self.titles(f'{url}&max_price=50'), ["Paris"])
+        self.assertEqual(self.titles(f'{url}&min_price=50'), ["Versailles"])
+        self.assertEqual(self.client.get(f'{url}&min_price=-1').status_code, 400)
+
+    def test_rtree_prefilter_tracks_changes(self):
+        """Test that the R*Tree is used and follows updates and deletes"""
+        from sqlalchemy import text
+        from app.extensions import db
+        from app.models.place import Place
+
+        with self.app.app_context():
+            query = Place.query.filter(self.facade.place_repo.bbox_filter((-1, 48, 3, 52)))
+            sql = str(query.statement.compile(compile_kwargs={"literal_binds": True}))
+            plan = " ".join(row[-1] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+            self.assertIn("places_rtree", plan)
+
+            self.facade.bulk_update_places([{"id": self.ids["London"], "latitude": 10.0}])
+            self.facade.bulk_delete_places([self.ids["Versailles"]])
+        self.assertEqual(self.titles('/api/v1/places/?bbox=-1,48,3,52'), ["Paris"])
+        self.assertEqual(self.titles('/api/v1/places/?bbox=-1,9,1,11'), ["London"])
+
+class TestPriceFilteringAndSorting(unittest.TestCase):
+    """ Test server-side price filters and sort orders on place listings """
+
+    PRICES = {"Hut": 20.0, "Cabin": 50.0, "Loft": 50.0, "Villa": 300.0, "Castle": 900.0}
+
+    def setUp(self):
+        """ Set up an in-memory application with places at several prices """
+        from config import TestingConfig
+        from app.services import facade
+
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            user_ids = facade.bulk_create_users([
+                {"first_name": "User", "last_name": str(n), "email": f"user{n}@example.com", "password": "x"}
+                for n in range(2)
+            ])
+            self.ids = dict(zip(self.PRICES, facade.bulk_create_places([
+                {"title": title, "price": price, "latitude": 0.0, "longitude": 0.0, "owner_id": user_ids[0]}
+                for title, price in self.PRICES.items()
+            ])))
+            facade.bulk_create_reviews([
+                {"text": "ok", "rating": rating, "user_id": user_ids[n], "place_id": self.ids[title]}
+                for title, ratings in (("Hut", (5, 5)), ("Villa", (3, 4)), ("Castle", (1,)))
+                for n, rating in enumerate(ratings)
+            ])
+
+    def titles(self, url):
+        """Follow the cursors of a listing and return every title in order"""
+        titles, cursor = [], None
+        while True:
+            response = self.client.get(f"{url}&after={cursor}" if cursor else url)
+            self.assertEqual(response.status_code, 200, response.json)
+            titles.extend(place["title"] for place in response.json)
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                return titles
+
+    def test_price_range(self):
+        """Test that min_price and max_price filter in SQL and compose with paging"""
+        response = self.client.get('/api/v1/places/?min_price=50&max_price=300&count=1')
+        self.assertEqual(response.headers["X-Total-Count"], "3")
+        self.assertEqual(self.titles('/api/v1/places/?limit=2&min_price=50&max_price=300&sort=price'),
+                         ["Cabin", "Loft", "Villa"] if self.ids["Cabin"] < self.ids["Loft"] else ["Loft", "Cabin", "Villa"])
+        self.assertEqual(self.titles('/api/v1/places/?limit=2&max_price=20'), ["Hut"])
+
+    def test_sort_orders(self):
+        """Test that every sort order is stable across pages"""
+        self.assertEqual(self.titles('/api/v1/places/?limit=2&sort=-price')[::4], ["Castle", "Hut"])
+        self.assertEqual(self.titles('/api/v1/places/?limit=2&sort=-rating')[:3], ["Hut", "Villa", "Castle"])
+        by_rating = self.titles('/api/v1/places/?limit=2&sort=rating')
+        self.assertEqual(by_rating[2:], ["Castle", "Villa", "Hut"])
+        self.assertEqual(self.titles('/api/v1/places/?limit=2&sort=-created_at'),
+                         self.titles('/api/v1/places/?limit=2')[::-1])
+
+    def test_invalid_arguments(self):
+        """Test that bad prices, ranges and sorts are rejected"""
+        for query in ("min_price=abc", "min_price=-1", "min_price=10&max_price=5", "sort=title"):
+            self.assertEqual(self.client.get(f'/api/v1/places/?{query}').status_code, 400, query)
+
+class TestFullTextSearch(unittest.TestCase):
+    """ Test the FTS5 search over places and their reviews """
+
+    def setUp(self):
+        """ Set up an in-memory application with described and reviewed places """
+        from config import TestingConfig
+        from app.services import facade
+
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        self.facade = facade
+        with self.app.app_context():
+            self.user_id, = facade.bulk_create_users([
+                {"first_name": "Ann", "last_name": "Lee", "email": "ann@example.com", "password": "x"}
+            ])
+            self.ids = dict(zip(("cottage", "flat", "barn"), facade.bulk_create_places([
+                {"title": "Seaside cottage", "description": "Quiet garden near the beach",
+                 "price": 80.0, "latitude": 0.0, "longitude": 0.0, "owner_id": self.user_id},
+                {"title": "City flat", "description": "Walk to the museums",
+                 "price": 120.0, "latitude": 0.0, "longitude": 0.0, "owner_id": self.user_id},
+                {"title": "Old barn", "description": None,
+                 "price": 40.0, "latitude": 0.0, "longitude": 0.0, "owner_id": self.user_id},
+            ])))
+            self.review_id, = facade.bulk_create_reviews([
+                {"text": "Lovely garden, we heard the sea every night", "rating": 5,
+                 "user_id": self.user_id, "place_id": self.ids["barn"]}
+            ])
+
+    def search(self, query):
+        response = self.client.get(f'/api/v1/places/search?q={query}')
+        self.assertEqual(response.status_code, 200, response.json)
+        return response
+
+    def test_ranked_search_with_snippets(self):
+        """Test that title, description and review hits are ranked and highlighted"""
+        response = self.search('garden')
+        self.assertEqual([p["title"] for p in response.json], ["Seaside cottage", "Old barn"])
+        self.assertIn("<b>garden</b>", response.json[0]["snippet"])
+        self.assertIn("<b>garden</b>", response.json[1]["snippet"])
+        self.assertEqual([p["title"] for p in self.search('museum walks').json], ["City flat"])
+        self.assertEqual(self.search('garden museum').json, [])
+
+    def test_pagination(self):
+        """Test that search results are paged with cursors"""
+        first = self.client.get('/api/v1/places/search?q=garden&limit=1&count=1')
+        self.assertEqual(first.headers["X-Total-Count"], "2")
+        second = self.client.get(f'/api/v1/places/search?q=garden&limit=1&after={first.headers["X-Next-Cursor"]}')
+        self.assertEqual([p["title"] for p in first.json + second.json], ["Seaside cottage", "Old barn"])
+        self.assertNotIn("X-Next-Cursor", second.headers)
+
+    def test_index_follows_writes(self):
+        """Test that place and review writes update only the affected documents"""
+        with self.app.app_context():
+            self.facade.bulk_update_places([{"id": self.ids["flat"], "title": "City loft"}])
+            self.facade.bulk_delete_reviews([self.review_id])
+            self.facade.bulk_delete_places([self.ids["cottage"]])
+        self.assertEqual([p["title"] for p in self.search('loft').json], ["City loft"])
+        self.assertEqual(self.search('garden').json, [])
+
+    def test_invalid_queries(self):
+        """Test that empty queries are rejected and FTS5 syntax is not interpreted"""
+        self.assertEqual(self.client.get('/api/v1/places/search?q=').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/places/search?q=%22%2A').status_code, 400)
+        self.assertEqual(self.search('garden%20OR%20%22NEAR(').json, [])
+
+    def test_snippets_are_escaped(self):
+        """Test that user text in snippets is HTML-escaped around the highlights"""
+        with self.app.app_context():
+            self.facade.bulk_update_places([{"id": self.ids["flat"],
+                                             "description": "<img src=x onerror=alert(1)> orchard & pool"}])
+        snippet = self.search('orchard').json[0]["snippet"]
+        self.assertNotIn("<img", snippet)
+        self.assertIn("&lt;img src=x onerror=alert(1)&gt; <b>orchard</b> &amp; pool", snippet)
+
+    def test_like_fallback_escapes_wildcards(self):
+        """Test that without FTS5 an underscore only matches an underscore"""
+        from unittest import mock
+        from app.persistence import search
+
+        with self.app.app_context():
+            self.facade.bulk_update_places([{"id": self.ids["barn"], "title": "Old barn_loft"}])
+        with mock.patch.object(search, "has_fts", return_value=False):
+            self.assertEqual([p["title"] for p in self.search('barn_loft').json], ["Old barn_loft"])
+            self.assertEqual(self.search('City_flat').json, [])
+            self.assertIsNone(self.search('garden').json[0]["snippet"])
+
+class TestRatingAggregates(unittest.TestCase):
+    """ Test the review count, rating sum and histogram kept on places """
+
+    def setUp(self):
+        """ Set up an in-memory application with two places and three users """
+        from config import TestingConfig
+        from app.services import facade
+
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        self.facade = facade
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.user_ids = facade.bulk_create_users([
+            {"first_name": "User", "last_name": str(n), "email": f"user{n}@example.com", "password": "x"}
+            for n in range(3)
+        ])
+        self.place_ids = facade.bulk_create_places([
+            {"title": title, "price": 10.0, "latitude": 0.0, "longitude": 0.0, "owner_id": self.user_ids[0]}
+            for title in ("First", "Second")
+        ])
+
+    def tearDown(self):
+        self.ctx.pop()
+
+    def aggregates(self, place_id):
+        place = self.facade.get_place(place_id)
+        return place["review_count"], place["average_rating"], place["rating_histogram"]
+
+    def review(self, user, place, rating):
+        return self.facade.create_review({
+            "text": "Nice", "rating": rating, "user_id": self.user_ids[user], "place_id": self.place_ids[place]
+        })["id"]
+
+    def test_single_review_writes(self):
+        """Test that create, update and delete adjust the aggregates incrementally"""
+        first = self.review(1, 0, 4)
+        self.review(2, 0, 5)
+        self.assertEqual(self.aggregates(self.place_ids[0]),
+                         (2, 4.5, {"1": 0, "2": 0, "3": 0, "4": 1, "5": 1}))
+
+        self.facade.update_review(first, {"rating": 1})
+        self.assertEqual(self.aggregates(self.place_ids[0]),
+                         (2, 3.0, {"1": 1, "2": 0, "3": 0, "4": 0, "5": 1}))
+        with self.assertRaises(ValueError):
+            self.facade.update_review(first, {"rating": 6})
+
+        self.facade.delete_review(first)
+        self.assertEqual(self.aggregates(self.place_ids[0])[:2], (1, 5.0))
+        self.assertEqual(self.aggregates(self.place_ids[1]), (0, None, {str(n): 0 for n in range(1, 6)}))
+
+    def test_bulk_writes_and_user_deletion(self):
+        """Test that bulk review writes and cascading user deletes keep aggregates exact"""
+        ids = self.facade.bulk_create_reviews([
+            {"text": "Ok", "rating": 3, "user_id": self.user_ids[1], "place_id": self.place_ids[0]},
+            {"text": "Ok", "rating": 2, "user_id": self.user_ids[2], "place_id": self.place_ids[0]},
+            {"text": "Ok", "rating": 5, "user_id": self.user_ids[1], "place_id": self.place_ids[1]},
+        ])
+        self.assertEqual(self.aggregates(self.place_ids[0])[:2], (2, 2.5))
+        self.facade.bulk_update_reviews([{"id": ids[0], "rating": 4}])
+        self.assertEqual(self.aggregates(self.place_ids[0])[:2], (2, 3.0))
+        self.facade.bulk_delete_reviews([ids[1]])
+        self.assertEqual(self.aggregates(self.place_ids[0])[:2], (1, 4.0))
+
+        self.facade.delete_user(self.user_ids[1])
+        self.assertEqual(self.aggregates(self.place_ids[0])[0], 0)
+        self.assertEqual(self.aggregates(self.place_ids[1])[0], 0)
+        self.assertEqual(self.facade.repair_place_ratings(), [])
+
+    def test_repair_command(self):
+        """Test that the repair command detects and fixes drifted aggregates"""
+        from sqlalchemy import text
+        from app.extensions import db
+
+        self.review(1, 0, 5)
+        db.session.execute(text("UPDATE places SET review_count = 7, rating_3 = 2"))
+        db.session.commit()
+
+        result = self.app.test_cli_runner().invoke(args=["ratings-repair"])
+        self.assertIn("2 place(s) had drifted", result.output)
+        self.assertEqual(self.aggregates(self.place_ids[0])[:2], (1, 5.0))
+        self.assertEqual(self.aggregates(self.place_ids[1])[0], 0)
+        self.assertEqual(self.facade.repair_place_ratings(), [])
+
+    def test_repair_drops_cached_places(self):
+        """Test that repaired aggregates are not hidden by cached place snapshots"""
+        from sqlalchemy import text
+        from app.extensions import db
+
+        self.review(1, 0, 5)
+        db.session.execute(text("UPDATE places SET review_count = 7"))
+        db.session.commit()
+        db.session.remove()
+        self.facade.place_repo.get(self.place_ids[0])
+        self.assertEqual(self.facade.place_repo.entities.get(self.place_ids[0])["review_count"], 7)
+
+        self.assertIn(self.place_ids[0], self.facade.repair_place_ratings())
+        db.session.remove()
+        self.assertIsNone(self.facade.place_repo.entities.get(self.place_ids[0]))
+        self.assertEqual(self.facade.place_repo.get(self.place_ids[0]).review_count, 1)
+
+    def test_sort_by_review_count(self):
+        """Test that listings sort on the maintained aggregates"""
+        self.review(1, 1, 2)
+        self.review(2, 1, 2)
+        self.review(1, 0, 5)
+        titles = lambda sort: [p["title"] for p in self.client.get(f'/api/v1/places/?sort={sort}').json]
+        self.assertEqual(titles('-review_count'), ["Second", "First"])
+        self.assertEqual(titles('-rating'), ["First", "Second"])
+
+class TestReviewsByPlace(unittest.TestCase):
+    """ Test the paginated per-place reviews endpoint """
+
+    def setUp(self):
+        """ Set up an in-memory application with one heavily reviewed place """
+        from datetime import datetime, timedelta
+        from config import TestingConfig
+        from app.services import facade
+
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            user_ids = facade.bulk_create_users([
+                {"first_name": "User", "last_name": str(n), "email": f"user{n}@example.com", "password": "x"}
+                for n in range(12)
+            ])
+            self.place_id, self.empty_id = facade.bulk_create_places([
+                {"title": title, "price": 10.0, "latitude": 0.0, "longitude": 0.0, "owner_id": user_ids[0]}
+                for title in ("Busy", "Quiet")
+            ])
+            start = datetime(2024, 1, 1)
+            facade.bulk_create_reviews([
+                {"text": f"Review {n}", "rating": n % 5 + 1, "user_id": user_ids[n], "place_id": self.place_id,
+                 "created_at": start + timedelta(days=n // 2)}
+                for n in range(12)
+            ])
+
+    def test_newest_first_pages(self):
+        """Test that pages run newest first and cover every review once"""
+        url = f'/api/v1/reviews/places/{self.place_id}/reviews?limit=5&count=1'
+        response = self.client.get(url)
+        self.assertEqual(response.headers["X-Total-Count"], "12")
+        seen = []
+        while True:
+            self.assertEqual(response.status_code, 200, response.json)
+            seen.extend(response.json)
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+            response = self.client.get(f"{url}&after={cursor}")
+        self.assertEqual(len({review["id"] for review in seen}), 12)
+        dates = [review["created_at"] for review in seen]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+    def test_min_rating(self):
+        """Test that min_rating filters reviews and the total"""
+        response = self.client.get(f'/api/v1/reviews/places/{self.place_id}/reviews?min_rating=4&count=1')
+        self.assertEqual(response.headers["X-Total-Count"], "4")
+        self.assertEqual(len(response.json), 4)
+        self.assertTrue(all(review["rating"] >= 4 for review in response.json))
+        for value in ("0", "6", "x"):
+            response = self.client.get(f'/api/v1/reviews/places/{self.place_id}/reviews?min_rating={value}')
+            self.assertEqual(response.status_code, 400, value)
+
+    def test_missing_and_empty_places(self):
+        """Test the 404 for unknown places and the message for places without reviews"""
+        self.assertEqual(self.client.get('/api/v1/reviews/places/nope/reviews').status_code, 404)
+        response = self.client.get(f'/api/v1/reviews/places/{self.empty_id}/reviews')
+        self.assertEqual(response.json, {"message": "No reviews found for this place"})
+
+    def test_query_uses_composite_index(self):
+        """Test that the page query is served by the (place_id, created_at, id) index"""
+        from sqlalchemy import text
+        from app.extensions import db
+        from app.services import facade
+
+        with self.app.app_context():
+            statements = []
+            def record(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+            from sqlalchemy import event
+            event.listen(db.engine, "before_cursor_execute", record)
+            try:
+                facade.review_repo.get_place_page(self.place_id, 5)
+            finally:
+                event.remove(db.engine, "before_cursor_execute", record)
+            sql = statements[-1].replace("?", f"'{self.place_id}'", 1).replace("?", "6")
+            plan = " ".join(row[-1] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+        self.assertIn("ix_reviews_place_id_created_at", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+class TestStreamingResponses(unittest.TestCase):
+    """ Test the NDJSON and chunked JSON array modes of collection endpoints """
+
+    def setUp(self):
+        """ Set up an in-memory application with a few hundred places """
+        from config import TestingConfig
+        from app.services import facade
+
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            owner_id, reviewer_id = facade.bulk_create_users([
+                {"first_name": "User", "last_name": str(n), "email": f"user{n}@example.com", "password": "x"}
+                for n in range(2)
+            ])
+            self.place_ids = facade.bulk_create_places([
+                {"title": f"Place {n}", "price": float(n), "latitude": 0.0, "longitude": 0.0, "owner_id": owner_id}
+                for n in range(450)
+            ])
+            facade.bulk_create_reviews([
+                {"text": "Fine", "rating": 3, "user_id": reviewer_id, "place_id": place_id}
+                for place_id in self.place_ids[:5]
+            ])
+
+    def test_ndjson_places(self):
+        """Test that Accept: application/x-ndjson streams one place per line"""
+        import json
+        response = self.client.get('/api/v1/places/', headers={"Accept": "application/x-ndjson"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        places = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([p["id"] for p in places], sorted(self.place_ids))
+        self.assertEqual(sum(len(p["reviews"]) for p in places), 5)
+
+    def test_json_array_with_filters(self):
+        """Test that stream=1 returns the whole filtered collection as one array"""
+        response = self.client.get('/api/v1/places/?stream=1&min_price=100&max_price=349')
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(sorted(p["price"] for p in response.json), [float(n) for n in range(100, 350)])
+        self.assertEqual(self.client.get('/api/v1/places/?stream=1&min_price=-1').status_code, 400)
+
+    def test_sort_is_rejected(self):
+        """Test that a stream refuses a sort order it would not apply"""
+        response = self.client.get('/api/v1/places/?stream=1&sort=price')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("sort", response.json["error"])
+        ndjson = self.client.get('/api/v1/places/?sort=-rating', headers={"Accept": "application/x-ndjson"})
+        self.assertEqual(ndjson.status_code, 400)
+
+    def test_stream_reviews(self):
+        """Test that reviews stream as well, including an empty collection"""
+        response = self.client.get('/api/v1/reviews/?stream=1')
+        self.assertEqual(len(response.json), 5)
+        with self.app.app_context():
+            from app.services import facade
+            facade.bulk_delete_places(self.place_ids)
+        response = self.client.get('/api/v1/reviews/', headers={"Accept": "application/x-ndjson"})
+        self.assertEqual(response.get_data(as_text=True), "")
+        self.assertEqual(self.client.get('/api/v1/reviews/?stream=1').json, [])
+
+class TestSparseFieldsets(unittest.TestCase):
+    """ Test ?fields= and ?include= on place endpoints """
+
+    def setUp(self):
+        """ Set up an in-memory application with reviewed places """
+        from datetime import datetime, timedelta
+        from config import TestingConfig
+        from app.services import facade
+
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            user_ids = facade.bulk_create_users([
+                {"first_name": "User", "last_name": str(n), "email": f"user{n}@example.com", "password": "x"}
+                for n in range(5)
+            ])
+            amenity_id, = facade.bulk_create_amenities([{"name": "Wifi"}])
+            self.place_ids = facade.bulk_create_places([
+                {"title": f"Place {n}", "description": "A long description " * 20, "price": 10.0,
+                 "latitude": 0.0, "longitude": 0.0, "owner_id": user_ids[0], "amenities": [amenity_id]}
+                for n in range(20)
+            ])
+            start = datetime(2024, 1, 1)
+            facade.bulk_create_reviews([
+                {"text": f"Review {n}", "rating": 4, "user_id": user_ids[n], "place_id": place_id,
+                 "created_at": start + timedelta(days=n)}
+                for place_id in self.place_ids for n in range(5)
+            ])
+
+    def get(self, url):
+        """Return the response to `url` and the SQL statements it ran"""
+        from sqlalchemy import event
+        from app.extensions import db
+
+        statements = []
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        with self.app.app_context():
+            event.listen(db.engine, "before_cursor_execute", record)
+            try:
+                response = self.client.get(url)
+            finally:
+                event.remove(db.engine, "before_cursor_execute", record)
+        self.assertEqual(response.status_code, 200, response.json)
+        return response, statements
+
+    def test_sparse_fields(self):
+        """Test that ?fields= returns and loads only the requested columns"""
+        response, statements = self.get('/api/v1/places/?fields=title,price')
+        self.assertEqual(set(response.json[0]), {"id", "title", "price"})
+        self.assertEqual(len(statements), 2)
+        self.assertNotIn("places.description", statements[1])
+        full, _ = self.get('/api/v1/places/')
+        self.assertLess(len(response.data) * 10, len(full.data))
+
+    def test_capped_reviews(self):
+        """Test that reviews[:N] embeds the N newest reviews with reviews_total"""
+        response, statements = self.get('/api/v1/places/?fields=title&include=owner,reviews[:2]')
+        place = response.json[0]
+        self.assertEqual(set(place), {"id", "title", "owner", "reviews", "reviews_total"})
+        self.assertEqual([r["text"] for r in place["reviews"]], ["Review 4", "Review 3"])
+        self.assertEqual(place["reviews_total"], 5)
+        self.assertEqual(place["owner"]["first_name"], "User")
+        self.assertEqual(len(statements), 3)
+
+        response, _ = self.get(f'/api/v1/places/{self.place_ids[0]}?include=amenities,reviews[:1]')
+        self.assertEqual(len(response.json["reviews"]), 1)
+        self.assertEqual([a["name"] for a in response.json["amenities"]], ["Wifi"])
+        self.assertIn("price", response.json)
+        self.assertNotIn("owner", response.json)
+
+    def test_invalid_fieldsets(self):
+        """Test that unknown fields and relations are rejected"""
+        for query in ("fields=title,password", "include=users", "include=reviews[5]"):
+            self.assertEqual(self.client.get(f'/api/v1/places/?{query}').status_code, 400, query)
+        self.assertEqual(self.client.get(f'/api/v1/places/{self.place_ids[0]}?fields=secret').status_code, 400)
+
+
+class TestConditionalGet(unittest.TestCase):
+    """ Test ETag and Last-Modified validators on public GET endpoints """
+
+    def setUp(self):
+        """ Set up an in-memory application with a place and a review """
+        from config import TestingConfig
+        from app.services import facade
+
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            self.user_ids = facade.bulk_create_users([
+                {"first_name": "User", "last_name": str(n), "email": f"user{n}@example.com", "password": "x"}
+                for n in range(3)
+            ])
+            self.place_id, = facade.bulk_create_places([
+                {"title": "Place", "description": "", "price": 10.0, "latitude": 0.0, "longitude": 0.0,
+                 "owner_id": self.user_ids[0]}
+            ])
+            self.review_id, = facade.bulk_create_reviews([
+                {"text": "Nice", "rating": 4, "user_id": self.user_ids[1], "place_id": self.place_id}
+            ])
+
+    def revalidate(self, url):
+        """Fetch `url`, then replay it with its ETag and return the second response"""
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.headers.get("ETag"))
+        self.assertIsNotNone(response.headers.get("Last-Modified"))
+        return self.client.get(url, headers={"If-None-Match": response.headers["ETag"]})
+
+    def test_not_modified(self):
+        """Test that unchanged resources answer 304 with an empty body"""
+        for url in ('/api/v1/places/', f'/api/v1/places/{self.place_id}', '/api/v1/reviews/',
+                    f'/api/v1/reviews/{self.review_id}', f'/api/v1/reviews/places/{self.place_id}/reviews',
+                    '/api/v1/amenities/'):
+            response = self.revalidate(url)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response.data, b"", url)
+
+    def test_if_modified_since(self):
+        """Test that If-Modified-Since is honoured when no ETag is sent"""
+        url = f'/api/v1/places/{self.place_id}'
+        last_modified = self.client.get(url).headers["Last-Modified"]
+        self.assertEqual(self.client.get(url, headers={"If-Modified-Since": last_modified}).status_code, 304)
+        self.assertEqual(self.client.get(url, headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}).status_code, 200)
+
+    def test_writes_change_validators(self):
+        """Test that a new review changes the place and listing ETags but not unrelated ones"""
+        from app.services import facade
+
+        urls = ['/api/v1/places/', f'/api/v1/places/{self.place_id}',
+                f'/api/v1/places/{self.place_id}?fields=title', '/api/v1/amenities/']
+        before = {url: self.client.get(url).headers["ETag"] for url in urls}
+        with self.app.app_context():
+            facade.bulk_create_reviews([
+                {"text": "Great", "rating": 5, "user_id": self.user_ids[2], "place_id": self.place_id}
+            ])
+        after = {url: self.client.get(url).headers["ETag"] for url in urls}
+        self.assertNotEqual(before['/api/v1/places/'], after['/api/v1/places/'])
+        self.assertNotEqual(before[f'/api/v1/places/{self.place_id}'], after[f'/api/v1/places/{self.place_id}'])
+        # review_count is part of the place row, so even a fields-only view changes
+        self.assertNotEqual(before[urls[2]], after[urls[2]])
+        self.assertEqual(before['/api/v1/amenities/'], after['/api/v1/amenities/'])
+
+        with self.app.app_context():
+            facade.create_amenity({"name": "Pool"})
+        self.assertNotEqual(after['/api/v1/amenities/'], self.client.get('/api/v1/amenities/').headers["ETag"])
+
+    def test_place_validator_is_scoped_to_its_rows(self):
+        """Test that the place ETag ignores writes to rows the place does not show"""
+        from app.services import facade
+
+        url = f'/api/v1/places/{self.place_id}'
+        etag = self.client.get(url).headers["ETag"]
+        with self.app.app_context():
+            facade.update_user(self.user_ids[2], {"first_name": "Other"})
+            facade.create_amenity({"name": "Pool"})
+        self.assertEqual(self.client.get(url).headers["ETag"], etag)
+
+        with self.app.app_context():
+            facade.update_user(self.user_ids[0], {"first_name": "Owner"})
+        self.assertNotEqual(self.client.get(url).headers["ETag"], etag)
+
+    def test_revalidation_is_one_statement(self):
+        """Test that a 304 is answered from a single statement"""
+        from sqlalchemy import event
+        from app.extensions import db
+
+        url = f'/api/v1/places/{self.place_id}'
+        etag = self.client.get(url).headers["ETag"]
+        statements = []
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        with self.app.app_context():
+            event.listen(db.engine, "before_cursor_execute", record)
+            try:
+                response = self.client.get(url, headers={"If-None-Match": etag})
+            finally:
+                event.remove(db.engine, "before_cursor_execute", record)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(statements), 1)
+
+
+class TestResponseCache(unittest.TestCase):
+    """ Test the shared cache of public GET responses """
+
+    def setUp(self):
+        """ Set up an in-memory application with the response cache enabled """
+        from config import TestingConfig
+        from app.services import facade
+
+        class CachedConfig(TestingConfig):
+            RESPONSE_CACHE_ENABLED = True
+            RESPONSE_CACHE_MAX_ENTRIES = 50
+            RESPONSE_CACHE_TTLS = dict(TestingConfig.RESPONSE_CACHE_TTLS, review=0)
+
+        self.app = create_app(CachedConfig)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            self.user_ids = facade.bulk_create_users([
+                {"first_name": "User", "last_name": str(n), "email": f"user{n}@example.com", "password": "x"}
+                for n in range(4)
+            ])
+            self.amenity_id, = facade.bulk_create_amenities([{"name": "Wifi"}])
+            self.place_ids = facade.bulk_create_places([
+                {"title": f"Place {n}", "description": "", "price": 10.0 + n, "latitude": 0.0, "longitude": 0.0,
+                 "owner_id": self.user_ids[0], "amenities": [self.amenity_id]}
+                for n in range(2)
+            ])
+            self.review_id, = facade.bulk_create_reviews([
+                {"text": "Nice", "rating": 4, "user_id": self.user_ids[1], "place_id": self.place_ids[0]}
+            ])
+
+    def tearDown(self):
+        """ Leave the process-wide cache empty for the other tests """
+        from app.services import response_cache
+        response_cache.cache.clear()
+
+    def get(self, url, **kwargs):
+        """Return the response to `url` and the number of SQL statements it ran"""
+        from sqlalchemy import event
+        from app.extensions import db
+
+        statements = []
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        with self.app.app_context():
+            event.listen(db.engine, "before_cursor_execute", record)
+            try:
+                response = self.client.get(url, **kwargs)
+            finally:
+                event.remove(db.engine, "before_cursor_execute", record)
+        return response, len(statements)
+
+    def test_hit_runs_only_the_version_read(self):
+        """Test that a repeated request is served from the cache after one version read"""
+        first, _ = self.get('/api/v1/places/?limit=5&sort=price')
+        self.assertEqual(first.headers["X-Cache"], "MISS")
+        second, statements = self.get('/api/v1/places/?sort=price&limit=5')
+        self.assertEqual(second.headers["X-Cache"], "HIT")
+        self.assertEqual(statements, 1)
+        self.assertEqual(second.json, first.json)
+        self.assertEqual(second.headers["ETag"], first.headers["ETag"])
+
+        revalidated, _ = self.get('/api/v1/places/?limit=5&sort=price', headers={"If-None-Match": first.headers["ETag"]})
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_writes_invalidate_by_tag(self):
+        """Test that a new review drops its place and the listings but not unrelated entries"""
+        from app.services import facade
+
+        urls = ['/api/v1/places/', f'/api/v1/places/{self.place_ids[0]}', f'/api/v1/places/{self.place_ids[1]}',
+                f'/api/v1/reviews/places/{self.place_ids[0]}/reviews', '/api/v1/amenities/']
+        for url in urls:
+            self.client.get(url)
+        with self.app.app_context():
+            facade.create_review({"text": "Great", "rating": 5, "user_id": self.user_ids[2],
+                                  "place_id": self.place_ids[0]})
+        states = {url: self.client.get(url) for url in urls}
+        self.assertEqual(states['/api/v1/places/'].headers["X-Cache"], "MISS")
+        self.assertEqual(states[urls[1]].headers["X-Cache"], "MISS")
+        self.assertEqual(states[urls[1]].json["reviews_total"], 2)
+        self.assertEqual(len(states[urls[3]].json), 2)
+        self.assertEqual(states[urls[2]].headers["X-Cache"], "HIT")
+        self.assertEqual(states['/api/v1/amenities/'].headers["X-Cache"], "HIT")
+
+        with self.app.app_context():
+            facade.update_amenity(self.amenity_id, {"name": "Fast wifi"})
+        detail = self.client.get(urls[2])
+        self.assertEqual(detail.headers["X-Cache"], "MISS")
+        self.assertEqual(detail.json["amenities"][0]["name"], "Fast wifi")
+
+    def test_accept_header_is_part_of_the_key(self):
+        """Test that requests differing only by Accept are cached apart"""
+        self.assertEqual(self.client.get('/api/v1/amenities/').headers["X-Cache"], "MISS")
+        other = self.client.get('/api/v1/amenities/', headers={"Accept": "application/json"})
+        self.assertEqual(other.headers["X-Cache"], "MISS")
+        self.assertEqual(self.client.get('/api/v1/amenities/').headers["X-Cache"], "HIT")
+
+    def test_writes_outside_the_facade_are_seen(self):
+        """Test that rows written by data-generate miss the entries rendered before them"""
+        listing = self.client.get('/api/v1/places/?limit=50')
+        self.assertEqual(self.client.get('/api/v1/places/?limit=50').headers["X-Cache"], "HIT")
+        with self.app.app_context():
+            result = self.app.test_cli_runner().invoke(args=[
+                'data-generate', '--users', '2', '--places', '3', '--amenities', '0', '--reviews', '0', '--seed', '1'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        after = self.client.get('/api/v1/places/?limit=50')
+        self.assertEqual(after.headers["X-Cache"], "MISS")
+        self.assertEqual(len(after.json), len(listing.json) + 3)
+
+    def test_details_follow_rows_written_outside_the_orm(self):
+        """Test that a detail whose row changed behind the entity cache is rendered from the new row"""
+        from datetime import datetime, timedelta
+        from sqlalchemy import text
+        from app.extensions import db
+
+        for url, table, column, value, row_id in (
+                (f'/api/v1/reviews/{self.review_id}', 'reviews', 'text', 'Changed', self.review_id),
+                (f'/api/v1/amenities/{self.amenity_id}', 'amenities', 'name', 'Pool', self.amenity_id)):
+            before = self.client.get(url)
+            self.assertEqual(before.status_code, 200)
+            with self.app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(text(f"UPDATE {table} SET {column} = :value, updated_at = :now WHERE id = :id"),
+                                       {"value": value, "now": datetime.utcnow() + timedelta(seconds=1), "id": row_id})
+            after = self.client.get(url)
+            self.assertNotEqual(after.headers["ETag"], before.headers["ETag"])
+            self.assertEqual(after.json[column], value, url)
+            revalidated = self.client.get(url, headers={"If-None-Match": after.headers["ETag"]})
+            self.assertEqual(revalidated.status_code, 304)
+            self.assertEqual(self.client.get(url).json[column], value, url)
+
+    def test_hit_rate_for_anonymous_listing(self):
+        """Test that a listing polled between occasional writes is mostly served from the cache"""
+        from app.services import facade, response_cache
+
+        stats = response_cache.cache.stats()
+        for n in range(200):
+            if n % 50 == 49:
+                with self.app.app_context():
+                    facade.update_place(self.place_ids[1], {"price": 20.0 + n})
+            self.assertEqual(self.client.get('/api/v1/places/').status_code, 200)
+        after = response_cache.cache.stats()
+        hits, misses = after["hits"] - stats["hits"], after["misses"] - stats["misses"]
+        self.assertGreater(hits / (hits + misses), 0.9)
+
+    def test_bounded_and_configurable(self):
+        """Test that the entry count is bounded and a zero TTL disables a route"""
+        from app.services import response_cache
+
+        for n in range(80):
+            self.client.get(f'/api/v1/places/?limit={n + 1}')
+        self.assertLessEqual(response_cache.cache.stats()["entries"], 50)
+
+        self.client.get(f'/api/v1/reviews/{self.review_id}')
+        self.assertNotIn("X-Cache", self.client.get(f'/api/v1/reviews/{self.review_id}').headers)
+        stream = self.client.get('/api/v1/places/?stream=1')
+        self.assertNotIn("X-Cache", stream.headers)
+
+
+class TestPasswordHashing(unittest.TestCase):
+    """ Test the bounded bcrypt pool and its configured cost """
+
+    def setUp(self):
+        """ Set up an in-memory application with one user """
+        from config import TestingConfig
+        from app.services import facade
+
+        class HashingConfig(TestingConfig):
+            HASHING_WORKERS = 1
+            HASHING_QUEUE_SIZE = 0
+
+        self.app = create_app(HashingConfig)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            self.user_id = facade.create_user({"first_name": "Jane", "last_name": "Doe",
+                                               "email": "jane@example.com", "password": "secret"}).id
+
+    def tearDown(self):
+        """ Give the next tests the default pool back """
+        from config import TestingConfig
+        create_app(TestingConfig)
+
+    def stored_hash(self):
+        """Return the password hash stored for the user"""
+        from app.extensions import db
+        from app.models.user import User
+        with self.app.app_context():
+            return db.session.scalar(db.select(User.password).where(User.id == self.user_id))
+
+    def test_configured_cost(self):
+        """Test that passwords are hashed at BCRYPT_LOG_ROUNDS"""
+        self.assertTrue(self.stored_hash().startswith("$2b$04$"))
+
+    def test_rehash_on_login(self):
+        """Test that a login rehashes a password made at another cost"""
+        from app.hashing import hasher
+
+        hasher.rounds = 5
+        response = self.client.post('/api/v1/auth/login', json={"email": "jane@example.com", "password": "secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.stored_hash().startswith("$2b$05$"))
+        response = self.client.post('/api/v1/auth/login', json={"email": "jane@example.com", "password": "wrong"})
+        self.assertEqual(response.status_code, 401)
+
+    def test_full_queue_is_rejected(self):
+        """Test that password operations past the bound fail fast with 503"""
+        from app.hashing import hasher
+
+        hasher._slots.acquire()
+        try:
+            response = self.client.post('/api/v1/auth/login', json={"email": "jane@example.com", "password": "secret"})
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers["Retry-After"], "1")
+            response = self.client.post('/api/v1/users/', json={"first_name": "John", "last_name": "Doe",
+                                                                "email": "john@example.com", "password": "x"})
+            self.assertEqual(response.status_code, 503)
+        finally:
+            hasher._slots.release()
+        response = self.client.post('/api/v1/auth/login', json={"email": "jane@example.com", "password": "secret"})
+        self.assertEqual(response.status_code, 200)
+
+
+class TestRefreshTokens(unittest.TestCase):
+    """ Test the refresh token flow and its rotation """
+
+    def setUp(self):
+        """ Set up an in-memory application and log a user in """
+        from config import TestingConfig
+        from app.services import facade
+
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            facade.create_user({"first_name": "Jane", "last_name": "Doe",
+                                "email": "jane@example.com", "password": "secret"})
+        response = self.client.post('/api/v1/auth/login', json={"email": "jane@example.com", "password": "secret"})
+        self.assertEqual(response.status_code, 200)
+        self.tokens = response.json
+
+    def refresh(self, token):
+        """POST /auth/refresh with `token` as the bearer"""
+        return self.client.post('/api/v1/auth/refresh', headers={"Authorization": f"Bearer {token}"})
+
+    def test_refresh_skips_bcrypt(self):
+        """Test that refreshing issues working tokens without verifying a password"""
+        from unittest import mock
+        from app.hashing import hasher
+
+        with mock.patch.object(hasher, "check", side_effect=AssertionError("bcrypt was called")):
+            response = self.refresh(self.tokens["refresh_token"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json["refresh_token"], self.tokens["refresh_token"])
+        protected = self.client.get('/api/v1/auth/protected',
+                                    headers={"Authorization": f"Bearer {response.json['access_token']}"})
+        self.assertEqual(protected.status_code, 200)
+
+    def test_reuse_revokes_family(self):
+        """Test that replaying a rotated refresh token revokes its successors"""
+        rotated = self.refresh(self.tokens["refresh_token"]).json
+        self.assertEqual(self.refresh(self.tokens["refresh_token"]).status_code, 401)
+        self.assertEqual(self.refresh(rotated["refresh_token"]).status_code, 401)
+
+        login = self.client.post('/api/v1/auth/login', json={"email": "jane@example.com", "password": "secret"})
+        self.assertEqual(self.refresh(login.json["refresh_token"]).status_code, 200)
+
+    def test_token_types_and_lifetimes(self):
+        """Test that only refresh tokens refresh and that lifetimes come from the config"""
+        from flask_jwt_extended import decode_token
+
+        self.assertNotEqual(self.refresh(self.tokens["access_token"]).status_code, 200)
+        with self.app.app_context():
+            access = decode_token(self.tokens["access_token"])
+            refresh = decode_token(self.tokens["refresh_token"])
+        self.assertEqual(access["exp"] - access["iat"], self.app.config["JWT_ACCESS_TOKEN_EXPIRES"].total_seconds())
+        self.assertEqual(refresh["exp"] - refresh["iat"], self.app.config["JWT_REFRESH_TOKEN_EXPIRES"].total_seconds())
+
+    def test_purge_expired(self):
+        """Test that deny list rows of expired tokens are purged"""
+        from datetime import datetime, timedelta
+        from app.services import facade
+
+        self.refresh(self.tokens["refresh_token"])
+        with self.app.app_context():
+            self.assertEqual(facade.purge_revoked_tokens(), 0)
+            from app.persistence import token_denylist
+            self.assertEqual(token_denylist.purge_expired(datetime.utcnow() + timedelta(days=31)), 1)
+
+
+class TestStructuredLogging(unittest.TestCase):
+    """ Test the queue-based JSON logging pipeline """
+
+    def make_app(self, **settings):
+        """Create an application logging to a buffer with the given LOG_* settings"""
+        import io
+        from config import TestingConfig
+
+        self.stream = io.StringIO()
+        config = type("LoggingConfig", (TestingConfig,), dict({"LOG_STREAM": self.stream}, **settings))
+        self.app = create_app(config)
+        return self.app
+
+    def tearDown(self):
+        """ Send logs back to stderr for the other tests """
+        from config import TestingConfig
+        create_app(TestingConfig)
+
+    def lines(self):
+        """Return the JSON entries written so far"""
+        import json
+        from app.log import flush_logs
+        flush_logs()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_serializing_reviews_is_silent(self):
+        """Test that listing reviews writes nothing to stdout"""
+        import contextlib
+        import io
+        from app.services import facade
+
+        self.make_app()
+        with self.app.app_context():
+            user_ids = facade.bulk_create_users([
+                {"first_name": "User", "last_name": str(n), "email": f"user{n}@example.com", "password": "x"}
+                for n in range(2)
+            ])
+            place_id, = facade.bulk_create_places([{"title": "Place", "price": 1.0, "latitude": 0.0,
+                                                    "longitude": 0.0, "owner_id": user_ids[0]}])
+            facade.bulk_create_reviews([{"text": "Nice", "rating": 4, "user_id": user_ids[1], "place_id": place_id}])
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                self.assertEqual(len(facade.get_all_reviews()), 1)
+        self.assertEqual(stdout.getvalue(), "")
+
+    def test_structured_entries_and_levels(self):
+        """Test that entries are JSON with their extra fields and honour per-module levels"""
+        from app.services import facade
+
+        self.make_app(LOG_LEVEL="INFO")
+        with self.app.app_context():
+            user = facade.create_user({"first_name": "Jane", "last_name": "Doe",
+                                       "email": "jane@example.com", "password": "secret"})
+        entry, = [line for line in self.lines() if line["msg"] == "User created"]
+        self.assertEqual(entry["level"], "INFO")
+        self.assertEqual(entry["logger"], "app.services.facade")
+        self.assertEqual(entry["user_id"], user.id)
+        self.assertNotIn("secret", self.stream.getvalue())
+
+        self.make_app(LOG_LEVEL="INFO", LOG_LEVELS={"app.services.facade": "WARNING"})
+        with self.app.app_context():
+            facade.create_user({"first_name": "John", "last_name": "Doe",
+                                "email": "john@example.com", "password": "secret"})
+        self.assertEqual(self.lines(), [])
+
+    def test_sampling(self):
+        """Test that sampled loggers keep the configured fraction of their records"""
+        from app.models import storage
+        from app.models.user import User
+
+        self.make_app(LOG_LEVEL="DEBUG", LOG_SAMPLE_RATES={"app.models": 0.1})
+        for _ in range(100):
+            storage.get(User, "missing")
+        lines = self.lines()
+        self.assertEqual(len(lines), 10)
+        self.assertTrue(all(line["sampled"] == 10 for line in lines))
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """Test that records are dropped and counted once the queue is full"""
+        import logging
+        import queue
+        from app.log import DroppingQueueHandler
+
+        handler = DroppingQueueHandler(queue.Queue(1))
+        for n in range(3):
+            handler.handle(logging.LogRecord("app", logging.INFO, __file__, 0, "event %d", (n,), None))
+        self.assertEqual(handler.dropped, 2)
+
+
+class TestMetrics(unittest.TestCase):
+    """ Test the request metrics served at /metrics """
+
+    def setUp(self):
+        """ Set up an in-memory application """
+        from config import TestingConfig
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+
+    def samples(self):
+        """Scrape /metrics and return {sample name with labels: value}"""
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain; version=0.0.4"))
+        samples = {}
+        for line in response.data.decode().splitlines():
+            if line and not line.startswith("#"):
+                name, value = line.rsplit(" ", 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_request_metrics(self):
+        """Test that latency, status, size and query metrics are recorded per resource and method"""
+        endpoint = 'endpoint="places_place_list",method="GET"'
+        before = self.samples()
+        for _ in range(3):
+            self.client.get('/api/v1/places/')
+        self.client.get('/api/v1/places/?limit=0')
+        after = self.samples()
+
+        def delta(name):
+            return after.get(name, 0) - before.get(name, 0)
+
+        self.assertEqual(delta(f'hbnb_http_request_duration_seconds_count{{{endpoint}}}'), 4)
+        self.assertEqual(delta(f'hbnb_http_request_duration_seconds_bucket{{{endpoint},le="+Inf"}}'), 4)
+        self.assertEqual(delta(f'hbnb_http_requests_total{{{endpoint},status="200"}}'), 3)
+        self.assertEqual(delta(f'hbnb_http_requests_total{{{endpoint},status="400"}}'), 1)
+        self.assertEqual(after[f'hbnb_http_requests_in_flight{{{endpoint}}}'], 0)
+        self.assertEqual(delta(f'hbnb_http_response_size_bytes_count{{{endpoint}}}'), 4)
+        self.assertGreater(delta(f'hbnb_db_queries_per_request_sum{{{endpoint}}}'), 0)
+        self.assertGreater(delta(f'hbnb_db_query_seconds_per_request_sum{{{endpoint}}}'), 0)
+
+    def test_threads_record_without_losing_counts(self):
+        """Test that concurrent recording from many threads sums exactly"""
+        import threading
+        from app.metrics import Histogram
+
+        histogram = Histogram("test_seconds", "Test.", ("name",), (0.1, 1.0))
+        def record():
+            for _ in range(1000):
+                histogram.observe(("x",), 0.5)
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{name="x",le="0.1"} 0', lines)
+        self.assertIn('test_seconds_bucket{name="x",le="1.0"} 8000', lines)
+        self.assertIn('test_seconds_count{name="x"} 8000', lines)
+        self.assertIn('test_seconds_sum{name="x"} 4000.0', lines)
+
+
+class TestQueryBudgets(unittest.TestCase):
+    """ Test that public endpoints stay within a fixed SQL statement budget """
+
+    # Statements each endpoint may run, whatever the number of rows it serves
+    QUERY_BUDGETS = {
+        '/api/v1/places/': 4,
+        '/api/v1/places/?include=owner,reviews[:3]': 3,
+        '/api/v1/places/?sort=-rating&fields=title': 2,
+        '/api/v1/places/?near=1,1&radius_km=10': 6,
+        '/api/v1/places/{place_id}': 4,
+        # Search and amenity details read the version keying the response cache on top
+        '/api/v1/places/search?q=cosy': 5,
+        '/api/v1/reviews/': 2,
+        '/api/v1/reviews/places/{place_id}/reviews': 2,
+        '/api/v1/amenities/': 2,
+        '/api/v1/amenities/{amenity_id}': 2,
+        '/api/v1/users/': 1,
+    }
+
+    def setUp(self):
+        """ Set up an in-memory application with places, reviews and amenities """
+        from config import TestingConfig
+        from app.services import facade
+
+        class BudgetConfig(TestingConfig):
+            QUERY_STATS_HEADERS = True
+
+        self.app = create_app(BudgetConfig)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            user_ids = facade.bulk_create_users([
+                {"first_name": "User", "last_name": str(n), "email": f"user{n}@example.com", "password": "x"}
+                for n in range(6)
+            ])
+            amenity_ids = facade.bulk_create_amenities([{"name": f"Amenity {n}"} for n in range(3)])
+            place_ids = facade.bulk_create_places([
+                {"title": f"Cosy place {n}", "price": 10.0, "latitude": 1.0, "longitude": 1.0,
+                 "owner_id": user_ids[n % 2], "amenities": amenity_ids}
+                for n in range(12)
+            ])
+            facade.bulk_create_reviews([
+                {"text": "Cosy", "rating": 4, "user_id": user_ids[2 + k], "place_id": place_id}
+                for place_id in place_ids for k in range(4)
+            ])
+        self.ids = {"place_id": place_ids[0], "amenity_id": amenity_ids[0]}
+
+    def test_endpoints_within_budget(self):
+        """Test every endpoint against its budget"""
+        for url, budget in self.QUERY_BUDGETS.items():
+            response = self.client.get(url.format(**self.ids))
+            self.assertEqual(response.status_code, 200, url)
+            self.assertLessEqual(int(response.headers["X-Query-Count"]), budget, url)
+            self.assertIn("X-Query-Time-Ms", response.headers)
+
+    def test_repeated_statements_warn(self):
+        """Test that a statement shape repeated past the threshold is reported once"""
+        from app.persistence.query_stats import QueryStats
+
+        stats = QueryStats(repeat_threshold=3)
+        with self.assertLogs("app.persistence.query_stats", "WARNING") as logs:
+            for n in range(6):
+                params = ", ".join("?" * (n + 1))
+                stats.record(f"SELECT * FROM users\n WHERE users.id IN ({params})", 0.001)
+            stats.record("SELECT 1", 0.001)
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].shape, "SELECT * FROM users WHERE users.id IN (?...)")
+        self.assertEqual(stats.count, 7)
+
+    def test_lazy_loading_is_detected(self):
+        """Test that serializing lazily loaded relations in a request trips the warning"""
+        from app.extensions import db
+        from app.models.place import Place
+
+        self.app.config["QUERY_REPEAT_THRESHOLD"] = 5
+        with self.app.test_request_context('/'):
+            self.app.preprocess_request()
+            with self.assertLogs("app.persistence.query_stats", "WARNING"):
+                db.session.expunge_all()
+                for place in db.session.scalars(db.select(Place)).all():
+                    place.reviews
+
+
+class TestBenchmark(unittest.TestCase):
+    """ Test the benchmark harness on a tiny dataset """
+
+    def test_report_covers_every_route(self):
+        """Test that both phases report latency and query counts and every scenario succeeds"""
+        from app.benchmark import SCENARIOS, run_benchmark
+
+        report = run_benchmark({"users": 8, "places": 6, "amenities": 3, "reviews": 20},
+                               requests=2, threads=2, duration=30, http_requests=40)
+        # Place update and delete fail in their handlers, so timing them would only measure errors
+        self.assertEqual(report["uncovered_routes"],
+                         ["/api/v1/places/<place_id> DELETE", "/api/v1/places/<place_id> PUT"])
+        self.assertEqual(report["failed_routes"], [])
+        self.assertEqual(set(report["test_client"]), {scenario.name for scenario in SCENARIOS})
+        for name in ("places", "place", "review", "place_reviews", "user_create", "review_create"):
+            route = report["test_client"][name]
+            self.assertEqual(route["requests"], 2)
+            self.assertEqual(route["failed"], 0, name)
+            self.assertIsNotNone(route["latency_ms"]["p99"])
+            self.assertIsNotNone(route["queries"]["max"])
+
+        http = report["http"]
+        self.assertEqual(http["requests"], 40)
+        self.assertEqual(http["errors"], 0)
+        self.assertEqual(set(http["routes"]), {scenario.name for scenario in SCENARIOS if scenario.read})
+        self.assertGreater(http["throughput_rps"], 0)
+
+
+class TestSyntheticData(unittest.TestCase):
+    """ Test the deterministic synthetic data generator """
+
+    SIZES = {"users": 40, "places": 30, "amenities": 15, "reviews": 300}
+
+    def generate(self, seed=1, chunk_size=1000):
+        """Generate data into a fresh in-memory application and return it with the counts"""
+        from config import TestingConfig
+        from app.extensions import db
+        from app.persistence import synthetic
+
+        app = create_app(TestingConfig)
+        with app.app_context():
+            written = synthetic.generate(db.engine, seed=seed, chunk_size=chunk_size, password_hash="x",
+                                         **self.SIZES)
+        return app, written
+
+    def rows(self, app):
+        from app.extensions import db
+        from app.models.review import Review
+        with app.app_context():
+            return sorted(db.session.execute(db.select(Review.id, Review.place_id, Review.user_id, Review.rating,
+                                                       Review.created_at)).all())
+
+    def test_zipf_counts(self):
+        """Test that counts follow the ranks, respect the cap and add up"""
+        from app.persistence.synthetic import zipf_counts
+
+        counts = zipf_counts(1000, 50, 1.0, 60)
+        self.assertEqual(sum(counts), 1000)
+        self.assertEqual(counts[0], 60)
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        self.assertEqual(zipf_counts(10, 3, 1.0, 2), [2, 2, 2])
+        self.assertEqual(zipf_counts(10, 4, 0), [3, 3, 2, 2])
+
+    def test_same_seed_same_data_whatever_the_chunk_size(self):
+        """Test that the seed alone decides the rows"""
+        first, written = self.generate(chunk_size=7)
+        second, _ = self.generate(chunk_size=1000)
+        other, _ = self.generate(seed=2)
+        self.assertEqual(written["reviews"], 300)
+        self.assertEqual(self.rows(first), self.rows(second))
+        self.assertNotEqual(self.rows(first), self.rows(other))
+
+    def test_data_is_consistent_and_indexed(self):
+        """Test aggregates, review rules and that search indexes and triggers are back"""
+        from app.extensions import db
+        from app.models.place import Place
+        from app.models.review import Review
+        from app.persistence import synthetic
+        from app.persistence.place_repository import refresh_ratings
+        from app.services import facade
+
+        app, written = self.generate()
+        self.assertEqual(written["users"], 40)
+        self.assertEqual(written["places"], 30)
+        with app.app_context():
+            self.assertEqual(refresh_ratings(), [])
+            self_reviews = db.session.scalar(db.select(db.func.count()).select_from(Review).join(Place)
+                                             .where(Review.user_id == Place.owner_id))
+            self.assertEqual(self_reviews, 0)
+            titles = db.session.scalars(db.select(Place.title)).all()
+            word = titles[0].split()[1]
+            page = facade.search_places(word, 100)
+            self.assertEqual(len(page.items), sum(1 for title in titles if f" {word} " in f" {title} "))
+            near = facade.get_places_near(51.5072, -0.1276, 50, 100)
+            self.assertTrue(near)
+            self.assertTrue(all("London" in place["title"] for place in near))
+
+            owner_id = db.session.scalar(db.select(Place.owner_id))
+            facade.bulk_create_places([{"title": "Zanzibar hut", "price": 10.0, "latitude": 1.0,
+                                        "longitude": 1.0, "owner_id": owner_id}])
+            self.assertEqual(len(facade.search_places("zanzibar", 10).items), 1)
+
+            with self.assertRaises(ValueError):
+                synthetic.generate(db.engine, seed=1, **self.SIZES)
+
+    def test_interrupted_load_is_repaired_by_upgrade(self):
+        """Test that indexes and triggers left dropped by a failed or killed load come back"""
+        from unittest import mock
+        from sqlalchemy import text
+        from config import TestingConfig
+        from app.extensions import db
+        from app.models.review import Review
+        from app.persistence import migrations, synthetic
+
+        app = create_app(TestingConfig)
+        with app.app_context():
+            with mock.patch.object(synthetic, "_insert_places_and_reviews", side_effect=RuntimeError("killed")):
+                with self.assertRaises(RuntimeError):
+                    synthetic.generate(db.engine, seed=1, password_hash="x", **self.SIZES)
+            self.assertEqual(migrations.restore_indexes(db.session.connection()), [])
+            db.session.rollback()
+
+            synthetic._suspend_indexes(db.engine, [Review.__table__])
+            migrations.upgrade(db.engine)
+            names = set(db.session.execute(text("SELECT name FROM sqlite_master")).scalars())
+            self.assertTrue({"uq_reviews_user_place", "reviews_fts_insert", "places_rtree_insert"} <= names)
+
+
+class TestBulkImport(unittest.TestCase):
+    """ Test the admin bulk import of CSV and NDJSON """
+
+    def setUp(self):
+        """ Set up an in-memory application with two users, an amenity and admin tokens """
+        from config import TestingConfig
+        from app.api.v1.auth import issue_tokens
+        from app.services import facade
+
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            self.owner = facade.create_user({"first_name": "Ann", "last_name": "Owner",
+                                             "email": "ann@example.com", "password": "secret"}).id
+            self.guest = facade.create_user({"first_name": "Bob", "last_name": "Guest",
+                                             "email": "bob@example.com", "password": "secret"}).id
+            self.wifi = facade.create_amenity({"name": "WiFi"}).id
+            self.admin = issue_tokens({"id": self.owner, "is_admin": True})["access_token"]
+            self.user = issue_tokens({"id": self.guest, "is_admin": False})["access_token"]
+
+    def post(self, kind, body, content_type, token=None, query=""):
+        return self.client.post(f'/api/v1/admin/import/{kind}{query}', data=body, content_type=content_type,
+                                headers={"Authorization": f"Bearer {token or self.admin}"})
+
+    def test_places_csv_reports_errors_by_line(self):
+        """Test that valid rows are imported with their amenities and the others reported"""
+        from unittest import mock
+        from app.models.place import Place
+        from app.services import facade
+
+        body = ("title,price,latitude,longitude,owner_email,amenities\n"
+                "Loft,120,48.85,2.35,ann@example.com,WiFi\n"
+                "Cabin,-5,45.0,6.0,ann@example.com,\n"
+                "Barn,80,45.0,6.0,nobody@example.com,\n"
+                f"Villa,300,43.7,7.26,ann@example.com,{self.wifi}|Pool\n"
+                "Studio,abc,1,1,ann@example.com,\n"
+                "Hut,40,10,10,ann@example.com,\n")
+        # Rows are validated without building a Place per row
+        with mock.patch.object(Place, "__init__", side_effect=AssertionError("instance built")):
+            response = self.post("places", body, "text/csv")
+        self.assertEqual(response.status_code, 200)
+        report = response.json
+        self.assertEqual((report["rows"], report["imported"], report["failed"]), (6, 2, 4))
+        self.assertEqual([error["line"] for error in report["errors"]], [3, 4, 5, 6])
+        self.assertIn("nobody@example.com", report["errors"][1]["error"])
+        self.assertIn("Pool", report["errors"][2]["error"])
+        with self.app.app_context():
+            places = {place.title: place for place in facade.place_repo.get_all()}
+            self.assertEqual(set(places), {"Loft", "Hut"})
+            self.assertEqual([amenity.name for amenity in places["Loft"].amenities], ["WiFi"])
+            self.assertEqual(places["Hut"].owner_id, self.owner)
+
+    def test_reviews_ndjson_and_dry_run(self):
+        """Test the review rules, aggregates and that a dry run writes nothing"""
+        import json
+        from app.services import facade
+
+        with self.app.app_context():
+            place_id = facade.create_place({"title": "Loft", "price": 100.0, "latitude": 1.0,
+                                            "longitude": 1.0, "owner_id": self.owner})["id"]
+        lines = [
+            json.dumps({"text": "Great", "rating": 5, "place_id": place_id, "user_email": "bob@example.com"}),
+            json.dumps({"text": "Again", "rating": 4, "place_id": place_id, "user_id": self.guest}),
+            json.dumps({"text": "Mine", "rating": 5, "place_id": place_id, "user_id": self.owner}),
+            "{not json",
+            json.dumps({"text": "Bad", "rating": 9, "place_id": place_id, "user_id": self.guest, "extra": 1}),
+        ]
+        body = "\n".join(lines)
+        dry = self.post("reviews", body, "application/x-ndjson", query="?dry_run=true").json
+        self.assertEqual((dry["imported"], dry["failed"]), (1, 4))
+        with self.app.app_context():
+            self.assertEqual(facade.get_reviews_by_place(place_id, 10).items, [])
+
+        report = self.post("reviews", body, "application/x-ndjson").json
+        self.assertEqual((report["imported"], report["failed"]), (1, 4))
+        self.assertEqual([error["line"] for error in report["errors"]], [2, 3, 4, 5])
+        self.assertIn("own place", report["errors"][1]["error"])
+        self.assertIn("Unknown field", report["errors"][3]["error"])
+        again = self.post("reviews", lines[0], "application/x-ndjson").json
+        self.assertIn("already reviewed", again["errors"][0]["error"])
+        boolean = json.dumps({"text": "Yes", "rating": True, "place_id": place_id, "user_id": self.guest})
+        self.assertIn("Rating must be", self.post("reviews", boolean, "application/x-ndjson").json["errors"][0]["error"])
+        with self.app.app_context():
+            place = facade.place_repo.get(place_id)
+            self.assertEqual((place.review_count, place.rating_sum), (1, 5))
+
+    def test_rejected_requests(self):
+        """Test admin only access and unknown kinds or formats"""
+        self.assertEqual(self.post("amenities", "name\nPool\n", "text/csv", token=self.user).status_code, 403)
+        self.assertEqual(self.post("users", "name\nPool\n", "text/csv").status_code, 400)
+        self.assertEqual(self.post("amenities", "name\nPool\n", "text/plain").status_code, 400)
+        response = self.post("amenities", "name\nPool\n", "text/plain", query="?format=csv")
+        self.assertEqual(response.json["imported"], 1)
+
+    def test_cli_import(self):
+        """Test the data-import command with a small batch size"""
+        from app.services import facade
+
+        runner = self.app.test_cli_runner()
+        with self.app.app_context():
+            result = runner.invoke(args=["data-import", "amenities", "-", "--format", "ndjson", "--batch-size", "2"],
+                                   input='{"name": "Pool"}\n{"name": "WiFi"}\n{"name": "Sauna"}\n{"name": "Pool"}\n')
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn("4 record(s), 2 imported, 2 rejected", result.output)
+            self.assertIn("line 2: Amenity WiFi already exists", result.output)
+            self.assertEqual(sorted(amenity.name for amenity in facade.get_all_amenities()),
+                             ["Pool", "Sauna", "WiFi"])
+
+
+class TestDatasetExport(unittest.TestCase):
+    """ Test the consistent NDJSON export """
+
+    def setUp(self):
+        """ Set up an application on a WAL database file with synthetic data """
+        import os
+        import tempfile
+        from config import TestingConfig
+        from app.api.v1.auth import issue_tokens
+        from app.extensions import db
+        from app.persistence import synthetic
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "export.db")
+
+        class ExportConfig(TestingConfig):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{self.path}"
+            SQLITE_JOURNAL_MODE = "WAL"
+
+        self.app = create_app(ExportConfig)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            self.written = synthetic.generate(db.engine, users=20, places=15, amenities=5, reviews=100, seed=3,
+                                              password_hash="x")
+            user_id = db.session.scalar(db.text("SELECT id FROM users LIMIT 1"))
+            self.admin = issue_tokens({"id": user_id, "is_admin": True})["access_token"]
+            self.user = issue_tokens({"id": user_id, "is_admin": False})["access_token"]
+
+    def tearDown(self):
+        from app.extensions import db
+        with self.app.app_context():
+            db.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def get(self, query="", token=None):
+        return self.client.get(f'/api/v1/admin/export/{query}',
+                               headers={"Authorization": f"Bearer {token or self.admin}"})
+
+    def test_export_reads_one_snapshot(self):
+        """Test that writes committed mid-export neither block nor show up in it"""
+        import json
+        import sqlite3
+        from app.services import facade
+
+        with self.app.app_context():
+            chunks = facade.export_dataset(batch_size=10)
+            head = next(chunks) + next(chunks)
+            writer = sqlite3.connect(self.path, timeout=0.5)
+            writer.execute("DELETE FROM reviews")
+            writer.commit()
+            writer.close()
+            lines = [json.loads(line) for line in (head + b"".join(chunks)).decode().splitlines()]
+        self.assertEqual(lines[0]["type"], "export")
+        self.assertEqual(lines[-1], {"type": "end", "counts": {
+            "users": 20, "amenities": 5, "places": 15, "place_amenities": self.written["place_amenities"],
+            "reviews": self.written["reviews"]}})
+        rows = lines[1:-1]
+        self.assertEqual(sum(1 for line in rows if line["type"] == "reviews"), self.written["reviews"])
+        self.assertNotIn("password", rows[0]["data"])
+        self.assertEqual([line["type"] for line in rows], sorted((line["type"] for line in rows),
+                                                                 key=["users", "amenities", "places",
+                                                                      "place_amenities", "reviews"].index))
+
+    def test_endpoint(self):
+        """Test gzip, table selection and admin only access"""
+        import gzip
+        import json
+
+        response = self.get("?tables=places,amenities&gzip=1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/gzip")
+        lines = [json.loads(line) for line in gzip.decompress(response.data).decode().splitlines()]
+        self.assertEqual(lines[0]["tables"], ["amenities", "places"])
+        self.assertEqual(lines[-1]["counts"], {"amenities": 5, "places": 15})
+        self.assertEqual(self.get("?tables=tokens").status_code, 400)
+        self.assertEqual(self.get(token=self.user).status_code, 403)
+
+    def test_cli_export(self):
+        """Test the data-export command writing a gzip file"""
+        import gzip
+        import json
+        import os
+
+        output = os.path.join(self.tmpdir.name, "dump.ndjson.gz")
+        with self.app.app_context():
+            result = self.app.test_cli_runner().invoke(args=["data-export", output, "--table", "users"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        with gzip.open(output, "rt") as dump:
+            lines = [json.loads(line) for line in dump]
+        self.assertEqual(lines[-1]["counts"], {"users": 20})
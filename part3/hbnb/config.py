@@ -1,15 +1,108 @@
 import os
+from datetime import timedelta
 
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key')
     DEBUG = False
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', "sqlite:///hbnb.db")
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool, ignored for in-memory SQLite
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = 30
+    DB_POOL_RECYCLE = 3600
+    DB_POOL_PRE_PING = False
+
+    # Pragmas applied to every new SQLite connection, None leaves the default.
+    # WAL lets readers run while a writer commits; NORMAL sync is safe in WAL.
+    SQLITE_JOURNAL_MODE = "WAL"
+    SQLITE_SYNCHRONOUS = "NORMAL"
+    SQLITE_CACHE_SIZE = -64000  # negative values are KiB, i.e. 64 MB
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+    SQLITE_BUSY_TIMEOUT = 5000  # milliseconds
+    # Access tokens are checked by signature alone; refresh tokens also
+    # against the deny list, and each one can be exchanged only once.
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.getenv('JWT_ACCESS_MINUTES', 15)))
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.getenv('JWT_REFRESH_DAYS', 30)))
+    # Token identities are {"id", "is_admin"} dicts rather than strings
+    JWT_VERIFY_SUB = False
+    # Levels are per logger name; sample rates keep that fraction of the
+    # records below WARNING of a logger, for events logged on every request.
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = {}
+    LOG_SAMPLE_RATES = {'app.models': 0.01}
+    LOG_QUEUE_SIZE = 10000
+    METRICS_ENABLED = True
+    # Send X-Query-Count and X-Query-Time-Ms headers; warn when one statement
+    # shape runs more than QUERY_REPEAT_THRESHOLD times in a request
+    QUERY_STATS_HEADERS = False
+    QUERY_REPEAT_THRESHOLD = 10
+    # Records validated and inserted per transaction by bulk imports, and
+    # the most rejected records an import report lists
+    IMPORT_BATCH_SIZE = 1000
+    IMPORT_ERROR_LIMIT = 1000
+    # Rows fetched per round trip by dataset exports
+    EXPORT_BATCH_SIZE = 1000
+    PAGE_SIZE_DEFAULT = 50
+    PAGE_SIZE_MAX = 500
+    # bcrypt cost, each step doubles the time a hash takes. Hashes made at
+    # another cost are redone at the next successful login.
+    BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+    HASHING_WORKERS = None  # None uses one thread per CPU
+    HASHING_QUEUE_SIZE = 32
+    ENTITY_CACHE_ENABLED = True
+    ENTITY_CACHE_MAX_ENTRIES = 10000
+    ENTITY_CACHE_MAX_BYTES = 16 * 1024 * 1024
+    ENTITY_CACHE_TTL = 300
+    RESPONSE_CACHE_ENABLED = True
+    RESPONSE_CACHE_MAX_ENTRIES = 5000
+    RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    RESPONSE_CACHE_TTL = 60
+    # Seconds a rendered response may be served per route, 0 disables the route.
+    # Writes made through this process drop affected responses at once, the
+    # TTL bounds how long other workers' writes can go unnoticed.
+    RESPONSE_CACHE_TTLS = {
+        "places": 30,
+        "place_search": 30,
+        "place": 60,
+        "place_reviews": 60,
+        "reviews": 60,
+        "review": 300,
+        "amenities": 300,
+        "amenity": 300,
+    }
 
 class DevelopmentConfig(Config):
     DEBUG = True
-    SQLALCHEMY_DATABASE_URI = "sqlite:///development.db"
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+    QUERY_STATS_HEADERS = True
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    SQLITE_JOURNAL_MODE = None
+    SQLITE_MMAP_SIZE = None
+    BCRYPT_LOG_ROUNDS = 4
+    LOG_LEVEL = 'WARNING'
+
+class BenchmarkConfig(Config):
+    # The harness sets SQLALCHEMY_DATABASE_URI to a temporary file per run
+    SECRET_KEY = 'benchmark-secret-key-not-for-production-use'
+    BCRYPT_LOG_ROUNDS = 4
+    QUERY_STATS_HEADERS = True
+    # Failing requests are counted by status in the report
+    LOG_LEVEL = 'CRITICAL'
+    RESPONSE_CACHE_ENABLED = False
+
+class ProductionConfig(Config):
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+    DB_POOL_PRE_PING = True
 
 config = {
     'development': DevelopmentConfig,
+    'testing': TestingConfig,
+    'production': ProductionConfig,
     'default': DevelopmentConfig
 }
\ No newline at end of file
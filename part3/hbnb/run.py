@@ -1,6 +1,8 @@
+import os
 from app import create_app
+from config import config
 
-app = create_app()
+app = create_app(config[os.getenv('HBNB_ENV', 'default')])
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
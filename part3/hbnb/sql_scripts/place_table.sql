@@ -10,6 +10,16 @@ CREATE TABLE IF NOT EXISTS places
     latitude FLOAT,
     longitude FLOAT,
     owner_id CHAR(36),
+    review_count INT NOT NULL DEFAULT 0,
+    rating_sum INT NOT NULL DEFAULT 0,
+    rating_1 INT NOT NULL DEFAULT 0,
+    rating_2 INT NOT NULL DEFAULT 0,
+    rating_3 INT NOT NULL DEFAULT 0,
+    rating_4 INT NOT NULL DEFAULT 0,
+    rating_5 INT NOT NULL DEFAULT 0,
     PRIMARY KEY (id),
-    FOREIGN KEY (owner_id) REFERENCES users (id)
+    FOREIGN KEY (owner_id) REFERENCES users (id),
+    INDEX ix_places_owner_id (owner_id),
+    INDEX ix_places_price (price),
+    INDEX ix_places_latitude_longitude (latitude, longitude)
 );
\ No newline at end of file
@@ -11,5 +11,6 @@ CREATE TABLE IF NOT EXISTS reviews
     PRIMARY KEY (id),
     FOREIGN KEY (user_id) REFERENCES users (id),
     FOREIGN KEY (place_id) REFERENCES places (id),
-    CONSTRAINT unique_user_place UNIQUE (user_id, place_id)
+    CONSTRAINT unique_user_place UNIQUE (user_id, place_id),
+    INDEX ix_reviews_place_id (place_id)
 );
\ No newline at end of file